@@ -1,7 +1,7 @@
 # api/sync.py
 
 from flask import Blueprint, request, jsonify
-from core.db import Session
+from core.db import Session, ReadSession
 from core.models import SomeModel, LocalChangeRemote
 from datetime import datetime
 
@@ -60,7 +60,7 @@ def sync_push():
 def sync_pull():
     since = request.args.get('since')
     cutoff = datetime.fromisoformat(since) if since else datetime.min
-    session = Session()
+    session = ReadSession()  # reiner Lesezugriff → Lese-Replik, falls konfiguriert
 
     # Alle Remote-Änderungen nach dem Zeitpunkt abfragen
     changes = (
@@ -5,7 +5,7 @@ import sys
 sys.path.insert(0, os.path.dirname(__file__))
 
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, stream_template, request, redirect, url_for, flash, session, jsonify, get_flashed_messages, g
 import logging
 import markdown
 from datetime import date
@@ -15,19 +15,97 @@ from sqlalchemy.engine import Engine
 load_dotenv()
 
 # Eigene Module
-from core.db import get_db_connection, init_db
+from core.db import get_db, init_db, init_app as init_db_app, pool_status
+from core.db import DatabaseUnavailable, BREAKER_PROBE_INTERVAL, QueryTimeout, statement_timeout
 from core.auth import login_user, register_user
 from core.version import __version__
 from core.fixkosten import create_fix_transactions
+from core.scheduler import scheduler as fixkosten_scheduler
+from core import projection
+from core import recurrence
+from core.recurrence import Rule, parse_rrule
 from core.vorschlaege import bp as vorschlaege_bp
+from core.reports import bp as reports_bp
+from core.export import bp as export_bp
+from core.bankimport import bp as bankimport_bp, IMPORT_MAX_MB
+from core import queries as Q
+from core import totals
+from core import search
+from core import dataversion
+from core.dataversion import conditional_get
+from core.ledgercache import ledger_cache
+from cli.commands import init_app as init_cli
+from utils_web import period_range, as_date, parse_decimal, to_cents, from_cents
 from api import api, sync_bp
 from sync import sync               # <-- Import der lokalen Sync-Funktion
 
-# ganz oben, nach Deinen Imports
-from core.db import engine
+# Erstes Jahr der Archiv-Ansicht im Dashboard
+ARCHIV_START_YEAR = 2020
 
-def is_sqlite() -> bool:
-    return engine.url.get_backend_name() == 'sqlite'
+# Zeitbudget je Statement (ms) für die lesenden Seiten; Standard für alle
+# übrigen Routen ist DB_STATEMENT_TIMEOUT_MS
+DASHBOARD_TIMEOUT_MS = int(os.getenv("DB_TIMEOUT_DASHBOARD_MS", "3000"))
+FIXKOSTEN_TIMEOUT_MS = int(os.getenv("DB_TIMEOUT_FIXKOSTEN_MS", "3000"))
+
+# Zeilen je Dashboard-Seite; weitere Seiten über den Keyset-Cursor ("Weitere laden")
+DASHBOARD_PAGE_SIZE = int(os.getenv("DASHBOARD_PAGE_SIZE", "500"))
+
+
+def parse_cursor(value):
+    """'JJJJ-MM-TT_id' → (date, id); ungültige oder fehlende Cursor → Seitenanfang."""
+    try:
+        day, row_id = value.split('_', 1)
+        return date.fromisoformat(day), int(row_id)
+    except (AttributeError, ValueError):
+        return date.min, 0
+
+
+class TransactionPage:
+    """
+    Eine Dashboard-Seite als Iterator über das Ergebnis von
+    Q.DASHBOARD_TRANSACTIONS: Zeilen werden erst beim Rendern (stream_template)
+    gelesen, im Speicher liegt nie mehr als ein Block des Cursors.
+    Abgefragt wird eine Zeile mehr als angezeigt – existiert sie, gibt es eine
+    Folgeseite, deren Cursor nach dem Durchlauf in `next_cursor` steht.
+    """
+
+    def __init__(self, result, limit: int):
+        self.result = result
+        self.limit = limit
+        self.count = 0
+        self.has_more = False
+        self.next_cursor = None
+        self.failed = False
+
+    def __iter__(self):
+        last = None
+        try:
+            for r in self.result:
+                if self.count == self.limit:
+                    self.has_more = True
+                    break
+                self.count += 1
+                last = {
+                    'id': r[0],
+                    'date': as_date(r[1]),
+                    'description': r[2],
+                    'usage': r[3],
+                    'amount': from_cents(r[4]),
+                    'paid': bool(r[5]),
+                    'recurring_id': r[6],
+                    'balance': None if r[7] is None else from_cents(r[7]),
+                }
+                yield last
+        except Exception:
+            # Antwort läuft bereits – statt Fehlerseite ein Hinweis am Tabellenende
+            logging.error("Dashboard: Fehler beim Lesen der Transaktionen:", exc_info=True)
+            self.failed = True
+        finally:
+            if hasattr(self.result, 'close'):
+                self.result.close()
+        if self.has_more and last is not None:
+            self.next_cursor = f"{last['date'].isoformat()}_{last['id']}"
+        logging.info(f"Dashboard: {self.count} Transaktionen gestreamt.")
 
 
 # --- Importiere Update-Funktionen ---
@@ -59,21 +137,41 @@ def create_app():
         static_folder=os.path.join(base, 'web', 'static')
     )
     app.secret_key = os.getenv("FLASK_SECRET", "ein-sehr-geheimer-entwicklungs-schluessel-bitte-aendern")
-    app.config.setdefault('DB_INITIALIZED', False)
-
-    # --- Request Hook: Wird VOR jeder Anfrage ausgeführt ---
-    @app.before_request
-    def ensure_db_initialized():
-        if not app.config['DB_INITIALIZED']:
-            try:
-                init_db()
-                app.config['DB_INITIALIZED'] = True
-                logging.info("Datenbank initialisiert.")
-                logging.info(f"Aktuelle Version {__version__} als zuletzt gestartete Version gespeichert (Platzhalter).")
-            except Exception as e:
-                logging.error(f"Kritischer Fehler bei der Datenbankinitialisierung oder beim Speichern der Version: {e}", exc_info=True)
-                app.config['DB_INITIALIZED'] = True
-                flash("Fehler bei der Datenbankinitialisierung. Die App funktioniert möglicherweise nicht richtig.", 'error')
+    # Größter Request-Body (Kontoauszug-Upload); größere Anfragen enden mit 413,
+    # der Import fängt das ab (core/bankimport.py)
+    app.config['MAX_CONTENT_LENGTH'] = int(IMPORT_MAX_MB * 1024 * 1024)
+
+    # Eine Pool-Verbindung pro Request, Rückgabe im teardown_appcontext
+    init_db_app(app)
+    # Wartungsbefehle (z. B. flask rebuild-totals)
+    init_cli(app)
+
+    # --- Datenbank einmalig beim Start initialisieren (Engine, Fallback, Migrationen) ---
+    # init_db() ist idempotent und gecacht. Schlägt es hier fehl, wird es beim
+    # ersten DB-Zugriff über get_engine() erneut versucht.
+    try:
+        init_db()
+    except Exception as e:
+        logging.error(f"Kritischer Fehler bei der Datenbankinitialisierung: {e}", exc_info=True)
+
+    # --- Datenbank nicht erreichbar (Circuit Breaker offen): sofort 503 statt hängender Requests ---
+    @app.errorhandler(DatabaseUnavailable)
+    def handle_db_unavailable(e):
+        logging.warning(f"Datenbank nicht erreichbar, {request.method} {request.path} mit 503 beantwortet.")
+        retry_after = str(int(BREAKER_PROBE_INTERVAL))
+        if request.path.startswith('/api/') or request.is_json:
+            return jsonify({'success': False, 'error': 'Datenbank vorübergehend nicht erreichbar.'}), 503, {'Retry-After': retry_after}
+        return render_template('db_unavailable.html', retry_after=retry_after), 503, {'Retry-After': retry_after}
+
+    # --- Abfrage hat ihr Zeitbudget überschritten: Hinweis "Filter eingrenzen" statt hängender Seite ---
+    @app.errorhandler(QueryTimeout)
+    def handle_query_timeout(e):
+        message = "Die Abfrage hat zu lange gedauert. Bitte den Filter eingrenzen (z. B. einen Monat statt Archiv oder einen genaueren Suchbegriff)."
+        if request.path.startswith('/api/') or request.is_json:
+            return jsonify({'success': False, 'error': message}), 504
+        today = date.today()
+        return render_template('query_timeout.html', message=message,
+                               narrow_url=url_for('dashboard', year=today.year, month=today.month)), 504
 
     # --- Context Processor: Wird VOR jedem Template-Rendering ausgeführt ---
     @app.context_processor
@@ -184,6 +282,15 @@ def create_app():
             changelog_content = f"Fehler beim Laden des Changelogs: {e}"
         return render_template('changelog.html', changelog_content=changelog_content)
 
+    @app.route('/health/db')
+    def health_db():
+        # Live-Kennzahlen des Connection-Pools (für Worker-Sizing gegen max_connections),
+        # des Ledger-Caches, des Termin-Caches der Fixkosten-Regeln und – falls
+        # hier gestartet – des Fixkosten-Schedulers
+        return jsonify({**pool_status(), 'ledger_cache': ledger_cache.stats(),
+                        'recurrence_cache': recurrence.cache_info(),
+                        'fixkosten_scheduler': fixkosten_scheduler.status()}), 200
+
     @app.route('/sync_data', methods=['POST'])
     def sync_data():
         if not session.get('user_id'):
@@ -203,6 +310,8 @@ def create_app():
         return redirect(url_for('dashboard', desktop='1' if is_desktop_status else None))
 
     @app.route('/dashboard')
+    @statement_timeout(DASHBOARD_TIMEOUT_MS)
+    @conditional_get
     def dashboard():
         # Prüfe, ob der Benutzer angemeldet ist
         if not session.get('user_id'):
@@ -217,141 +326,164 @@ def create_app():
         month_str = request.args.get('month', str(today.month))
         q = request.args.get('q', '').strip()
 
-        # Erkennen, ob wir SQLite oder Postgres nutzen
-        sqlite_mode = is_sqlite()  # Deine Hilfsfunktion, z.B. aus core/db
-        ph = "?" if sqlite_mode else "%s"
-        year_expr = "CAST(strftime('%Y', date) AS INTEGER)" if sqlite_mode else "EXTRACT(YEAR FROM date)"
-        month_expr = "CAST(strftime('%m', date) AS INTEGER)" if sqlite_mode else "EXTRACT(MONTH FROM date)"
-
-        # WHERE‑Klausel zusammensetzen
-        cond = [f"user_id = {ph}"]
-        params = [user_id]
-
+        # Jahr/Monat werden als halboffener Bereich date >= start AND date < end
+        # gefiltert, damit der Index (user_id, date, id) einen Range-Scan machen kann.
+        # Ohne gültige Auswahl gilt der gesamte Zeitraum.
+        start, end = date.min, date.max
         if year_str.lower() == 'archiv':
-            cond.append(f"{year_expr} BETWEEN 2020 AND {year_expr}")
+            start = date(ARCHIV_START_YEAR, 1, 1)
         else:
             try:
                 y = int(year_str)
-                cond.append(f"{year_expr} = {ph}")
-                params.append(y)
+                try:
+                    m = int(month_str)
+                except ValueError:
+                    m = 0
+                start, end = period_range(y, m)
             except ValueError:
                 logging.warning("Ungültiges Jahresformat, überspringe Jahresfilter")
 
-        if year_str.lower() != 'archiv':
+        # Keyset-Pagination: ?after=JJJJ-MM-TT_id setzt hinter der letzten
+        # angezeigten Zeile fort, ohne die vorherigen Seiten erneut zu lesen
+        after = request.args.get('after')
+        after_date, after_id = parse_cursor(after)
+        partial = request.args.get('partial') == '1'
+
+        params = {'user_id': user_id, 'start': start, 'end': end,
+                  'after_date': after_date, 'after_id': after_id,
+                  'limit': DASHBOARD_PAGE_SIZE + 1}
+
+        # Monats- und Jahresansichten (erste Seite, ohne Suche) kommen aus dem
+        # Ledger-Cache; die Datenversion hat conditional_get schon gelesen
+        cache_key = (user_id, start, end) if year_str.isdigit() and not q and after is None else None
+        version = g.get('data_version')
+        cached = ledger_cache.get(cache_key, version) if cache_key else None
+
+        # Abfrage ausführen – bei offenem Circuit Breaker ggf. aus der SQLite-Replik;
+        # die Statements aus core.queries laufen auf beiden Backends. Gelesen wird
+        # erst beim Rendern über den serverseitigen Cursor.
+        transactions = []
+        # Virtuelle Fixkosten-Termine (FIXKOSTEN_VIRTUAL), siehe core/projection.py
+        proj = None
+        if cached:
+            transactions = TransactionPage(cached['rows'], DASHBOARD_PAGE_SIZE)
+        else:
             try:
-                m = int(month_str)
-                if 1 <= m <= 12:
-                    cond.append(f"{month_expr} = {ph}")
-                    params.append(m)
-            except ValueError:
-                pass
-
-        if q:
-            cond.append(f"(LOWER(description) LIKE {ph} OR LOWER(\"usage\") LIKE {ph})")
-            likeq = f"%{q.lower()}%"
-            params += [likeq, likeq]
-
-        sql = f"""
-            SELECT id, date, description, "usage", amount, paid, recurring_id
-              FROM transactions
-             WHERE {' AND '.join(cond)}
-             ORDER BY date, id
-        """
-
-        # Abfrage ausführen
-        conn = None
-        rows = []
-        try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            cur.execute(sql, params)
-            rows = cur.fetchall()
-            logging.info(f"Dashboard: {len(rows)} Transaktionen gefunden.")
-        except Exception as e:
-            logging.error("Dashboard: Fehler beim Abrufen der Transaktionen:", exc_info=True)
-            flash("Fehler beim Laden der Transaktionen.", 'error')
-        finally:
-            if conn:
-                conn.close()
+                conn = get_db(readonly=True)
+                stmt = Q.DASHBOARD_TRANSACTIONS
+                if q:
+                    # Suchindex (FTS5 bzw. pg_trgm), siehe core/search.py
+                    mode, search_params = search.prepare(conn, q)
+                    stmt = Q.DASHBOARD_TRANSACTIONS_SEARCH[mode]
+                    params.update(search_params)
+                else:
+                    # Laufender Kontostand ab dem Stand vor dem Zeitraum
+                    params['opening'] = totals.opening_balance(conn, user_id, start)
+                result = Q.execute(conn, stmt, params)
+                if projection.FIXKOSTEN_VIRTUAL:
+                    proj = projection.load(conn, user_id)
+                    virtual = proj.page(start, end, (after_date, after_id))
+                    if q:
+                        result = projection.merge(result, [r for r in virtual if projection.matches(r, q)], None)
+                    else:
+                        real_base = params['opening']
+                        if after is not None:
+                            real_base += Q.execute(conn, Q.DASHBOARD_CARRY_IN, params).scalar()
+                        result = projection.merge(result, virtual, real_base,
+                                                  proj.total_before(start, (after_date, after_id)))
+                if cache_key:
+                    # Eine Seite eines Monats/Jahres – für den Cache vollständig lesen
+                    result = [tuple(r) for r in result]
+                transactions = TransactionPage(result, DASHBOARD_PAGE_SIZE)
+            except (DatabaseUnavailable, QueryTimeout):
+                raise  # → 503-/Timeout-Seite statt generischer Fehlermeldung
+            except Exception as e:
+                logging.error("Dashboard: Fehler beim Abrufen der Transaktionen:", exc_info=True)
+                flash("Fehler beim Laden der Transaktionen.", 'error')
+                cache_key = None
 
-        # Zeilen verarbeiten
-        transactions = []
-        for r in rows:
-            date_val = r[1]
-            if isinstance(date_val, str):
-                date_val = date.fromisoformat(date_val)
-            transactions.append({
-                'id': r[0],
-                'date': date_val,
-                'description': r[2],
-                'usage': r[3],
-                'amount': float(r[4]),
-                'paid': bool(r[5]),
-                'recurring_id': r[6],
-            })
-
-        # Saldo und offene Fixkosten berechnen
-        saldo = sum(t['amount'] for t in transactions)
-        offen = sum(
-            -t['amount']
-            for t in transactions
-            if t['amount'] < 0 and not t['paid'] and t['recurring_id'] is not None
+        row_context = dict(
+            transactions=transactions,
+            after=after,
+            year=year_str,
+            month=month_str,
+            q=q,
+            desktop=request.args.get('desktop'),
         )
-        logging.info(f"Dashboard: Berechneter Saldo: {saldo}, Offene Fixkosten: {offen}")
-
-        # Verfügbare Jahre und Monate ermitteln
-        available_years = []
-        available_months = []
+        # "Weitere laden" holt per fetch nur die nächsten Tabellenzeilen
+        if partial:
+            return stream_template('dashboard_rows.html', **row_context)
+
+        # Saldo, offene Fixkosten und Navigation aus den vorberechneten
+        # Monatssummen (monthly_totals) statt aus allen Buchungen des Zeitraums.
+        # Mit Suchbegriff gelten die Summen für alle Treffer des Zeitraums.
+        saldo, offen = 0, 0
+        nav_key = (user_id, 'nav', year_str if year_str.isdigit() else None)
+        nav = ledger_cache.get(nav_key, version)
         try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-
-            # Jahre
-            cur.execute(
-                f"""
-                SELECT DISTINCT {year_expr} AS year
-                  FROM transactions
-                 WHERE user_id = {ph}
-                 ORDER BY year DESC
-                """,
-                (user_id,)
-            )
-            available_years = [int(r[0]) for r in cur.fetchall()]
-
-            # Monate (sofern kein Archiv)
-            if year_str.lower() != 'archiv':
-                sel_year = int(year_str)
-                cur.execute(
-                    f"""
-                    SELECT DISTINCT {month_expr} AS month
-                      FROM transactions
-                     WHERE user_id = {ph} AND {year_expr} = {ph}
-                     ORDER BY month ASC
-                    """,
-                    (user_id, sel_year)
-                )
-                available_months = [int(r[0]) for r in cur.fetchall()]
+            if cached:
+                saldo, offen = cached['saldo'], cached['offen']
+            else:
+                conn = get_db(readonly=True)
+                if q:
+                    period = totals.search_totals(conn, user_id, start, end, q)
+                else:
+                    period = totals.period_totals(conn, user_id, start, end)
+                if projection.FIXKOSTEN_VIRTUAL:
+                    proj = proj or projection.load(conn, user_id)
+                    virtual = proj.page(start, end)
+                    if q:
+                        virtual = [r for r in virtual if projection.matches(r, q)]
+                    extra = proj.totals(start, end, virtual)
+                    period = {k: period[k] + extra[k] for k in ('saldo', 'offen')}
+                saldo, offen = from_cents(period['saldo']), from_cents(period['offen'])
+            logging.info(f"Dashboard: Saldo: {saldo}, Offene Fixkosten: {offen}")
+
+            fresh = {}
+            if cache_key and not cached:
+                fresh[cache_key] = {'rows': transactions.result, 'saldo': saldo, 'offen': offen}
+            if nav is None:
+                conn = get_db(readonly=True)
+                nav = {'years': totals.available_years(conn, user_id), 'months': []}
+                if year_str.isdigit():
+                    nav['months'] = totals.available_months(conn, user_id, int(year_str))
+                if projection.FIXKOSTEN_VIRTUAL:
+                    # Monate, in denen nur virtuelle Termine liegen
+                    proj = proj or projection.load(conn, user_id)
+                    months = proj.months()
+                    nav['years'] = sorted(set(nav['years']) | {y for y, _ in months}, reverse=True)
+                    if year_str.isdigit():
+                        nav['months'] = sorted(set(nav['months']) | {m for y, m in months if y == int(year_str)})
+                fresh[nav_key] = nav
+
+            # Nur Stände der Primär-DB bzw. Replik cachen, nicht den Offline-Fallback
+            if fresh and not g.get('db_degraded'):
+                if version is None:
+                    version = dataversion.current(get_db(readonly=True), user_id)
+                if version is not None:
+                    for key, value in fresh.items():
+                        ledger_cache.put(key, version, value)
+        except (DatabaseUnavailable, QueryTimeout):
+            raise  # → 503-/Timeout-Seite statt generischer Fehlermeldung
         except Exception as e:
-            logging.error("Dashboard: Fehler beim Abrufen verfügbarer Jahre/Monate:", exc_info=True)
-        finally:
-            if conn:
-                conn.close()
-
-        # Template rendern
-        return render_template(
+            logging.error("Dashboard: Fehler beim Laden der Monatssummen:", exc_info=True)
+        nav = nav or {'years': [], 'months': []}
+
+        # Template streamen – Kopf und Summen gehen sofort raus, die Tabelle
+        # folgt Zeile für Zeile aus dem Cursor. Die Session-Cookie ist dann
+        # schon geschrieben, Flash-Meldungen werden deshalb vorher abgeholt.
+        get_flashed_messages(with_categories=True)
+        return stream_template(
             'dashboard_template.html',
+            **row_context,
             username=session.get('username'),
-            year=year_str,
-            month=month_str,
             current_year=str(today.year),
-            transactions=transactions,
-            q=q,
             saldo=saldo,
             offen=offen,
             user_id=user_id,
             is_admin=session.get('is_admin', False),
-            available_years=available_years,
-            available_months=available_months
+            available_years=nav['years'],
+            available_months=nav['months']
         )
 
     @app.route('/add_entry', methods=['POST'])
@@ -367,7 +499,7 @@ def create_app():
         user_id = session['user_id']
         desc = request.form.get('description', '').strip()
         usage = request.form.get('usage', '').strip()
-        amount_raw = request.form.get('amount', '').replace(',', '.').strip()
+        amount_raw = request.form.get('amount', '').strip()
         # duration_str wurde aus dem Formular entfernt, ist aber noch in der Logik relevant
         # Hier müsstest du entscheiden, wie wiederkehrende Einträge hinzugefügt werden.
         # Wenn sie nur über "Fixkosten" hinzugefügt werden, kann duration hier weg.
@@ -381,55 +513,42 @@ def create_app():
              flash("Beschreibung, Verwendungszweck und Betrag sind erforderlich.", 'error')
              return redirect(url_for('dashboard'))
 
-        try:
-            amount = float(amount_raw)
-        except ValueError:
+        amount = parse_decimal(amount_raw)
+        if amount is None:
             flash("Ungültiger Betrag eingegeben.", 'error')
             return redirect(url_for('dashboard'))
+        amount = to_cents(amount)
 
         conn = None
         try:
-            conn = get_db_connection() # Verwendet die angepasste Funktion
-            cur = conn.cursor()
-
-            # Bestimme den Datenbanktyp und den passenden Platzhalter
-            db_type = os.getenv("DATABASE_TYPE", "postgresql").lower()
-            placeholder = "%s" if db_type == "postgresql" else "?"
+            conn = get_db() # Request-Verbindung aus dem Pool
 
             # Annahme: add_entry fügt nur einmalige Einträge hinzu (kein duration Feld mehr im HTML)
-            # Füge einmalige Transaktion in transactions Tabelle ein
             # Einmalige Buchungen sind standardmäßig bezahlt (paid=TRUE), haben keine recurring_id
-            sql = f"""
-                INSERT INTO transactions
-                  (user_id, date, description, "usage", amount, paid, recurring_id)
-                VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder})
-            """
-            # SQLite benötigt 0 für FALSE und 1 für TRUE
-            paid_value = True if db_type == "postgresql" else 1
-
-            # Datum als ISO-String speichern (funktioniert in beiden gut)
             try:
                 entry_date = date.fromisoformat(entry_date_str)
             except ValueError:
                 flash("Ungültiges Datumsformat.", 'error')
                 return redirect(url_for('dashboard'))
 
-
-            cur.execute(sql, (user_id, entry_date.isoformat(), desc, usage, amount, paid_value, None))
+            Q.execute(conn, Q.INSERT_TRANSACTION,
+                      user_id=user_id, date=entry_date, description=desc, usage=usage,
+                      amount=amount, paid=True, recurring_id=None)
+            totals.refresh_months(conn, user_id, [entry_date])
+            version = dataversion.bump(conn, user_id)
             conn.commit()
+            ledger_cache.invalidate(user_id, [entry_date], version)
             flash("Einmaliger Eintrag erfolgreich hinzugefügt.", 'success')
 
 
+        except (DatabaseUnavailable, QueryTimeout):
+            raise  # → 503-/Timeout-Seite statt generischer Fehlermeldung
         except Exception as e:
              logging.error(f"AddEntry: Fehler beim Hinzufügen des Eintrags für Nutzer {user_id}:", exc_info=True)
              if conn:
                 conn.rollback()
              flash("Fehler beim Hinzufügen des Eintrags.", 'error')
 
-        finally:
-            if conn:
-                conn.close()
-
         return redirect(url_for('dashboard'))
 
 
@@ -453,9 +572,13 @@ def create_app():
         valid_ids = []
         for entry_id_str in ids_to_delete_str:
             try:
-                valid_ids.append(int(entry_id_str))
+                entry_id = int(entry_id_str)
             except ValueError:
                 logging.warning(f"DeleteEntries: Ungültige ID '{entry_id_str}' in Anfrage erhalten.")
+                continue
+            # Virtuelle Fixkosten-Termine (negative id) gehören zur Serie, nicht zu transactions
+            if entry_id > 0:
+                valid_ids.append(entry_id)
 
         if not valid_ids:
              flash("Keine gültigen Einträge zum Löschen ausgewählt.", 'error')
@@ -466,41 +589,33 @@ def create_app():
         conn = None
         deleted_count = 0
         try:
-            conn = get_db_connection() # Verwendet die angepasste Funktion
-            cur = conn.cursor()
-
-            # Bestimme den Datenbanktyp und den passenden Platzhalter
-            db_type = os.getenv("DATABASE_TYPE", "postgresql").lower()
-            placeholder = "%s" if db_type == "postgresql" else "?"
-
-            # Lösche die Transaktionen. Verwende IN Clause sicher.
-            # SQL-Abfrage verwendet IN Clause sicher
-            # Erstelle einen String wie "id IN (%s, %s, ...)" oder "id IN (?, ?, ...)"
-            id_placeholders = ', '.join([placeholder] * len(valid_ids))
-            sql = f"DELETE FROM transactions WHERE id IN ({id_placeholders}) AND user_id = {placeholder}"
-            delete_params = valid_ids + [user_id] # Parameterliste zusammenfügen
-
-            cur.execute(sql, delete_params)
-            deleted_count = cur.rowcount
+            conn = get_db() # Request-Verbindung aus dem Pool
+
+            # Lösche die Transaktionen (IN-Liste als expandierender Parameter)
+            deleted = Q.execute(conn, Q.DELETE_TRANSACTIONS, ids=valid_ids, user_id=user_id).fetchall()
+            deleted_count = len(deleted)
+            totals.refresh_months(conn, user_id, [r.date for r in deleted])
+            version = dataversion.bump(conn, user_id)
             conn.commit()
+            ledger_cache.invalidate(user_id, [r.date for r in deleted], version)
 
             logging.info(f"DeleteEntries: Erfolgreich {deleted_count} Transaktion(en) für Nutzer {user_id} gelöscht.")
             flash(f"{deleted_count} Eintrag(e) erfolgreich gelöscht.", 'success')
 
+        except (DatabaseUnavailable, QueryTimeout):
+            raise  # → 503-/Timeout-Seite statt generischer Fehlermeldung
         except Exception as e:
             logging.error(f"DeleteEntries: Fehler beim Löschen der Einträge für Nutzer {user_id}:", exc_info=True)
             if conn:
                 conn.rollback()
             flash("Fehler beim Löschen der Einträge.", 'error')
 
-        finally:
-            if conn:
-                conn.close()
-
         return redirect(url_for('dashboard'))
 
 
     @app.route('/fixkosten', methods=['GET', 'POST'])
+    @statement_timeout(FIXKOSTEN_TIMEOUT_MS)
+    @conditional_get
     def fixkosten():
         if not session.get('user_id'):
             flash("Bitte melde dich an, um Fixkosten zu verwalten.", 'warning')
@@ -513,61 +628,62 @@ def create_app():
         user_id = session['user_id']
         conn = None
 
-        # Bestimme den Datenbanktyp und den passenden Platzhalter für diese Route
-        db_type = os.getenv("DATABASE_TYPE", "postgresql").lower()
-        placeholder = "%s" if db_type == "postgresql" else "?"
-
         if request.method == 'POST':
-             conn = get_db_connection() # Verwendet die angepasste Funktion
-             cur = conn.cursor()
+             conn = get_db() # Request-Verbindung aus dem Pool
              try:
                 if request.form.get('add_fix'):
                     desc = request.form.get('description', '').strip()
                     usage = request.form.get('usage', '').strip()
-                    amount_raw = request.form.get('amount', '0').replace(',', '.').strip()
-                    duration_str = request.form.get('duration', '').strip()
+                    amount_raw = request.form.get('amount', '0').strip()
                     start_iso = request.form.get('start_date', date.today().isoformat())
-
-                    if not desc or not usage or not amount_raw or not duration_str or not start_iso:
+                    # Wiederholung: Frequenz/Intervall oder RRULE; Anzahl und Enddatum
+                    # optional – ohne beides läuft die Serie unbegrenzt
+                    frequency = request.form.get('frequency', 'monthly').strip()
+                    interval_str = request.form.get('interval', '').strip() or '1'
+                    duration_str = request.form.get('duration', '').strip() or '0'
+                    until_iso = request.form.get('until', '').strip()
+                    rrule_text = request.form.get('rrule', '').strip()
+
+                    if not desc or not usage or not amount_raw or not start_iso:
                          flash("Alle Fixkosten-Felder sind erforderlich.", 'error')
                     else:
                         try:
-                            amount = float(amount_raw)
-                            dur = int(duration_str)
-                            sd = date.fromisoformat(start_iso).replace(day=1)
-                        except ValueError:
-                            flash("Ungültige Fixkosten-Daten (Betrag, Dauer oder Startdatum).", 'error')
-                        else:
-                            if not (1 <= dur <= 12):
-                                flash("Dauer muss zwischen 1 und 12 Monaten liegen.", 'error')
+                            amount = parse_decimal(amount_raw)
+                            if amount is None:
+                                raise ValueError(amount_raw)
+                            amount = to_cents(amount)
+                            sd = date.fromisoformat(start_iso)
+                            if rrule_text:
+                                rule = parse_rrule(rrule_text, sd)
                             else:
-                                logging.info(f"Fixkosten: Füge neuen wiederkehrenden Eintrag für Nutzer {user_id} hinzu.")
-                                try:
-                                    # Bestimme den Platzhalter für die recurring_entries Tabelle
-                                    rec_entry_placeholder = "%s" if db_type == "postgresql" else "?"
-
-                                    # 1) recurring_entries anlegen
-                                    sql_rec = f"""
-                                        INSERT INTO recurring_entries
-                                          (user_id, description, "usage", amount, duration, start_date)
-                                        VALUES ({rec_entry_placeholder}, {rec_entry_placeholder}, {rec_entry_placeholder}, {rec_entry_placeholder}, {rec_entry_placeholder}, {rec_entry_placeholder})
-                                        RETURNING id
-                                    """
-                                    cur.execute(sql_rec, (user_id, desc, usage, amount, dur, sd.isoformat()))
-                                    rec_id = cur.fetchone()[0]
-                                    conn.commit()
-
-                                    # 2) Monats-Transaktionen erzeugen
-                                    # create_fix_transactions muss die richtige DB-Verbindung über get_db_connection nutzen
-                                    # und mit dem passenden Platzhalter arbeiten können!
-                                    create_fix_transactions(user_id, rec_id, sd, amount, dur)
-                                    conn.commit()
-                                    flash(f"Fixkosten ({dur} Monate) angelegt und zugehörige Transaktionen erstellt.", 'success')
-
-                                except Exception as e:
-                                     logging.error(f"Fixkosten: Fehler beim Hinzufügen der Fixkosten für Nutzer {user_id}:", exc_info=True)
-                                     conn.rollback()
-                                     flash("Fehler beim Hinzufügen der Fixkosten.", 'error')
+                                rule = Rule.create(sd, frequency, int(interval_str), int(duration_str),
+                                                   date.fromisoformat(until_iso) if until_iso else None)
+                        except ValueError as e:
+                            logging.info(f"Fixkosten: ungültige Eingabe von Nutzer {user_id}: {e}")
+                            flash("Ungültige Fixkosten-Daten (Betrag, Wiederholung oder Datum).", 'error')
+                        else:
+                            logging.info(f"Fixkosten: Füge neuen wiederkehrenden Eintrag für Nutzer {user_id} hinzu ({rule.rrule()}).")
+                            try:
+                                # 1) recurring_entries anlegen
+                                rec_id = Q.execute(conn, Q.INSERT_RECURRING,
+                                                   user_id=user_id, description=desc, usage=usage,
+                                                   amount=amount, duration=rule.count, start_date=rule.start,
+                                                   frequency=rule.frequency, freq_interval=rule.interval,
+                                                   until=rule.until).scalar_one()
+
+                                # 2) Transaktionen erzeugen – in derselben Transaktion,
+                                # damit nie eine Serie ohne (oder mit halben) Buchungen bleibt
+                                created = create_fix_transactions(conn, user_id, rec_id, rule, amount)
+                                version = dataversion.bump(conn, user_id)
+                                conn.commit()
+                                # Ab Serienbeginn: offene Serien reichen über die gebuchten Termine hinaus
+                                ledger_cache.invalidate(user_id, [rule.start, *created], version)
+                                flash(f"Fixkosten ({rule.describe()}) angelegt und zugehörige Transaktionen erstellt.", 'success')
+
+                            except Exception as e:
+                                 logging.error(f"Fixkosten: Fehler beim Hinzufügen der Fixkosten für Nutzer {user_id}:", exc_info=True)
+                                 conn.rollback()
+                                 flash("Fehler beim Hinzufügen der Fixkosten.", 'error')
 
 
                 elif request.form.get('delete_fix'):
@@ -585,14 +701,23 @@ def create_app():
                         if valid_ids:
                             logging.info(f"Fixkosten: Nutzer {user_id} versucht, Fixkosten mit IDs {valid_ids} zu löschen.")
                             try:
-                                # Lösche die wiederkehrenden Einträge.
-                                rec_id_placeholders = ', '.join([placeholder] * len(valid_ids))
-                                sql_del_rec = f"DELETE FROM recurring_entries WHERE id IN ({rec_id_placeholders}) AND user_id = {placeholder}"
-                                delete_params = valid_ids + [user_id]
+                                # Zugehörige Buchungen zuerst: offene fallen weg, bezahlte bleiben
+                                # als Einzelbuchung erhalten. Sonst verletzt das Löschen den
+                                # Fremdschlüssel transactions.recurring_id.
+                                removed = Q.execute(conn, Q.DELETE_OPEN_RECURRING_TRANSACTIONS,
+                                                    ids=valid_ids, user_id=user_id).fetchall()
+                                totals.refresh_months(conn, user_id, [r.date for r in removed])
+                                version = dataversion.bump(conn, user_id)
+                                detached = Q.execute(conn, Q.DETACH_RECURRING_TRANSACTIONS,
+                                                     ids=valid_ids, owner_id=user_id).fetchall()
 
-                                cur.execute(sql_del_rec, delete_params)
-                                deleted_count = cur.rowcount
+                                # Lösche die wiederkehrenden Einträge.
+                                series = Q.execute(conn, Q.DELETE_RECURRING, ids=valid_ids, user_id=user_id).fetchall()
+                                deleted_count = len(series)
                                 conn.commit()
+                                # Ab Serienbeginn: dort lagen ggf. auch virtuelle Termine (core/projection.py)
+                                ledger_cache.invalidate(user_id, [r.date for r in removed + detached]
+                                                        + [r.start_date for r in series], version)
 
                                 logging.info(f"Fixkosten: Erfolgreich {deleted_count} wiederkehrende Einträge für Nutzer {user_id} gelöscht.")
                                 flash(f"{deleted_count} Fixkosten erfolgreich gelöscht.", 'success')
@@ -608,37 +733,22 @@ def create_app():
                   if conn: conn.rollback()
                   flash("Ein unerwarteter Fehler ist aufgetreten.", 'error')
 
-             finally:
-                  if conn:
-                     conn.close()
-
 
         # Handle GET request (oder nach POST, um die aktualisierte Liste anzuzeigen)
-        conn = None # Neue Verbindung für GET oder nach POST
         rows = []
         try:
-            conn = get_db_connection() # Verwendet die angepasste Funktion
-            cur = conn.cursor()
+            conn = get_db(readonly=True) # Request-Verbindung aus dem Pool
             # Hole alle wiederkehrenden Einträge für den angemeldeten Benutzer
-            sql_select = f"""
-                SELECT id, description, "usage", amount, duration, start_date
-                  FROM recurring_entries
-                 WHERE user_id = {placeholder}
-                 ORDER BY start_date DESC, id DESC
-            """
-            cur.execute(sql_select, (user_id,))
-            rows = cur.fetchall()
+            rows = Q.execute(conn, Q.RECURRING_LIST, user_id=user_id).fetchall()
             logging.info(f"Fixkosten: {len(rows)} wiederkehrende Einträge für Nutzer {user_id} gefunden.")
 
+        except (DatabaseUnavailable, QueryTimeout):
+            raise  # → 503-/Timeout-Seite statt generischer Fehlermeldung
         except Exception as e:
              logging.error(f"Fixkosten: Fehler beim Abrufen der wiederkehrenden Einträge für Nutzer {user_id}:", exc_info=True)
              rows = []
              flash("Fehler beim Laden der Fixkosten.", 'error')
 
-        finally:
-             if conn:
-                conn.close()
-
         fixes = []
         try:
             fixes = [
@@ -646,9 +756,9 @@ def create_app():
                     'id': r[0],
                     'description': r[1],
                     'usage': r[2],
-                    'amount': float(r[3]),
-                    'duration': r[4],
-                    'start_date': date.fromisoformat(r[5]) if isinstance(r[5], str) else r[5], # Datum bei Bedarf konvertieren
+                    'amount': from_cents(r[3]),
+                    'rule': Rule.of(r).describe(),
+                    'start_date': as_date(r.start_date),
                 }
                 for r in rows
             ]
@@ -666,7 +776,8 @@ def create_app():
         )
 
 
-    @app.route('/api/transaction/<int:transaction_id>/toggle_paid', methods=['POST'])
+    # Negative ids sind virtuelle Fixkosten-Termine (core/projection.py)
+    @app.route('/api/transaction/<int(signed=True):transaction_id>/toggle_paid', methods=['POST'])
     def toggle_paid_api(transaction_id):
         # Prüfe, ob Benutzer angemeldet ist
         if not session.get('user_id'):
@@ -682,44 +793,59 @@ def create_app():
 
         conn = None
         try:
-            conn = get_db_connection() # Verwendet die angepasste Funktion
-            cur = conn.cursor()
-
-            # Bestimme den Datenbanktyp und den passenden Platzhalter
-            db_type = os.getenv("DATABASE_TYPE", "postgresql").lower()
-            placeholder = "%s" if db_type == "postgresql" else "?"
+            conn = get_db() # Request-Verbindung aus dem Pool
 
             # Führe das Update durch. Stelle sicher, dass nur der eigene Eintrag aktualisiert wird.
-            # SQLite nutzt 0/1 für BOOLEAN
-            paid_value_in_db = True if new_paid_status == 1 else False
-
-            sql = f"""
-                UPDATE transactions
-                SET paid = {placeholder}
-                WHERE id = {placeholder} AND user_id = {placeholder} AND recurring_id IS NOT NULL AND amount < 0
-            """
-            cur.execute(sql, (paid_value_in_db, transaction_id, user_id))
+            if transaction_id < 0:
+                # Virtueller Termin: erst jetzt entsteht die echte Buchung
+                updated = projection.materialize(conn, user_id, transaction_id, new_paid_status == 1)
+            else:
+                updated = Q.execute(conn, Q.SET_TRANSACTION_PAID,
+                                    paid_value=new_paid_status == 1, transaction_id=transaction_id,
+                                    owner_id=user_id).fetchall()
 
-            if cur.rowcount == 0:
+            if not updated:
                  # Wenn keine Zeile aktualisiert wurde, bedeutet das, dass der Eintrag nicht existiert,
                  # nicht dem Benutzer gehört, keine Fixkosten ist oder nicht negativ ist.
                  conn.rollback() # Nichts zu committen, aber Rollback ist gute Praxis
                  logging.warning(f"TogglePaid: Update nicht durchgeführt für trans_id {transaction_id}, user_id {user_id}. Kriterien nicht erfüllt oder nicht gefunden.")
                  return jsonify({'success': False, 'error': 'Eintrag nicht gefunden oder nicht aktualisierbar.'}), 404
 
+            totals.refresh_months(conn, user_id, [r.date for r in updated])
+            version = dataversion.bump(conn, user_id)
             conn.commit()
+            ledger_cache.invalidate(user_id, [r.date for r in updated], version)
             logging.info(f"TogglePaid: Status für transaction {transaction_id} auf {new_paid_status} gesetzt durch user {user_id}.")
             return jsonify({'success': True, 'message': 'Status erfolgreich aktualisiert.'}), 200
 
+        except (DatabaseUnavailable, QueryTimeout):
+            raise  # → 503-/Timeout-Seite statt generischer Fehlermeldung
         except Exception as e:
             logging.error(f"TogglePaid: Fehler beim Aktualisieren von transaction {transaction_id} durch user {user_id}: {e}", exc_info=True)
             if conn:
                 conn.rollback()
             return jsonify({'success': False, 'error': 'Interner Serverfehler beim Aktualisieren.'}), 500
 
-        finally:
-            if conn:
-                conn.close()
+
+    @app.route('/api/search')
+    def search_api():
+        """Beste Treffer für das Suchfeld (Vorschläge während der Eingabe)."""
+        if not session.get('user_id'):
+            return jsonify({'success': False, 'error': 'Nicht authentifiziert.'}), 401
+
+        q = request.args.get('q', '').strip()
+        if len(q) < 2:
+            return jsonify({'success': True, 'results': []})
+        try:
+            hits = search.ranked(get_db(readonly=True), session['user_id'], q)
+        except (DatabaseUnavailable, QueryTimeout):
+            raise  # → 503-/Timeout-Antwort statt generischer Fehlermeldung
+        except Exception as e:
+            logging.error(f"Suche: Fehler bei '{q}': {e}", exc_info=True)
+            return jsonify({'success': False, 'error': 'Interner Serverfehler bei der Suche.'}), 500
+        for hit in hits:
+            hit['date'] = as_date(hit['date']).isoformat()
+        return jsonify({'success': True, 'results': hits})
 
 
     # --- Update-Route (Angepasst für Desktop-Nutzer OHNE Login/Admin Check) ---
@@ -806,6 +932,9 @@ def create_app():
 
     # 2) registriere Deine Blueprints
     app.register_blueprint(vorschlaege_bp)  # Vorschläge unter /<prefix>
+    app.register_blueprint(reports_bp)      # Berichte unter /reports
+    app.register_blueprint(export_bp)       # Export unter /export
+    app.register_blueprint(bankimport_bp)   # Kontoauszug-Import unter /import
     app.register_blueprint(sync_bp)         # Sync-API unter /api/sync
 
     return app
@@ -0,0 +1,95 @@
+# cli/commands.py – Wartungsbefehle für die Flask-CLI (flask --app "app:create_app()" …)
+from datetime import date
+
+import click
+
+from core.db import SQLITE_PATH, get_db_connection, sqlite_maintenance
+from core import totals
+from core import export
+from core import bankimport
+from core import dataversion
+from core.scheduler import scheduler
+
+
+@click.command("rebuild-totals")
+@click.option("--user-id", type=int, default=None, help="Nur diesen Nutzer neu aufbauen (Standard: alle).")
+def rebuild_totals_command(user_id):
+    """Baut die Monatssummen (monthly_totals) aus den Transaktionen neu auf."""
+    conn = get_db_connection()
+    try:
+        totals.rebuild(conn, user_id)
+        # Neue Datenversion, sonst bestätigen ETag/304 und Ledger-Cache den alten Stand
+        if user_id is None:
+            dataversion.bump_all(conn)
+        else:
+            dataversion.bump(conn, user_id)
+        conn.commit()
+    finally:
+        conn.close()
+    click.echo("Monatssummen neu aufgebaut.")
+
+
+@click.command("export-transactions")
+@click.option("--user-id", type=int, required=True, help="Nutzer, dessen Buchungen exportiert werden.")
+@click.option("--format", "fmt", type=click.Choice(sorted(export.FORMATS)), default="csv", show_default=True)
+@click.option("--start", type=click.DateTime(formats=["%Y-%m-%d"]), default=None, help="Ab diesem Tag (JJJJ-MM-TT).")
+@click.option("--end", type=click.DateTime(formats=["%Y-%m-%d"]), default=None, help="Bis vor diesen Tag (JJJJ-MM-TT).")
+@click.option("--gzip", "compress", is_flag=True, help="Ausgabe gzip-komprimieren.")
+@click.option("-o", "--output", type=click.File("wb"), default="-", help="Zieldatei (Standard: stdout).")
+def export_transactions_command(user_id, fmt, start, end, compress, output):
+    """Exportiert die Buchungen eines Nutzers als CSV, NDJSON oder Parquet."""
+    if not export.available(fmt):
+        raise click.UsageError("Parquet-Export braucht pyarrow.")
+    start = start.date() if start else date.min
+    end = end.date() if end else date.max
+    conn = get_db_connection()
+    try:
+        for chunk in export.stream(conn, user_id, start, end, fmt, compress):
+            output.write(chunk)
+    finally:
+        conn.close()
+
+
+@click.command("import-statement")
+@click.option("--user-id", type=int, required=True, help="Nutzer, dem die Umsätze zugeordnet werden.")
+@click.option("--format", "fmt", type=click.Choice(sorted(bankimport.PARSERS)), default=None,
+              help="Dateiformat (Standard: automatisch erkennen).")
+@click.argument("file", type=click.File("rb"))
+def import_statement_command(user_id, fmt, file):
+    """Importiert einen Kontoauszug (CSV, CAMT.053 oder MT940); bereits vorhandene Umsätze werden übersprungen."""
+    conn = get_db_connection()
+    try:
+        stats = bankimport.import_file(conn, user_id, file, fmt, file.name,
+                                       progress=lambda n: click.echo(f"{n} Umsätze gelesen …", err=True))
+        dataversion.bump(conn, user_id)
+        conn.commit()
+    finally:
+        conn.close()
+    click.echo(f"{stats['inserted']} importiert, {stats['duplicates']} bereits vorhanden, "
+               f"{stats['skipped']} übersprungen ({stats['format']}).")
+
+
+@click.command("materialize-fixkosten")
+def materialize_fixkosten_command():
+    """Legt die fälligen Fixkosten-Buchungen aller Nutzer an (ein Lauf des Schedulers)."""
+    metrics = scheduler.run_once()
+    click.echo(f"{metrics['users']} Nutzer, {metrics['inserted']} Buchungen angelegt "
+               f"({metrics['duration_ms']} ms).")
+
+
+@click.command("vacuum-sqlite")
+@click.option("--path", default=SQLITE_PATH, show_default=True, help="SQLite-Datei.")
+def vacuum_sqlite_command(path):
+    """Schreibt die SQLite-Datei per VACUUM neu; aktiviert dabei auto_vacuum=INCREMENTAL (Migration 5)."""
+    if not sqlite_maintenance(path, vacuum=True):
+        raise click.ClickException(f"VACUUM für {path} fehlgeschlagen, siehe Log.")
+    click.echo(f"VACUUM für {path} ausgeführt.")
+
+
+def init_app(app):
+    """Registriert die Befehle an app.cli."""
+    app.cli.add_command(rebuild_totals_command)
+    app.cli.add_command(export_transactions_command)
+    app.cli.add_command(import_statement_command)
+    app.cli.add_command(materialize_fixkosten_command)
+    app.cli.add_command(vacuum_sqlite_command)
@@ -7,7 +7,7 @@ from sqlalchemy.exc import IntegrityError
 
 from core.db import Session
 from core.models import User
-from utils import check_password
+from utils_web import check_password  # Qt-freie Variante, utils zieht PySide6 nach
 
 
 def login_user(username: str, password: str) -> Tuple[bool, Union[str, Tuple[int, bool]]]:
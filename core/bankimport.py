@@ -0,0 +1,428 @@
+# core/bankimport.py – Import von Kontoauszügen (CSV, CAMT.053, MT940)
+"""
+Kontoauszüge werden zeilenweise gelesen (Generator je Format) und in
+Blöcken zu IMPORT_BATCH Umsätzen geschrieben – alles in einer Transaktion:
+
+* SQLite: executemany über Q.IMPORT_TRANSACTION
+* Postgres: COPY in die temporäre Tabelle import_staging, danach ein
+  einziges INSERT … SELECT (Q.IMPORT_FROM_STAGING)
+
+Jeder Umsatz trägt einen Inhalts-Hash aus Datum, Betrag (Cent) und
+Beschreibung; der eindeutige Index (user_id, content_hash) überspringt
+Umsätze, die schon importiert wurden (ON CONFLICT DO NOTHING). Gleiche
+Umsätze am selben Tag (zweimal derselbe Betrag beim selben Händler) werden
+über ihre laufende Nummer im Auszug unterschieden – ein erneuter Import
+desselben Auszugs legt nichts doppelt an.
+
+Importierte Umsätze gelten als bezahlt: description = Gegenseite,
+usage = Verwendungszweck.
+"""
+import codecs
+import csv
+import hashlib
+import io
+import logging
+import os
+import re
+import xml.etree.ElementTree as ET
+from datetime import date
+
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from core.db import get_db, statement_timeout
+from core import queries as Q
+from core import totals
+from core import dataversion
+from core.ledgercache import ledger_cache
+from core.version import __version__
+from utils_web import parse_decimal, to_cents
+
+# Umsätze je executemany bzw. COPY
+IMPORT_BATCH = int(os.getenv("IMPORT_BATCH", "1000"))
+# Obergrenze je Request (app.config['MAX_CONTENT_LENGTH'], siehe create_app)
+IMPORT_MAX_MB = float(os.getenv("IMPORT_MAX_MB", "20"))
+IMPORT_TIMEOUT_MS = int(os.getenv("DB_TIMEOUT_IMPORT_MS", "60000"))
+
+FORMATS = {"csv": "CSV", "camt": "CAMT.053 (XML)", "mt940": "MT940"}
+
+bp = Blueprint('bankimport', __name__, url_prefix='/import')
+
+
+# ── Hilfsfunktionen ──────────────────────────────────────────────────────────
+def parse_amount(text: str) -> int | None:
+    """'-1.234,56', '1234.56', '12,50 EUR' → Cent."""
+    text = re.sub(r"[\s\xa0€]|EUR", "", text or "")
+    if "," in text:
+        text = text.replace(".", "")   # deutsches Format: Punkt = Tausender
+    value = parse_decimal(text)
+    return None if value is None else to_cents(value)
+
+
+_DATE_DMY = re.compile(r"^(\d{1,2})[./](\d{1,2})[./](\d{2}|\d{4})$")
+_DATE_ISO = re.compile(r"^(\d{4})-(\d{2})-(\d{2})")
+
+
+def parse_date(text: str) -> date | None:
+    """'31.12.2024', '31.12.24', '31/12/2024', '2024-12-31' → date (ohne strptime, das bremst je Zeile)."""
+    text = (text or "").strip()
+    m = _DATE_DMY.match(text)
+    if m:
+        day, month, year = map(int, m.groups())
+        year += 2000 if year < 100 else 0
+    else:
+        m = _DATE_ISO.match(text)
+        if not m:
+            return None
+        year, month, day = map(int, m.groups())
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _clean(text) -> str:
+    return " ".join((text or "").split())
+
+
+def _text_stream(binary):
+    """Textsicht auf die Datei: UTF-8, sonst Windows-1252 (ältere Bank-Exporte)."""
+    head = binary.read(65536)
+    binary.seek(0)
+    try:
+        head.decode("utf-8")
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError as e:
+        # Abgeschnittenes Mehrbyte-Zeichen am Ende des Ausschnitts zählt nicht
+        encoding = "utf-8-sig" if e.start >= len(head) - 3 else "cp1252"
+    return io.TextIOWrapper(binary, encoding=encoding, errors="replace", newline="")
+
+
+def detect_format(binary, filename: str = "") -> str:
+    head = binary.read(4096)
+    binary.seek(0)
+    if head.lstrip(codecs.BOM_UTF8).lstrip().startswith(b"<") or filename.lower().endswith(".xml"):
+        return "camt"
+    if b":61:" in head or re.search(rb"(^|\n):20:", head) or filename.lower().endswith((".sta", ".mt940")):
+        return "mt940"
+    return "csv"
+
+
+# ── CSV ──────────────────────────────────────────────────────────────────────
+# Spaltennamen gängiger Bank-Exporte (klein geschrieben), bevorzugte zuerst
+_CSV_COLUMNS = {
+    "date": ["buchungstag", "buchungsdatum", "datum", "date", "wertstellung", "valutadatum", "valuta"],
+    "amount": ["betrag", "betrag (eur)", "betrag (€)", "betrag in eur", "umsatz", "umsatz in eur", "amount"],
+    "description": ["beguenstigter/zahlungspflichtiger", "begünstigter/zahlungspflichtiger",
+                    "name zahlungsbeteiligter", "zahlungsempfänger*in", "zahlungspflichtige*r",
+                    "auftraggeber / begünstigter", "auftraggeber/empfänger", "empfänger",
+                    "auftraggeber", "name", "description", "beschreibung"],
+    "usage": ["verwendungszweck", "usage", "buchungstext", "vorgang"],
+    "debit": ["soll", "soll (eur)"],
+    "credit": ["haben", "haben (eur)"],
+}
+
+
+def _csv_header(fields) -> dict | None:
+    names = [f.strip().strip('"').lower() for f in fields]
+    found = {}
+    for key, candidates in _CSV_COLUMNS.items():
+        for candidate in candidates:
+            if candidate in names:
+                found[key] = names.index(candidate)
+                break
+    has_amount = "amount" in found or ("debit" in found and "credit" in found)
+    return found if "date" in found and has_amount else None
+
+
+class _Semicolon(csv.excel):
+    """Fallback, wenn der Sniffer nichts erkennt: Semikolon wie bei deutschen Banken."""
+    delimiter = ";"
+
+
+def parse_csv(binary):
+    """Umsätze aus einem CSV-Export; Vorspann-Zeilen vor der Kopfzeile werden übersprungen."""
+    text = _text_stream(binary)
+    sample = text.read(8192)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+    except csv.Error:
+        dialect = _Semicolon
+    columns = None
+    for fields in csv.reader(text, dialect):
+        if columns is None:
+            columns = _csv_header(fields)
+            continue
+        cell = lambda key: fields[columns[key]] if key in columns and columns[key] < len(fields) else ""
+        if "amount" in columns:
+            amount = parse_amount(cell("amount"))
+        else:
+            credit, debit = parse_amount(cell("credit")) or 0, parse_amount(cell("debit")) or 0
+            amount = credit - abs(debit) if (cell("credit") or cell("debit")) else None
+        yield {
+            "date": parse_date(cell("date")),
+            "description": _clean(cell("description")),
+            "usage": _clean(cell("usage")),
+            "amount": amount,
+        }
+
+
+# ── CAMT.053 ─────────────────────────────────────────────────────────────────
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _find(elem, *path):
+    """Erstes Element entlang der lokalen Namen `path` (Namespace-unabhängig)."""
+    for name in path:
+        if elem is None:
+            return None
+        elem = next((child for child in elem if _local(child.tag) == name), None)
+    return elem
+
+
+def _text(elem, *path) -> str:
+    found = _find(elem, *path)
+    return found.text.strip() if found is not None and found.text else ""
+
+
+def _camt_party(tx, debit: bool) -> str:
+    # Bei Belastungen ist der Zahlungsempfänger die Gegenseite, sonst der Zahler
+    party = _find(tx, "RltdPties", "Cdtr" if debit else "Dbtr")
+    return _text(party, "Nm") or _text(party, "Pty", "Nm")
+
+
+def _camt_usage(tx) -> str:
+    info = _find(tx, "RmtInf")
+    if info is None:
+        return ""
+    return _clean(" ".join(child.text or "" for child in info if _local(child.tag) == "Ustrd"))
+
+
+def parse_camt(binary):
+    """Umsätze (Ntry) aus einer CAMT.053-Datei; jeder Eintrag wird nach dem Lesen verworfen."""
+    for _event, elem in ET.iterparse(binary, events=("end",)):
+        if _local(elem.tag) != "Ntry":
+            continue
+        debit = _text(elem, "CdtDbtInd") == "DBIT"
+        day = parse_date(_text(elem, "BookgDt", "Dt") or _text(elem, "BookgDt", "DtTm")
+                         or _text(elem, "ValDt", "Dt"))
+        details = _find(elem, "NtryDtls")
+        txs = [child for child in details if _local(child.tag) == "TxDtls"] if details is not None else []
+        # Sammelbuchung mit Einzelbeträgen → je Einzelumsatz eine Buchung
+        split = len(txs) > 1 and all(_text(tx, "AmtDtls", "TxAmt", "Amt") for tx in txs)
+        for tx in (txs if split else txs[:1] or [None]):
+            amount = parse_amount(_text(tx, "AmtDtls", "TxAmt", "Amt") if split else _text(elem, "Amt"))
+            tx_debit = (_text(tx, "CdtDbtInd") == "DBIT") if split and _text(tx, "CdtDbtInd") else debit
+            yield {
+                "date": day,
+                "description": _camt_party(tx, tx_debit) if tx is not None else "",
+                "usage": (_camt_usage(tx) if tx is not None else "") or _clean(_text(elem, "AddtlNtryInf")),
+                "amount": None if amount is None else (-abs(amount) if tx_debit else abs(amount)),
+            }
+        elem.clear()
+
+
+# ── MT940 ────────────────────────────────────────────────────────────────────
+_MT940_FIELD = re.compile(r"^:(\d{2}[A-Z]?):(.*)$")
+_MT940_61 = re.compile(r"^(\d{6})(\d{4})?(R?[CD])[A-Z]?(\d+,\d*)")
+_MT940_86_SUB = re.compile(r"\?(\d{2})")
+
+
+def _mt940_86(value: str) -> tuple:
+    """Feld 86 → (Gegenseite, Verwendungszweck); strukturiert mit ?20…?29, ?32/?33."""
+    value = value.replace("\n", "")
+    parts = _MT940_86_SUB.split(value)
+    if len(parts) < 3:
+        return "", _clean(value)
+    fields = {}
+    for code, content in zip(parts[1::2], parts[2::2]):
+        fields.setdefault(code, []).append(content)
+    usage = "".join("".join(fields.get(str(code), [])) for code in (*range(20, 30), *range(60, 64)))
+    name = "".join(fields.get("32", []) + fields.get("33", []))
+    return _clean(name), _clean(usage)
+
+
+def _mt940_row(f61: str, f86: str) -> dict:
+    m = _MT940_61.match(f61)
+    if not m:
+        return {"date": None, "description": "", "usage": "", "amount": None}
+    day = parse_date(f"{m.group(1)[4:6]}.{m.group(1)[2:4]}.{m.group(1)[:2]}")
+    amount = parse_amount(m.group(4))
+    # D = Belastung, RC = Storno einer Gutschrift
+    if amount is not None and m.group(3) in ("D", "RC"):
+        amount = -amount
+    name, usage = _mt940_86(f86)
+    return {"date": day, "description": name, "usage": usage, "amount": amount}
+
+
+def parse_mt940(binary):
+    """Umsätze (:61: mit folgendem :86:) aus einer MT940-Datei, zeilenweise."""
+    f61 = f86 = None
+    current = None
+    for line in _text_stream(binary):
+        line = line.rstrip("\r\n")
+        m = _MT940_FIELD.match(line)
+        if m:
+            tag, value = m.groups()
+            if tag == "61":
+                if f61 is not None:
+                    yield _mt940_row(f61, f86 or "")
+                f61, f86 = value, None
+            elif tag == "86" and f61 is not None:
+                f86 = value
+            current = tag
+        elif line.strip() == "-":
+            current = None
+        elif current == "86" and f86 is not None:
+            f86 += "\n" + line
+        elif current == "61" and f61 is not None:
+            pass  # Zusatzangaben zum Umsatz (Bankreferenz) werden nicht gebraucht
+    if f61 is not None:
+        yield _mt940_row(f61, f86 or "")
+
+
+PARSERS = {"csv": parse_csv, "camt": parse_camt, "mt940": parse_mt940}
+
+
+# ── Schreiben ────────────────────────────────────────────────────────────────
+def content_hash(day: date, amount: int, description: str, occurrence: int) -> str:
+    key = f"{day.isoformat()}|{amount}|{description.lower()}|{occurrence}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def _normalized(rows, stats: dict):
+    """Gültige Umsätze mit Inhalts-Hash; unvollständige Zeilen werden gezählt und übersprungen."""
+    seen = {}
+    for row in rows:
+        if row["date"] is None or row["amount"] is None:
+            stats["skipped"] += 1
+            continue
+        description = row["description"] or row["usage"][:60] or "Unbekannt"
+        key = (row["date"], row["amount"], description.lower())
+        seen[key] = seen.get(key, 0) + 1
+        yield {
+            "date": row["date"],
+            "description": description,
+            "usage": row["usage"],
+            "amount": row["amount"],
+            "content_hash": content_hash(row["date"], row["amount"], description, seen[key]),
+        }
+
+
+def _batches(rows, size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _copy_batch(cursor, batch) -> None:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in batch:
+        writer.writerow((row["date"].isoformat(), row["description"], row["usage"],
+                         row["amount"], row["content_hash"]))
+    buf.seek(0)
+    # FORCE_NOT_NULL: ein leerer Verwendungszweck bleibt '' statt NULL
+    cursor.copy_expert(
+        "COPY import_staging (date, description, usage, amount, content_hash) FROM STDIN "
+        "WITH (FORMAT csv, FORCE_NOT_NULL (description, usage))", buf)
+
+
+def import_rows(conn, user_id: int, rows, progress=None) -> dict:
+    """
+    Schreibt die Umsätze aus `rows` (Dicts mit date, description, usage,
+    amount in Cent) für `user_id` – ohne commit, der Aufrufer schließt ab.
+    `progress(gelesen)` wird nach jedem Block aufgerufen. Liefert
+    read, inserted, duplicates, skipped und die betroffenen Monate.
+    """
+    stats = {"read": 0, "inserted": 0, "duplicates": 0, "skipped": 0}
+    months = set()
+    postgres = conn.dialect.name == "postgresql"
+    if postgres:
+        Q.import_staging.create(conn)
+        cursor = conn.connection.dbapi_connection.cursor()
+
+    for batch in _batches(_normalized(rows, stats), IMPORT_BATCH):
+        if postgres:
+            _copy_batch(cursor, batch)
+        else:
+            result = Q.execute(conn, Q.IMPORT_TRANSACTION, [{**row, "user_id": user_id} for row in batch])
+            stats["inserted"] += max(result.rowcount, 0)
+        stats["read"] += len(batch)
+        months.update(date(row["date"].year, row["date"].month, 1) for row in batch)
+        logging.info(f"Import Nutzer {user_id}: {stats['read']} Umsätze gelesen.")
+        if progress:
+            progress(stats["read"])
+
+    if postgres:
+        cursor.close()
+        stats["inserted"] = Q.execute(conn, Q.IMPORT_FROM_STAGING, user_id=user_id).rowcount
+    stats["duplicates"] = stats["read"] - stats["inserted"]
+    if stats["inserted"]:
+        totals.refresh_months(conn, user_id, months)
+    stats["months"] = sorted(months)
+    return stats
+
+
+def import_file(conn, user_id: int, binary, fmt: str | None = None, filename: str = "", progress=None) -> dict:
+    """Liest eine Kontoauszug-Datei (binär, seekable) und importiert sie; ohne commit."""
+    fmt = fmt or detect_format(binary, filename)
+    logging.info(f"Import Nutzer {user_id}: Format {fmt} ({filename or 'ohne Namen'}).")
+    stats = import_rows(conn, user_id, PARSERS[fmt](binary), progress)
+    stats["format"] = fmt
+    return stats
+
+
+# ── Route ────────────────────────────────────────────────────────────────────
+@bp.errorhandler(RequestEntityTooLarge)
+def too_large(e):
+    # Werkzeug bricht beim Lesen von request.files ab, bevor der Upload im
+    # Speicher bzw. in einer Temp-Datei landet
+    flash(f"Datei zu groß (höchstens {IMPORT_MAX_MB:g} MB).", 'error')
+    return redirect(url_for('bankimport.index'))
+
+
+@bp.route('/', methods=['GET', 'POST'])
+@statement_timeout(IMPORT_TIMEOUT_MS)
+def index():
+    if not session.get('user_id'):
+        return redirect(url_for('login'))
+    user_id = session['user_id']
+
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        fmt = request.form.get('format') or None
+        if upload is None or not upload.filename:
+            flash("Bitte eine Datei auswählen.", 'error')
+        elif fmt is not None and fmt not in PARSERS:
+            flash("Unbekanntes Format.", 'error')
+        else:
+            conn = get_db()
+            try:
+                stats = import_file(conn, user_id, upload.stream, fmt, upload.filename)
+                version = dataversion.bump(conn, user_id)
+                conn.commit()
+            except (ET.ParseError, csv.Error, UnicodeError) as e:
+                conn.rollback()
+                logging.warning(f"Import Nutzer {user_id}: Datei nicht lesbar ({e}).")
+                flash("Die Datei konnte nicht gelesen werden.", 'error')
+            else:
+                ledger_cache.invalidate(user_id, stats["months"] if stats["inserted"] else [], version)
+                flash(f"{stats['inserted']} Umsätze importiert, {stats['duplicates']} bereits vorhanden"
+                      + (f", {stats['skipped']} Zeilen übersprungen." if stats['skipped'] else "."), 'success')
+        return redirect(url_for('bankimport.index'))
+
+    return render_template(
+        'import.html',
+        formats=FORMATS,
+        max_mb=IMPORT_MAX_MB,
+        username=session.get('username'),
+        version=__version__
+    )
@@ -0,0 +1,89 @@
+# core/breaker.py – Circuit Breaker für die Primär-Datenbank
+import logging
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+    Öffnet nach `threshold` aufeinanderfolgenden Verbindungsfehlern. Solange er
+    offen ist, scheitern Zugriffe sofort (statt jeweils den Connect-Timeout
+    abzuwarten). Ein Hintergrund-Thread ruft alle `probe_interval` Sekunden
+    `probe()` auf und schließt den Breaker beim ersten Erfolg wieder.
+
+    Zustände: 'closed' (normal), 'open' (fail fast), 'half_open' (Probe läuft).
+    """
+
+    def __init__(self, name: str, threshold: int, probe_interval: float, probe):
+        self.name = name
+        self.threshold = max(1, threshold)
+        self.probe_interval = probe_interval
+        self.probe = probe
+        self.state = "closed"
+        self.failures = 0
+        self.trips = 0
+        self.rejected = 0
+        self.opened_at = None
+        # Nur der Klassenname – der Text des Treibers enthält Host, IP und Port
+        # und landet über status() in /health/db; der volle Text steht im Log
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True, wenn Zugriffe auf die Datenbank versucht werden dürfen."""
+        if self.state == "closed":
+            return True
+        with self._lock:
+            self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        if self.failures:
+            with self._lock:
+                self.failures = 0
+
+    def record_failure(self, exc: BaseException) -> None:
+        with self._lock:
+            self.failures += 1
+            self.last_error = type(exc).__name__
+            if self.state != "closed" or self.failures < self.threshold:
+                return
+            self.state = "open"
+            self.trips += 1
+            self.opened_at = time.time()
+        logging.error(f"Circuit Breaker '{self.name}' geöffnet nach {self.failures} Verbindungsfehlern: "
+                      f"{type(exc).__name__}: {exc}".strip())
+        threading.Thread(target=self._probe_loop, name=f"breaker-{self.name}", daemon=True).start()
+
+    def _probe_loop(self) -> None:
+        while True:
+            time.sleep(self.probe_interval)
+            with self._lock:
+                self.state = "half_open"
+            try:
+                self.probe()
+            except Exception as e:
+                with self._lock:
+                    self.state = "open"
+                    self.last_error = type(e).__name__
+                logging.debug(f"Circuit Breaker '{self.name}': Probe fehlgeschlagen ({e})")
+                continue
+            with self._lock:
+                self.state = "closed"
+                self.failures = 0
+                downtime = time.time() - (self.opened_at or time.time())
+                self.opened_at = None
+            logging.info(f"Circuit Breaker '{self.name}' geschlossen – Datenbank nach {downtime:.0f} s wieder erreichbar.")
+            return
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "threshold": self.threshold,
+                "trips": self.trips,
+                "rejected": self.rejected,
+                "open_since": self.opened_at,
+                "last_error": self.last_error,
+            }
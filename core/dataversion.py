@@ -0,0 +1,80 @@
+# core/dataversion.py – Datenversion je Nutzer, ETag/304 für lesende Seiten
+"""
+users.data_version wird von jedem Schreibpfad (Buchungen, Fixkosten,
+Vorschläge, Sync) in derselben Transaktion wie die Änderung hochgezählt.
+Lesende Seiten leiten daraus einen schwachen ETag ab:
+
+    @app.route('/dashboard')
+    @conditional_get
+    def dashboard(): ...
+
+Schickt der Browser (bzw. die Desktop-Webview) den ETag per If-None-Match
+zurück und hat sich nichts geändert, antwortet die Route mit 304, ohne die
+Transaktionen abzufragen – es kostet nur das Lesen einer Zeile aus users.
+"""
+import functools
+import hashlib
+import logging
+from datetime import date
+
+from flask import request, session, make_response, g
+
+from core import queries as Q
+from core.db import get_db
+from core.version import __version__
+
+
+def bump(conn, user_id: int) -> int | None:
+    """Zählt die Datenversion von `user_id` hoch (vor dem commit des Aufrufers) und gibt sie zurück."""
+    return Q.execute(conn, Q.BUMP_DATA_VERSION, owner_id=user_id).scalar()
+
+
+def bump_all(conn) -> int:
+    """Zählt die Datenversion aller Nutzer hoch; gibt die Anzahl der Nutzer zurück."""
+    return Q.execute(conn, Q.BUMP_ALL_DATA_VERSIONS).rowcount
+
+
+def current(conn, user_id: int) -> int | None:
+    return Q.execute(conn, Q.USER_DATA_VERSION, user_id=user_id).scalar()
+
+
+def etag_for(version: int) -> str:
+    """
+    ETag aus Datenversion und allem, was die Seite sonst noch bestimmt:
+    Pfad und Query-Argumente, Desktop-Modus, App-Version und das heutige
+    Datum (Standard-Jahr/-Monat im Dashboard).
+    """
+    args = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+    key = "|".join([request.path, args, str(session.get('is_desktop_session', False)),
+                    __version__, date.today().isoformat()])
+    return f"{version}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}"
+
+
+def conditional_get(view):
+    """
+    Beantwortet GET-Anfragen mit passendem If-None-Match mit 304 und setzt
+    sonst den (schwachen) ETag auf der Antwort. Ausstehende Flash-Meldungen
+    gehören zur Seite und schließen den 304 aus.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        user_id = session.get('user_id')
+        if request.method != 'GET' or not user_id or session.get('_flashes'):
+            return view(*args, **kwargs)
+
+        version = g.data_version = current(get_db(readonly=True), user_id)
+        if version is None:
+            return view(*args, **kwargs)
+        tag = etag_for(version)
+        if request.if_none_match.contains_weak(tag):
+            logging.debug(f"{request.endpoint}: unverändert (Version {version}), 304.")
+            response = make_response("", 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(tag, weak=True)
+        # Immer nachfragen, aber der Browser darf seine Kopie wiederverwenden
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
@@ -1,45 +1,576 @@
 import os
+import time
+import functools
 import logging
+import sqlite3
+import threading
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from flask import g, session, request, has_request_context
+from sqlalchemy import create_engine, event
+from sqlalchemy import exc as sa_exc
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker, scoped_session
 
-from core.models import Base
+from core.breaker import CircuitBreaker
+from core.migrations import run_migrations
 
 load_dotenv()
 
 MODE         = os.getenv("APP_MODE", "online").lower()
 SQLITE_PATH  = os.getenv("SQLITE_PATH", "local.db")
 POSTGRES_URL = os.getenv("DATABASE_URL")
+# Optionale Lese-Replik (z. B. Postgres-Streaming-Replica) für reine Lesezugriffe
+READ_URL     = os.getenv("DATABASE_READ_URL")
+# Nach einem Schreibzugriff liest die Session so lange vom Primary (read-your-writes)
+PRIMARY_PIN_SECONDS = float(os.getenv("DB_PRIMARY_PIN_SECONDS", "5"))
 
-if MODE == "offline":
-    DB_URL = f"sqlite:///{SQLITE_PATH}"
-elif not POSTGRES_URL:
-    raise RuntimeError("DATABASE_URL nicht gesetzt – bitte in .env eintragen.")
-else:
-    DB_URL = POSTGRES_URL
-
-engine = create_engine(DB_URL, echo=False)
-
-try:
-    Base.metadata.create_all(engine)
-    logging.info(f"Datenbank initialisiert: {DB_URL}")
-except OperationalError as e:
-    logging.warning(f"Remote-DB nicht erreichbar ({DB_URL}): {e}")
-    if MODE != "offline":
-        fallback = f"sqlite:///{SQLITE_PATH}"
-        engine = create_engine(fallback, echo=False)
-        Base.metadata.create_all(engine)
-        logging.info(f"SQLite-Fallback initialisiert: {fallback}")
-    else:
-        logging.error("Offline-Modus aktiv, kann SQLite-DB nicht anlegen.", exc_info=True)
-        raise
-
-Session = scoped_session(sessionmaker(bind=engine))
+# ─── Connection-Pool ──────────────────────────────────────────
+# Größe so wählen, dass (Worker × (POOL_SIZE + MAX_OVERFLOW)) unter
+# max_connections von Postgres bleibt.
+POOL_SIZE         = int(os.getenv("DB_POOL_SIZE", "5"))
+POOL_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT      = int(os.getenv("DB_POOL_TIMEOUT", "30"))     # Sekunden Warten auf freie Verbindung
+POOL_RECYCLE      = int(os.getenv("DB_POOL_RECYCLE", "1800"))   # Sekunden, danach neu verbinden
+POOL_PRE_PING     = os.getenv("DB_POOL_PRE_PING", "1").lower() not in ("0", "false", "no")
+POOL_WARN_WAIT_MS = float(os.getenv("DB_POOL_WARN_WAIT_MS", "100"))
+# Cache kompilierter Statements je Engine (siehe core/queries.py); 0 = aus
+QUERY_CACHE_SIZE  = int(os.getenv("DB_QUERY_CACHE_SIZE", "500"))
+
+# ─── Ausfallsicherheit (Circuit Breaker) ──────────────────────
+DB_CONNECT_TIMEOUT     = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))        # Sekunden (Postgres)
+BREAKER_THRESHOLD      = int(os.getenv("DB_BREAKER_THRESHOLD", "3"))      # Fehler in Folge bis "offen"
+BREAKER_PROBE_INTERVAL = float(os.getenv("DB_BREAKER_PROBE_INTERVAL", "5"))
+# Lesende Requests bei offenem Breaker aus der lokalen SQLite-Replik bedienen
+BREAKER_FALLBACK_READS = os.getenv("DB_BREAKER_FALLBACK_READS", "1").lower() not in ("0", "false", "no")
+
+
+class DatabaseUnavailable(Exception):
+    """Die Datenbank ist (laut Circuit Breaker) nicht erreichbar."""
+
+
+# ─── Statement-Timeouts ───────────────────────────────────────
+# Zeitbudget je Statement für Request-Verbindungen; Routen setzen eigene
+# Budgets mit @statement_timeout(ms). 0 = kein Limit.
+STATEMENT_TIMEOUT_MS  = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "10000"))
+SQLITE_PROGRESS_STEPS = 10000   # SQLite-VM-Schritte zwischen zwei Zeitprüfungen
+
+
+class QueryTimeout(Exception):
+    """Eine Abfrage hat ihr Zeitbudget überschritten und wurde abgebrochen."""
+
+
+# ─── SQLite-Profil (Offline/Desktop, Fallback) ────────────────
+# WAL: Leser (Flask-Thread) und Schreiber (Sync-Thread) blockieren sich nicht
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB   = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384"))          # Page-Cache je Verbindung
+SQLITE_MMAP_SIZE       = int(os.getenv("SQLITE_MMAP_SIZE", str(128 * 1024 * 1024)))
+SQLITE_MAINTENANCE_INTERVAL = int(os.getenv("SQLITE_MAINTENANCE_INTERVAL", "3600"))  # Sekunden
+SQLITE_VACUUM_PAGES    = int(os.getenv("SQLITE_VACUUM_PAGES", "500"))
+
+
+def configure_sqlite_connection(dbapi_conn) -> None:
+    """Setzt die Performance-PRAGMAs auf einer frischen SQLite-Verbindung."""
+    cur = dbapi_conn.cursor()
+    # Neue Dateien legt SQLite gleich mit inkrementellem Auto-Vacuum an (muss
+    # vor journal_mode stehen, das den Dateikopf schreibt); bestehende
+    # übernehmen es erst beim nächsten VACUUM (flask vacuum-sqlite)
+    cur.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")      # in WAL sicher, spart fsync pro Commit
+    cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cur.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA foreign_keys=ON")
+    cur.close()
+
+
+def connect_sqlite(path: str = SQLITE_PATH) -> sqlite3.Connection:
+    """Rohe sqlite3-Verbindung mit denselben Einstellungen wie die Engine (z. B. für sync.py)."""
+    conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    configure_sqlite_connection(conn)
+    return conn
+
+
+def create_sqlite_engine(path: str = SQLITE_PATH):
+    """Engine für eine lokale SQLite-Datei mit dem Offline-Profil."""
+    engine = create_engine(
+        f"sqlite:///{path}",
+        echo=False,
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        query_cache_size=QUERY_CACHE_SIZE,
+        connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000, "check_same_thread": False},
+    )
+    event.listen(engine, "connect", lambda dbapi_conn, _record: configure_sqlite_connection(dbapi_conn))
+    event.listen(engine, "before_cursor_execute", _begin_sqlite_dml)
+    _install_statement_timeouts(engine)
+    return engine
+
+
+def _begin_sqlite_dml(conn, cursor, statement, parameters, context, executemany):
+    """
+    pysqlite öffnet die Transaktion selbst nur vor Statements, die mit
+    INSERT/UPDATE/DELETE beginnen – WITH … INSERT (z. B.
+    Q.CATCH_UP_FIX_TRANSACTIONS) liefe sonst im Autocommit und ließe sich
+    nicht zurückrollen.
+    """
+    if context is None or not (context.isinsert or context.isupdate or context.isdelete):
+        return
+    dbapi_conn = cursor.connection
+    if dbapi_conn.isolation_level is not None and not dbapi_conn.in_transaction:
+        cursor.execute("BEGIN")
+
+
+def _create_engine(url: str, circuit=None):
+    """
+    Erzeugt eine Engine mit den konfigurierten Pool-Einstellungen.
+    Verbindungsfehler werden an `circuit` gemeldet (Standard: Breaker des Primary).
+    """
+    if url.startswith("sqlite:///"):
+        return create_sqlite_engine(url[len("sqlite:///"):])
+    engine = create_engine(
+        url,
+        echo=False,
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=POOL_PRE_PING,
+        query_cache_size=QUERY_CACHE_SIZE,
+        connect_args={"connect_timeout": DB_CONNECT_TIMEOUT} if url.startswith("postgres") else {},
+    )
+    # Verbindungsabbrüche während laufender Abfragen zählen ebenfalls für den Breaker.
+    # Fehler beim Verbinden (auch der Reconnect nach gescheitertem Pre-Ping)
+    # meldet schon _checkout() – hier nicht doppelt zählen.
+    circuit = circuit or breaker
+
+    def _on_engine_error(context):
+        if context.is_disconnect and context.connection is not None and not context.is_pre_ping:
+            circuit.record_failure(context.original_exception)
+
+    event.listen(engine, "handle_error", _on_engine_error)
+    _install_statement_timeouts(engine)
+    return engine
+
+
+def _install_statement_timeouts(engine) -> None:
+    event.listen(engine, "before_cursor_execute", _apply_statement_timeout)
+    event.listen(engine, "handle_error", _on_query_timeout)
+
+
+def _apply_statement_timeout(conn, cursor, statement, parameters, context, executemany):
+    """
+    Setzt das Budget aus conn.info vor jedem Statement durch: auf Postgres per
+    SET LOCAL statement_timeout (einmal je Transaktion), auf SQLite über einen
+    Progress-Handler, der die Abfrage nach Ablauf der Frist abbricht.
+    """
+    budget = conn.info.get("statement_timeout_ms")
+    if not budget:
+        return
+    if conn.dialect.name == "sqlite":
+        deadline = time.monotonic() + budget / 1000
+        # Bleibt bis zum nächsten Statement aktiv und deckt damit auch das Fetchen ab
+        conn.connection.dbapi_connection.set_progress_handler(
+            lambda: time.monotonic() > deadline, SQLITE_PROGRESS_STEPS)
+    elif conn.dialect.name == "postgresql":
+        transaction = conn.get_transaction()
+        if transaction is not None and conn.info.get("statement_timeout_txn") is not transaction:
+            # Serverseitige (benannte) Cursor können nur ihr eigenes SELECT
+            # ausführen – das SET läuft dann über einen normalen Cursor
+            if getattr(cursor, "name", None):
+                with conn.connection.dbapi_connection.cursor() as plain:
+                    plain.execute(f"SET LOCAL statement_timeout = {int(budget)}")
+            else:
+                cursor.execute(f"SET LOCAL statement_timeout = {int(budget)}")
+            conn.info["statement_timeout_txn"] = transaction
+
+
+def _is_query_timeout(exc) -> bool:
+    if isinstance(exc, sqlite3.OperationalError):
+        return "interrupted" in str(exc)
+    return getattr(exc, "pgcode", None) == "57014"   # query_canceled
+
+
+# Abgebrochene Abfragen je Route (für /health/db)
+_timeout_stats = {}
+_timeout_stats_lock = threading.Lock()
+
+
+def _on_query_timeout(context):
+    if not _is_query_timeout(context.original_exception):
+        return None
+    endpoint = (request.endpoint or request.path) if has_request_context() else "hintergrund"
+    with _timeout_stats_lock:
+        _timeout_stats[endpoint] = _timeout_stats.get(endpoint, 0) + 1
+    budget = context.connection.info.get("statement_timeout_ms") if context.connection is not None else None
+    logging.warning(f"Statement-Timeout ({budget} ms) in {endpoint} – Abfrage abgebrochen.")
+    return QueryTimeout(f"Abfrage nach {budget} ms abgebrochen.")
+
+
+def _set_statement_timeout(conn, budget_ms: int) -> None:
+    if budget_ms:
+        conn.info["statement_timeout_ms"] = budget_ms
+
+
+def _clear_statement_timeout(conn) -> None:
+    # conn.info gehört zur gepoolten DBAPI-Verbindung und überlebt den Checkout
+    if conn.info.pop("statement_timeout_ms", None) and conn.dialect.name == "sqlite":
+        try:
+            conn.connection.dbapi_connection.set_progress_handler(None, 0)
+        except Exception:
+            pass  # invalidierte Verbindung – wird ohnehin verworfen
+    conn.info.pop("statement_timeout_txn", None)
+
+
+def statement_timeout(ms: int):
+    """
+    Decorator für Flask-Routen: Zeitbudget je Statement (Millisekunden) für
+    die Request-Verbindungen aus get_db(). Überschreitet eine Abfrage das
+    Budget, wird sie abgebrochen und QueryTimeout ausgelöst.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            g.db_timeout_ms = ms
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def database_url() -> str:
+    """Konfigurierte Datenbank-URL (ohne Fallback)."""
+    if MODE == "offline":
+        return f"sqlite:///{SQLITE_PATH}"
+    if not POSTGRES_URL:
+        raise RuntimeError("DATABASE_URL nicht gesetzt – bitte in .env eintragen.")
+    return POSTGRES_URL
+
+
+def build_engine(url: str | None = None):
+    """Neue Engine für `url` bzw. die konfigurierte Datenbank – ohne Migrationen oder Fallback."""
+    return _create_engine(url or database_url())
+
+
+# Die Engine entsteht erst in init_db() – der Import dieses Moduls macht keine I/O
+_engine = None
+_read_engine = None
+_init_lock = threading.Lock()
 
-def get_db_connection():
-    return engine.raw_connection()
 
 def init_db():
-    Base.metadata.create_all(engine)
+    """
+    Expliziter, idempotenter Startschritt: Engine bauen, Erreichbarkeit prüfen
+    (ggf. SQLite-Fallback) und Migrationen anwenden. Das Ergebnis wird
+    gecacht; weitere Aufrufe kosten nichts.
+    """
+    global _engine, _read_engine
+    if _engine is not None:
+        return _engine
+    with _init_lock:
+        if _engine is not None:
+            return _engine
+        engine = build_engine()
+        try:
+            # Versionierte Migrationen statt create_all – ist das Schema aktuell,
+            # kostet das nur eine Abfrage auf schema_migrations
+            run_migrations(engine)
+            logging.info(f"Datenbank initialisiert: {engine.url.render_as_string(hide_password=True)}")
+        except OperationalError as e:
+            logging.warning(f"Remote-DB nicht erreichbar ({engine.url.render_as_string(hide_password=True)}): {e}")
+            if MODE != "offline":
+                engine.dispose()
+                fallback = f"sqlite:///{SQLITE_PATH}"
+                engine = _create_engine(fallback)
+                run_migrations(engine)
+                logging.info(f"SQLite-Fallback initialisiert: {fallback}")
+            else:
+                logging.error("Offline-Modus aktiv, kann SQLite-DB nicht anlegen.", exc_info=True)
+                raise
+        # Lese-Replik nur neben einem entfernten Primary (nicht offline / im SQLite-Fallback).
+        # Keine Migrationen – die Replik übernimmt das Schema vom Primary.
+        if READ_URL and _uses_breaker(engine):
+            _read_engine = _create_engine(READ_URL, circuit=replica_breaker)
+            logging.info(f"Lese-Replik konfiguriert: {_read_engine.url.render_as_string(hide_password=True)}")
+        _engine = engine
+    return _engine
+
+
+def get_engine():
+    """Die aktive Engine; initialisiert beim ersten Zugriff, falls nötig."""
+    return _engine if _engine is not None else init_db()
+
+
+def is_sqlite(conn=None) -> bool:
+    """SQLite-Dialekt? Mit `conn` für genau diese Verbindung (z. B. die SQLite-Replik)."""
+    if conn is not None:
+        return conn.dialect.name == 'sqlite'
+    return get_engine().url.get_backend_name() == 'sqlite'
+
+
+def _probe_primary():
+    with get_engine().connect() as conn:
+        conn.exec_driver_sql("SELECT 1")
+
+
+def _probe_replica():
+    with _read_engine.connect() as conn:
+        conn.exec_driver_sql("SELECT 1")
+
+
+breaker = CircuitBreaker("primary", BREAKER_THRESHOLD, BREAKER_PROBE_INTERVAL, _probe_primary)
+# Fällt die Replik aus, lesen Requests solange wieder vom Primary
+replica_breaker = CircuitBreaker("replica", BREAKER_THRESHOLD, BREAKER_PROBE_INTERVAL, _probe_replica)
+
+
+def _uses_breaker(engine) -> bool:
+    # Eine lokale SQLite-Datei fällt nicht "aus" – nur entfernte Server absichern
+    return engine.url.get_backend_name() != 'sqlite'
+
+
+_fallback_engine = None
+
+
+def _get_fallback_engine():
+    """Lokale SQLite-Replik für Lesezugriffe bei offenem Breaker (oder None)."""
+    global _fallback_engine
+    if not BREAKER_FALLBACK_READS or not os.path.exists(SQLITE_PATH):
+        return None
+    with _init_lock:
+        if _fallback_engine is None:
+            _fallback_engine = create_sqlite_engine(SQLITE_PATH)
+            run_migrations(_fallback_engine)
+    return _fallback_engine
+
+
+def pin_primary() -> None:
+    """Liest für die aktuelle Browser-Session PRIMARY_PIN_SECONDS lang vom Primary."""
+    if _read_engine is not None and has_request_context():
+        session["db_pin_until"] = time.time() + PRIMARY_PIN_SECONDS
+
+
+def _pinned_to_primary() -> bool:
+    return has_request_context() and session.get("db_pin_until", 0) > time.time()
+
+
+def _use_replica() -> bool:
+    """Soll ein Lesezugriff an die Replik gehen?"""
+    return _read_engine is not None and not _pinned_to_primary() and replica_breaker.allow()
+
+
+def _new_session():
+    engine = get_engine()
+    if _uses_breaker(engine) and not breaker.allow():
+        raise DatabaseUnavailable("Datenbank nicht erreichbar (Circuit Breaker offen).")
+    return _session_factory(bind=engine)
+
+
+def _new_read_session():
+    # Wie _new_session, aber bevorzugt auf der Lese-Replik
+    get_engine()
+    if _use_replica():
+        return _session_factory(bind=_read_engine)
+    return _new_session()
+
+
+# Sessions binden sich erst beim ersten Gebrauch an die Engine
+_session_factory = sessionmaker()
+Session = scoped_session(_new_session)
+# Nur lesende ORM-Zugriffe (z. B. /api/sync/pull)
+ReadSession = scoped_session(_new_read_session)
+
+# Wartezeiten beim Auschecken aus dem Pool (für Monitoring / Worker-Sizing)
+_pool_stats = {"checkouts": 0, "wait_total_ms": 0.0, "wait_max_ms": 0.0}
+_pool_stats_lock = threading.Lock()
+
+
+def get_db_connection():
+    """
+    Eigene SQLAlchemy-Connection außerhalb eines Requests (CLI, Sync,
+    Hintergrund-Jobs). Der Aufrufer muss sie mit close() zurückgeben.
+    """
+    return _checkout(get_engine())
+
+
+def _checkout(engine, circuit=None):
+    """Holt eine Verbindung und meldet das Ergebnis an den Circuit Breaker."""
+    if not _uses_breaker(engine):
+        return engine.connect()
+    circuit = circuit or breaker
+    try:
+        conn = engine.connect()
+    except sa_exc.TimeoutError:
+        raise  # Pool erschöpft – kein Datenbankausfall
+    except Exception as e:
+        circuit.record_failure(e)
+        raise DatabaseUnavailable("Datenbank nicht erreichbar.") from e
+    circuit.record_success()
+    return conn
+
+
+def _timed_checkout(engine, circuit=None):
+    """_checkout() mit Erfassung der Wartezeit auf den Pool."""
+    start = time.perf_counter()
+    conn = _checkout(engine, circuit)
+    waited_ms = (time.perf_counter() - start) * 1000
+    with _pool_stats_lock:
+        _pool_stats["checkouts"] += 1
+        _pool_stats["wait_total_ms"] += waited_ms
+        _pool_stats["wait_max_ms"] = max(_pool_stats["wait_max_ms"], waited_ms)
+    if waited_ms > POOL_WARN_WAIT_MS:
+        logging.warning(f"DB-Pool: {waited_ms:.0f} ms auf Verbindung gewartet ({engine.pool.status()})")
+    return conn
+
+
+def _checkout_read():
+    """
+    Verbindung für Lesezugriffe: Replik (falls konfiguriert und nicht
+    gepinnt), sonst Primary, bei offenem Breaker die SQLite-Replik.
+    """
+    if _use_replica():
+        try:
+            return _timed_checkout(_read_engine, replica_breaker)
+        except DatabaseUnavailable:
+            logging.warning("Lese-Replik nicht erreichbar – Lesezugriff über den Primary.")
+    engine = get_engine()
+    if not _uses_breaker(engine) or breaker.allow():
+        return _timed_checkout(engine)
+    fallback = _get_fallback_engine()
+    if fallback is None:
+        raise DatabaseUnavailable("Datenbank nicht erreichbar (Circuit Breaker offen).")
+    logging.info("Circuit Breaker offen – Lesezugriff aus lokaler SQLite-Replik.")
+    g.db_degraded = True
+    return _timed_checkout(fallback)
+
+
+def get_db(readonly: bool = False):
+    """
+    Liefert die SQLAlchemy-Connection des aktuellen Requests (Statements
+    siehe core/queries.py).
+    Pro Request und Rolle (Schreiben/Lesen) wird höchstens eine Verbindung
+    aus dem Pool geholt und in close_db() (teardown_appcontext) wieder
+    zurückgegeben – Routen rufen daher kein conn.close() auf.
+
+    readonly=True liest von der Lese-Replik (DATABASE_READ_URL), außer der
+    Request hat schon eine Primary-Verbindung oder die Session hat kürzlich
+    geschrieben (pin_primary). Ein Schreibzugriff pinnt die Session für
+    PRIMARY_PIN_SECONDS an den Primary, damit z. B. das Dashboard nach dem
+    Redirect die eigene Buchung sieht.
+
+    Jedes Statement hat das Zeitbudget der Route (@statement_timeout bzw.
+    DB_STATEMENT_TIMEOUT_MS); bei Überschreitung folgt QueryTimeout.
+
+    Ist der Circuit Breaker offen, scheitern Schreibzugriffe sofort mit
+    DatabaseUnavailable; Lesezugriffe gehen an die Replik bzw. – falls
+    vorhanden – an die lokale SQLite-Replik.
+    """
+    if "db_conn" in g:
+        return g.db_conn
+    budget = g.get("db_timeout_ms", STATEMENT_TIMEOUT_MS)
+    if readonly:
+        if "db_read_conn" not in g:
+            g.db_read_conn = _checkout_read()
+            _set_statement_timeout(g.db_read_conn, budget)
+        return g.db_read_conn
+    engine = get_engine()
+    if _uses_breaker(engine) and not breaker.allow():
+        raise DatabaseUnavailable("Datenbank nicht erreichbar (Circuit Breaker offen).")
+    g.db_conn = _timed_checkout(engine)
+    _set_statement_timeout(g.db_conn, budget)
+    pin_primary()
+    return g.db_conn
+
+
+def close_db(exc=None):
+    """Gibt die Request-Verbindungen an den Pool zurück und räumt die Sessions auf."""
+    for key in ("db_conn", "db_read_conn"):
+        conn = g.pop(key, None)
+        if conn is not None:
+            _clear_statement_timeout(conn)
+            conn.close()
+    Session.remove()
+    ReadSession.remove()
+
+
+def pool_status() -> dict:
+    """Aktuelle Pool-Kennzahlen (ausgecheckt, Overflow, Wartezeiten)."""
+    if _engine is None:
+        return {"initialized": False}
+    engine = _engine
+    pool = engine.pool
+    with _pool_stats_lock:
+        stats = dict(_pool_stats)
+    with _timeout_stats_lock:
+        timeouts = dict(_timeout_stats)
+    checkouts = stats["checkouts"]
+    status = {
+        "backend": engine.url.get_backend_name(),
+        "checkouts": checkouts,
+        "wait_avg_ms": round(stats["wait_total_ms"] / checkouts, 2) if checkouts else 0.0,
+        "wait_max_ms": round(stats["wait_max_ms"], 2),
+        "statement_timeout_ms": STATEMENT_TIMEOUT_MS,
+        "statement_timeouts": timeouts,
+    }
+    status.update(_pool_counters(pool))
+    if _uses_breaker(engine):
+        status["breaker"] = breaker.status()
+    if _read_engine is not None:
+        status["replica"] = _pool_counters(_read_engine.pool)
+        status["replica"]["breaker"] = replica_breaker.status()
+    return status
+
+
+def _pool_counters(pool) -> dict:
+    # Nur QueuePool kennt Größe/Overflow
+    counters = {}
+    for key in ("size", "checkedin", "checkedout", "overflow"):
+        fn = getattr(pool, key, None)
+        if callable(fn):
+            counters[key] = fn()
+    return counters
+
+
+_last_sqlite_maintenance = 0.0
+_sqlite_maintenance_lock = threading.Lock()
+
+
+def sqlite_maintenance(path: str = SQLITE_PATH, force: bool = False, vacuum: bool = False) -> bool:
+    """
+    PRAGMA optimize (Statistiken für den Planer) und inkrementelles VACUUM.
+    Läuft höchstens alle SQLITE_MAINTENANCE_INTERVAL Sekunden, außer force=True.
+    vacuum=True schreibt die Datei stattdessen per VACUUM komplett neu – dauert
+    bei großen Dateien und sperrt sie solange, daher nur über flask
+    vacuum-sqlite. Erst danach gilt auto_vacuum=INCREMENTAL für Dateien, die
+    vor Migration 5 angelegt wurden.
+    Gibt zurück, ob die Wartung tatsächlich ausgeführt wurde.
+    """
+    global _last_sqlite_maintenance
+    with _sqlite_maintenance_lock:
+        now = time.monotonic()
+        if not (force or vacuum) and _last_sqlite_maintenance and now - _last_sqlite_maintenance < SQLITE_MAINTENANCE_INTERVAL:
+            return False
+        _last_sqlite_maintenance = now
+    conn = connect_sqlite(path)
+    try:
+        conn.execute("PRAGMA optimize")
+        if vacuum:
+            conn.execute("VACUUM")
+        elif conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            logging.info(f"SQLite: auto_vacuum für {path} noch nicht aktiv, einmalig flask vacuum-sqlite ausführen.")
+        else:
+            conn.execute(f"PRAGMA incremental_vacuum({SQLITE_VACUUM_PAGES})").fetchall()
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        logging.info(f"SQLite-Wartung für {path} ausgeführt.")
+        return True
+    except sqlite3.Error as e:
+        logging.warning(f"SQLite-Wartung fehlgeschlagen: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def init_app(app):
+    """Registriert die Request-Verbindung an der Flask-App."""
+    app.teardown_appcontext(close_db)
+
@@ -0,0 +1,205 @@
+# core/export.py – Export der Buchungen als CSV, NDJSON oder Parquet (gestreamt)
+"""
+/export/?format=csv|ndjson|parquet&start=JJJJ-MM-TT&end=JJJJ-MM-TT liefert
+die Buchungen des angemeldeten Nutzers in [start, end) als Download; ohne
+start/end alle. Dasselbe auf der Kommandozeile:
+
+    flask --app "app:create_app()" export-transactions --user-id 1 --format ndjson -o tx.ndjson
+
+Gelesen wird blockweise über den serverseitigen Cursor (Q.EXPORT_BATCH
+Zeilen), jeder Block wird sofort kodiert und verschickt – der Speicherbedarf
+hängt nicht an der Anzahl der Buchungen, und die ersten Bytes gehen raus,
+bevor die Abfrage fertig gelesen ist. CSV und NDJSON werden gzip-komprimiert,
+wenn der Client das annimmt. Parquet braucht pyarrow (optional); ein
+Block ist dort eine Row Group.
+"""
+import csv
+import io
+import json
+import logging
+import os
+import zlib
+from datetime import date
+
+from flask import Blueprint, Response, request, redirect, url_for, flash, session, stream_with_context
+
+from core.db import get_db, statement_timeout
+from core import queries as Q
+from utils_web import as_date, from_cents
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet-Export ist optional
+    pa = pq = None
+
+# Ein Export dauert so lange, wie der Client liest – standardmäßig ohne Limit
+EXPORT_TIMEOUT_MS = int(os.getenv("DB_TIMEOUT_EXPORT_MS", "0"))
+
+COLUMNS = ["id", "date", "description", "usage", "amount", "paid", "recurring_id"]
+
+# Format → (Content-Type, Dateiendung)
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+bp = Blueprint('export', __name__, url_prefix='/export')
+
+
+def available(fmt: str) -> bool:
+    return fmt in FORMATS and (fmt != "parquet" or pa is not None)
+
+
+def _partitions(conn, user_id: int, start: date, end: date):
+    result = Q.execute(conn, Q.EXPORT_TRANSACTIONS, user_id=user_id, start=start, end=end)
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+
+def _csv(partitions):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+
+    def take() -> bytes:
+        data = buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+        return data
+
+    writer.writerow(COLUMNS)
+    yield take()
+    for part in partitions:
+        for row_id, d, desc, usage, amount, paid, rec_id in part:
+            writer.writerow((row_id, as_date(d).isoformat(), desc, usage, from_cents(amount),
+                             int(bool(paid)), "" if rec_id is None else rec_id))
+        yield take()
+
+
+def _ndjson(partitions):
+    for part in partitions:
+        yield "".join(
+            json.dumps({
+                "id": row_id,
+                "date": as_date(d).isoformat(),
+                "description": desc,
+                "usage": usage,
+                "amount": float(from_cents(amount)),
+                "paid": bool(paid),
+                "recurring_id": rec_id,
+            }, ensure_ascii=False) + "\n"
+            for row_id, d, desc, usage, amount, paid, rec_id in part
+        ).encode("utf-8")
+
+
+class _Sink(io.RawIOBase):
+    """Schreibziel für pyarrow; was geschrieben wurde, holt drain() ab."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _parquet(partitions):
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("date", pa.date32()),
+        ("description", pa.string()),
+        ("usage", pa.string()),
+        ("amount", pa.decimal128(18, 2)),
+        ("paid", pa.bool_()),
+        ("recurring_id", pa.int64()),
+    ])
+    sink = _Sink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for part in partitions:
+            ids, dates, descs, usages, amounts, paid, rec_ids = zip(*part)
+            writer.write_table(pa.table([
+                pa.array(ids, pa.int64()),
+                pa.array([as_date(d) for d in dates], pa.date32()),
+                pa.array(descs, pa.string()),
+                pa.array(usages, pa.string()),
+                pa.array([from_cents(a) for a in amounts], pa.decimal128(18, 2)),
+                pa.array([bool(p) for p in paid], pa.bool_()),
+                pa.array(rec_ids, pa.int64()),
+            ], schema=schema))
+            yield sink.drain()
+    # Footer
+    yield sink.drain()
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)   # wbits 31 → gzip-Container
+    for chunk in chunks:
+        # SYNC_FLUSH: jeder Block geht sofort komprimiert raus
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream(conn, user_id: int, start: date = date.min, end: date = date.max,
+           fmt: str = "csv", compress: bool = False):
+    """Generator über die Bytes des Exports; liest erst, wenn er iteriert wird."""
+    encoders = {"csv": _csv, "ndjson": _ndjson, "parquet": _parquet}
+    chunks = encoders[fmt](_partitions(conn, user_id, start, end))
+    return _gzip(chunks) if compress else chunks
+
+
+def _date_arg(name: str, default: date) -> date:
+    value = request.args.get(name)
+    return date.fromisoformat(value) if value else default
+
+
+@bp.route('/')
+@statement_timeout(EXPORT_TIMEOUT_MS)
+def index():
+    if not session.get('user_id'):
+        return redirect(url_for('login'))
+
+    user_id = session['user_id']
+    fmt = request.args.get('format', 'csv').lower()
+    if not available(fmt):
+        flash("Exportformat nicht verfügbar.", 'error')
+        return redirect(url_for('dashboard'))
+    try:
+        start = _date_arg('start', date.min)
+        end = _date_arg('end', date.max)
+    except ValueError:
+        flash("Ungültiges Datum für den Export.", 'error')
+        return redirect(url_for('dashboard'))
+
+    mimetype, ext = FORMATS[fmt]
+    period = "alle" if (start, end) == (date.min, date.max) else f"{start.isoformat()}_{end.isoformat()}"
+    headers = {
+        'Content-Disposition': f'attachment; filename="transaktionen_{period}.{ext}"',
+        'Cache-Control': 'no-store',
+        'Vary': 'Accept-Encoding',
+    }
+    # Parquet ist bereits komprimiert
+    compress = fmt != "parquet" and 'gzip' in request.accept_encodings
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+
+    logging.info(f"Export ({fmt}) für Nutzer {user_id}: {start} bis {end}.")
+    body = stream(get_db(readonly=True), user_id, start, end, fmt, compress)
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
@@ -1,5 +1,12 @@
 # core/fixkosten.py
 from core.db import get_db_connection
+from core import queries as Q
+from core import totals
+from core import dataversion
+from core import projection
+from core.ledgercache import ledger_cache
+from core.recurrence import Rule, horizon
+from utils_web import as_date
 from datetime import date
 from dateutil.relativedelta import relativedelta # Importiere relativedelta für Datumsberechnungen
 import logging # Importiere Logging
@@ -7,142 +14,140 @@ import logging # Importiere Logging
 # Konfiguriere Logging
 logging.basicConfig(level=logging.INFO)
 
-def insert_missing_fix_transactions(user_id: int, year: int, month: int):
+def catch_up_users(conn, user_ids, start: date, end: date) -> dict:
     """
-    Füge für das gegebene Jahr/Monat alle fehlenden Fixkosten-Transaktionen
-    ein, basierend auf start_date und duration (1–12 Monate).
-    Diese Funktion wird typischerweise beim Laden des Dashboards aufgerufen,
-    um sicherzustellen, dass alle erwarteten monatlichen Transaktionen existieren.
+    Legt alle fehlenden Fixkosten-Buchungen der Nutzer `user_ids` für die
+    Monate [start, end) an; ein Termin fehlt, wenn in seinem Zeitraum (bis
+    zum Folgetermin) keine Buchung der Serie liegt – auch keine verschobene.
+    Einfache Monatsserien holt ein einziges Statement über alle Serien und
+    Monate nach (Q.CATCH_UP_FIX_TRANSACTIONS). Für die übrigen Regeln
+    (wöchentlich, jährlich, Intervall > 1, mit Enddatum) rechnet
+    core/recurrence.py die Termine: Serien, vorhandene Buchungen,
+    executemany. Aktualisiert die Monatssummen; Datenversion und commit sind
+    Sache des Aufrufers. Liefert {user_id: [Daten]} der neu angelegten
+    Buchungen.
     """
-    conn = None # Initialisiere conn auf None
+    first = start.replace(day=1)
+    end = end.replace(day=1) if end.day == 1 else end.replace(day=1) + relativedelta(months=1)
+    # Virtuelle Termine (core/projection.py) werden nicht als Zeilen angelegt
+    if first >= end or not user_ids or projection.FIXKOSTEN_VIRTUAL:
+        return {}
+    user_ids = list(user_ids)
+    created = {}
+    for uid, d in Q.execute(conn, Q.CATCH_UP_FIX_TRANSACTIONS, user_ids=user_ids,
+                            start=first, last=end - relativedelta(months=1), end=end):
+        created.setdefault(uid, []).append(as_date(d))
+
+    for row, d in _missing_occurrences(conn, user_ids, first, end):
+        created.setdefault(row.user_id, []).append(d)
+
+    for uid, dates in created.items():
+        dates.sort()
+        totals.refresh_range(conn, uid, dates[0].replace(day=1),
+                             dates[-1].replace(day=1) + relativedelta(months=1))
+    return created
+
+
+def _missing_occurrences(conn, user_ids: list, first: date, end: date) -> list:
+    """Legt die fehlenden Termine der Serien mit Regel an (catch_up_users); liefert (Serie, Datum)."""
+    due = []
+    for row in Q.execute(conn, Q.RECURRING_RULES, user_ids=user_ids):
+        rule = Rule.of(row)
+        due.extend((row, rule, d) for d in rule.occurrences(first, end))
+    if not due:
+        return []
+
+    # Buchungen der Serien in den Zeiträumen der fälligen Termine
+    last = max(rule.period_end(d) for _, rule, d in due)
+    rules = {row.id: rule for row, rule, _ in due}
+    booked = {
+        (rec_id, rules[rec_id].occurrence_at(d))
+        for rec_id, d in Q.execute(conn, Q.SERIES_TRANSACTIONS, user_ids=user_ids, ids=list(rules),
+                                   start=first, end=last)
+    }
+    missing = [(row, d) for row, _, d in due if (row.id, d) not in booked]
+    if missing:
+        # Duplikate (user_id, recurring_id, date) werden übersprungen
+        Q.execute(conn, Q.INSERT_FIX_TRANSACTION, [
+            dict(user_id=row.user_id, date=d, description=row.description, usage=row.usage,
+                 amount=row.amount, recurring_id=row.id)
+            for row, d in missing
+        ])
+    return missing
+
+
+def catch_up_fix_transactions(conn, user_id: int, start: date, end: date) -> list:
+    """catch_up_users() für einen Nutzer; liefert die Daten der neuen Buchungen."""
+    created = catch_up_users(conn, [user_id], start, end).get(user_id, [])
+    logging.info(f"Fixkosten nachgeholt für Nutzer {user_id} ({start} bis {end}): {len(created)} Buchungen.")
+    return created
+
+
+def insert_missing_fix_transactions(user_id: int, start: date, end: date | None = None) -> list:
+    """
+    Holt fehlende Fixkosten-Buchungen für die Monate [start, end) nach
+    (ohne `end`: nur der Monat von `start`) – mit eigener Verbindung und
+    commit, z. B. nach längerer Abwesenheit des Nutzers.
+    """
+    end = end or start.replace(day=1) + relativedelta(months=1)
+    conn = None
     try:
         conn = get_db_connection()
-        cur  = conn.cursor()
-
-        logging.info(f"Checking for missing fix transactions for user {user_id}, year {year}, month {month}")
-
-        # Hole alle fixkosten-Einträge des Nutzers
-        cur.execute("""
-            SELECT id, description, "usage", amount, duration, start_date
-              FROM recurring_entries
-             WHERE user_id = %s
-        """, (user_id,))
-        recurring_entries = cur.fetchall()
-        logging.info(f"Found {len(recurring_entries)} recurring entries for user {user_id}")
-
-        for rec_id, desc, usage, amount, duration, start_date in recurring_entries:
-            # Berechne, wie viele Monate seit start_date bis (year,month) vergangen sind
-            # Stelle sicher, dass start_date ein date-Objekt ist (kommt so aus der DB)
-            if not isinstance(start_date, date):
-                 logging.error(f"start_date for recurring_entry {rec_id} is not a date object: {start_date}")
-                 continue # Überspringe diesen Eintrag, wenn start_date ungültig ist
-
-            try:
-                # Erstelle ein Datumsobjekt für den ersten Tag des Startmonats
-                start_month_date = date(start_date.year, start_date.month, 1)
-                # Erstelle ein Datumsobjekt für den ersten Tag des Zielmonats
-                target_month_date = date(year, month, 1)
-
-                # Berechne die Differenz in Monaten
-                months_since_start = (target_month_date.year - start_month_date.year) * 12 + (target_month_date.month - start_month_date.month)
-
-            except ValueError as e:
-                logging.error(f"Error calculating date difference for recurring_entry {rec_id}: {e}")
-                continue # Überspringe diesen Eintrag bei Datumsfehler
-
-            # Nur einfügen, wenn die Transaktion innerhalb der Dauer liegt (0-basiert)
-            # und der Zielmonat nicht vor dem Startmonat liegt, es sei denn, die Dauer ist 0 (was nicht erlaubt sein sollte, aber als Sicherheit)
-            if 0 <= months_since_start < duration:
-                # Das Datum für die Transaktion ist der erste Tag des Zielmonats
-                entry_date = date(year, month, 1).isoformat()
-
-                # Füge die Transaktion ein. Setze 'paid' auf FALSE.
-                # ON CONFLICT vermeidet Duplikate, falls die Funktion mehrmals aufgerufen wird
-                insert_query = """
-                    INSERT INTO transactions
-                      (user_id, date, description, "usage", amount, paid, recurring_id)
-                    VALUES (%s, %s, %s, %s, %s, FALSE, %s) -- HIER GEÄNDERT: TRUE zu FALSE
-                    ON CONFLICT (user_id, recurring_id, date) DO NOTHING
-                """
-                insert_params = (user_id, entry_date, desc, usage, amount, rec_id)
-                # logging.debug(f"Inserting missing transaction for recurring_entry {rec_id} on {entry_date}") # Zu detailliert für INFO
-                cur.execute(insert_query, insert_params)
-                # Optional: Logge die eingefügte Transaktion (nur wenn tatsächlich eingefügt)
-                # if cur.rowcount > 0:
-                #    logging.info(f"Inserted missing transaction for recurring_entry {rec_id} on {entry_date}")
-
-
-        conn.commit()
-        logging.info(f"Finished checking for missing fix transactions for user {user_id}, year {year}, month {month}")
-
-    except Exception as e:
-        logging.exception(f"An error occurred in insert_missing_fix_transactions for user {user_id}, year {year}, month {month}:")
+        created = catch_up_fix_transactions(conn, user_id, start, end)
+        if created:
+            version = dataversion.bump(conn, user_id)
+            conn.commit()
+            ledger_cache.invalidate(user_id, created, version)
+        else:
+            conn.commit()
+        return created
+    except Exception:
+        logging.exception(f"An error occurred in insert_missing_fix_transactions for user {user_id}, {start} bis {end}:")
         if conn:
             conn.rollback()
+        return []
     finally:
         if conn:
             conn.close()
 
 
-def create_fix_transactions(user_id: int, rec_id: int, start_date: date, amount: float, duration: int):
+def create_fix_transactions(conn, user_id: int, rec_id: int, rule: Rule, amount: int) -> list:
     """
-    Erstellt die anfänglichen Transaktionen für eine neue Fixkosten-Serie.
-    Diese Funktion wird beim Anlegen einer neuen Fixkosten-Serie aufgerufen.
+    Erstellt die Transaktionen einer neuen Fixkosten-Serie mit Regel `rule`
+    (Betrag in Cent) auf der Verbindung des Aufrufers – zusammen mit dem
+    Anlegen der Serie eine Transaktion, commit/bump/invalidate macht der
+    Aufrufer. Gebucht wird bis recurrence.horizon(), spätere Termine legt
+    der Scheduler an. Alle Termine gehen in einem Statement raus (Postgres:
+    INSERT … SELECT über generate_series, SQLite: executemany), die
+    Monatssummen in einem Block. Liefert die Termine.
     """
-    conn = None # Initialisiere conn auf None
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        logging.info(f"Creating {duration} fix transactions for recurring_entry {rec_id}, starting {start_date}")
-
-        # Stelle sicher, dass start_date der erste Tag des Monats ist
-        current_date = start_date.replace(day=1)
-
-        for i in range(duration):
-            # Berechne das Datum für die aktuelle Transaktion (erster Tag des Monats)
-            transaction_date = current_date + relativedelta(months=i)
-
-            # Füge die Transaktion ein. Setze 'paid' auf FALSE.
-            insert_query = """
-                INSERT INTO transactions
-                  (user_id, date, description, "usage", amount, paid, recurring_id)
-                VALUES (%s, %s, %s, %s, %s, FALSE, %s) -- Setze paid auf FALSE für neue Fixkosten
-                ON CONFLICT (user_id, recurring_id, date) DO NOTHING -- Vermeide Duplikate
-            """
-            # Holen Sie Beschreibung und Verwendungszweck aus recurring_entries, da sie hier nicht übergeben werden
-            # oder passen Sie die Funktion an, um desc und usage zu übergeben, falls verfügbar.
-            # Für dieses Beispiel nehmen wir an, wir holen sie aus recurring_entries:
-            cur.execute("""
-                SELECT description, "usage"
-                FROM recurring_entries
-                WHERE id = %s AND user_id = %s
-            """, (rec_id, user_id))
-            rec_info = cur.fetchone()
-
-            if rec_info:
-                 desc, usage = rec_info
-                 insert_params = (user_id, transaction_date.isoformat(), desc, usage, amount, rec_id)
-                 # logging.debug(f"Inserting initial transaction for recurring_entry {rec_id} on {transaction_date.isoformat()}") # Zu detailliert für INFO
-                 cur.execute(insert_query, insert_params)
-                 # Optional: Logge die eingefügte Transaktion (nur wenn tatsächlich eingefügt)
-                 # if cur.rowcount > 0:
-                 #    logging.info(f"Inserted initial transaction for recurring_entry {rec_id} on {transaction_date.isoformat()}")
-            else:
-                 logging.error(f"Could not find recurring_entry {rec_id} for user {user_id} to create initial transactions.")
-                 # Optional: Rollback oder Fehlerbehandlung, wenn recurring_entry nicht gefunden wird
-
-
-        conn.commit()
-        logging.info(f"Finished creating {duration} fix transactions for recurring_entry {rec_id}")
-
-    except Exception as e:
-        logging.exception(f"An error occurred in create_fix_transactions for recurring_entry {rec_id}:")
-        if conn:
-            conn.rollback()
-    finally:
-        if conn:
-            conn.close()
+    dates = list(rule.occurrences(rule.start, max(horizon(), rule.start)))
+    if not dates:
+        return []
+    if projection.FIXKOSTEN_VIRTUAL:
+        # Termine werden beim Lesen projiziert, echte Buchungen erst beim Bezahlen
+        return dates
+    logging.info(f"Creating {len(dates)} fix transactions for recurring_entry {rec_id} ({rule.rrule()}), starting {dates[0]}")
+
+    if conn.dialect.name == "postgresql":
+        months, days = rule.step
+        Q.execute(conn, Q.INSERT_FIX_SERIES, id=rec_id, user_id=user_id, start=dates[0], last=dates[-1],
+                  months=months, days=days, amount=amount)
+    else:
+        rec_info = Q.execute(conn, Q.RECURRING_TEXT, id=rec_id, user_id=user_id).fetchone()
+        if rec_info is None:
+            logging.error(f"Could not find recurring_entry {rec_id} for user {user_id} to create initial transactions.")
+            return []
+        desc, usage = rec_info
+        # Duplikate (user_id, recurring_id, date) werden übersprungen
+        Q.execute(conn, Q.INSERT_FIX_TRANSACTION, [
+            dict(user_id=user_id, date=d, description=desc, usage=usage, amount=amount, recurring_id=rec_id)
+            for d in dates
+        ])
+
+    totals.refresh_range(conn, user_id, dates[0].replace(day=1),
+                         dates[-1].replace(day=1) + relativedelta(months=1))
+    return dates
 
 
 # Optional: Weitere Funktionen für Fixkosten könnten hier folgen
@@ -0,0 +1,124 @@
+# core/ledgercache.py – prozesslokaler LRU-Cache für Monats-/Jahresansichten
+import os
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from utils_web import as_date
+
+# Obergrenze für den geschätzten Speicherbedarf aller Einträge
+LEDGER_CACHE_MAX_MB = float(os.getenv("LEDGER_CACHE_MAX_MB", "32"))
+
+# Grobe Schätzung je Zeile (Tupel, Datum, Zahlen) zusätzlich zu den Texten
+_ROW_OVERHEAD = 200
+_ENTRY_OVERHEAD = 500
+
+
+class LedgerCache:
+    """
+    Zuletzt genutzte Dashboard-Ausschnitte je Nutzer: Transaktions-Tupel
+    eines Zeitraums mit Saldo/offenen Fixkosten (Schlüssel (user_id, start,
+    end)), die Jahr/Monat-Navigation (Schlüssel (user_id, 'nav', jahr)) und
+    Berichte (Schlüssel (user_id, 'report', …), core/reports.py).
+
+    Jeder Eintrag trägt die Datenversion (core/dataversion.py), aus der er
+    gebaut wurde. Schreibpfade melden nach dem commit per invalidate(), welche
+    Tage sie geändert haben: betroffene (und wegen des laufenden Kontostands
+    alle späteren) Zeiträume fliegen raus, die übrigen Einträge des Nutzers
+    gelten für die neue Version weiter. Schreibt ein anderer Prozess, passt
+    die Version nicht mehr und der Eintrag wird beim nächsten Zugriff
+    verworfen.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()   # key -> (version, value, size)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, version: int | None):
+        """Wert zu `key`, wenn er zur Datenversion passt (None = nicht geprüft), sonst None."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or (version is not None and entry[0] != version):
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, version: int, value, size: int | None = None) -> None:
+        size = _estimate(value) if size is None else size
+        if self.max_bytes <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (version, value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate(self, user_id: int, dates, version: int | None) -> None:
+        """
+        Nach einer Änderung (bereits committet, neue Datenversion `version`):
+        Zeiträume, die einen der `dates` enthalten oder danach liegen, und –
+        sobald sich Buchungen geändert haben – Navigation und Berichte werden
+        verworfen.
+        """
+        days = [d for d in map(as_date, dates) if d is not None]
+        with self._lock:
+            for key in [k for k in self.entries if k[0] == user_id]:
+                entry_version = self.entries[key][0]
+                if isinstance(key[1], date):
+                    # Auch spätere Zeiträume: deren laufender Kontostand baut auf d auf
+                    affected = any(d < key[2] for d in days)
+                else:
+                    # Navigation, Berichte: hängen an allen Buchungen des Nutzers
+                    affected = bool(days)
+                # Lag dazwischen ein fremder Schreibzugriff, ist der Stand unbekannt
+                if affected or version is None or entry_version != version - 1:
+                    self._drop(key)
+                    self.invalidations += 1
+                else:
+                    self.entries[key] = (version, *self.entries[key][1:])
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _drop(self, key) -> None:
+        self.bytes -= self.entries.pop(key)[2]
+
+
+def _estimate(value) -> int:
+    """Geschätzte Größe in Bytes: Zeilen-Tupel plus deren Texte."""
+    size = _ENTRY_OVERHEAD
+    for row in value.get("rows", ()):
+        size += _ROW_OVERHEAD + sum(sys.getsizeof(v) for v in row if isinstance(v, str))
+    return size
+
+
+ledger_cache = LedgerCache(int(LEDGER_CACHE_MAX_MB * 1024 * 1024))
@@ -0,0 +1,432 @@
+# core/migrations.py – versionierte Schema-Migrationen für SQLite und Postgres
+"""
+Jede Migration ist eine Funktion mit fester Versionsnummer. run_migrations()
+liest die zuletzt angewendete Version aus `schema_migrations` und führt nur
+die noch fehlenden Schritte aus – beim normalen Start also genau eine
+Abfrage statt eines kompletten create_all.
+
+Migrationen mit transactional=False laufen im Autocommit-Modus. Auf Postgres
+werden Indizes dort mit CREATE INDEX CONCURRENTLY angelegt, damit eine
+laufende Datenbank beim Nachrüsten von Indizes nicht gesperrt wird.
+"""
+import logging
+from datetime import datetime
+
+from sqlalchemy import (
+    MetaData, Table, Column, Integer, String, DateTime, JSON, Boolean,
+    ForeignKey, inspect, select, func, text
+)
+
+from utils_web import to_cents
+
+# Schlüssel für pg_advisory_lock, damit nicht mehrere Worker gleichzeitig migrieren
+_PG_LOCK_KEY = 724_311_001
+
+_meta = MetaData()
+
+schema_migrations = Table(
+    'schema_migrations', _meta,
+    Column('version', Integer, primary_key=True, autoincrement=False),
+    Column('description', String, nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+MIGRATIONS = []
+
+
+def migration(version: int, description: str, transactional: bool = True):
+    """Registriert eine Migrationsfunktion unter der angegebenen Version."""
+    def decorator(fn):
+        MIGRATIONS.append((version, description, fn, transactional))
+        return fn
+    return decorator
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Hilfsfunktionen
+# ──────────────────────────────────────────────────────────────────────────────
+def _quote(conn, name: str) -> str:
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def _existing_columns(conn, table: str) -> set:
+    return {c['name'] for c in inspect(conn).get_columns(table)}
+
+
+def add_missing_columns(conn, table: Table) -> None:
+    """Ergänzt Spalten aus `table`, die in der Datenbank (noch) fehlen."""
+    existing = _existing_columns(conn, table.name)
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        col_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(
+            f"ALTER TABLE {_quote(conn, table.name)} ADD COLUMN {_quote(conn, column.name)} {col_type}"
+        ))
+        logging.info(f"Migration: Spalte {table.name}.{column.name} ergänzt.")
+
+
+def create_index(conn, name: str, table: str, columns, unique: bool = False,
+                 where: str | None = None, concurrently: bool = False,
+                 using: str | None = None) -> None:
+    """Legt einen Index an, falls er noch nicht existiert."""
+    cols = ", ".join(c if "(" in c else _quote(conn, c) for c in columns)
+    concurrent = " CONCURRENTLY" if concurrently and conn.dialect.name == "postgresql" else ""
+    method = f" USING {using}" if using else ""
+    sql = (f"CREATE {'UNIQUE ' if unique else ''}INDEX{concurrent} IF NOT EXISTS "
+           f"{_quote(conn, name)} ON {_quote(conn, table)}{method} ({cols})")
+    if where:
+        sql += f" WHERE {where}"
+    conn.execute(text(sql))
+
+
+def drop_index(conn, name: str, concurrently: bool = False) -> None:
+    concurrent = " CONCURRENTLY" if concurrently and conn.dialect.name == "postgresql" else ""
+    conn.execute(text(f"DROP INDEX{concurrent} IF EXISTS {_quote(conn, name)}"))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Migrationen
+# ──────────────────────────────────────────────────────────────────────────────
+@migration(1, "Basisschema")
+def _m001_baseline(conn):
+    # Eingefrorener Stand der Modelle – spätere Änderungen kommen als eigene Migration
+    meta = MetaData()
+    tables = [
+        Table('users', meta,
+              Column('id', Integer, primary_key=True),
+              Column('username', String, unique=True, nullable=False),
+              Column('password_hash', String, nullable=False),
+              Column('is_admin', Boolean, default=False),
+              Column('created_at', DateTime),
+              Column('updated_at', DateTime)),
+        Table('some_model', meta,
+              Column('id', Integer, primary_key=True),
+              Column('name', String, nullable=False),
+              Column('last_modified', DateTime)),
+        Table('recurring_entries', meta,
+              Column('id', Integer, primary_key=True),
+              Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+              Column('description', String, nullable=False),
+              Column('usage', String, nullable=False),
+              Column('amount', Integer, nullable=False),
+              Column('duration', Integer, nullable=False),
+              Column('start_date', DateTime),
+              Column('created_at', DateTime),
+              Column('updated_at', DateTime)),
+        Table('transactions', meta,
+              Column('id', Integer, primary_key=True),
+              Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+              Column('date', DateTime, nullable=False),
+              Column('description', String, nullable=False),
+              Column('usage', String, nullable=False),
+              Column('amount', Integer, nullable=False),
+              Column('paid', Boolean, nullable=False, default=False),
+              Column('recurring_id', Integer, ForeignKey('recurring_entries.id'), nullable=True),
+              Column('created_at', DateTime),
+              Column('updated_at', DateTime)),
+        Table('changelog_local', meta,
+              Column('id', Integer, primary_key=True),
+              Column('table_name', String, nullable=False),
+              Column('operation', String, nullable=False),
+              Column('row_id', Integer, nullable=False),
+              Column('data', JSON, nullable=True),
+              Column('timestamp', DateTime)),
+        Table('changelog_remote', meta,
+              Column('id', Integer, primary_key=True),
+              Column('table_name', String, nullable=False),
+              Column('operation', String, nullable=False),
+              Column('row_id', Integer, nullable=False),
+              Column('data', JSON, nullable=True),
+              Column('timestamp', DateTime)),
+    ]
+    meta.create_all(conn, checkfirst=True)
+    # Ältere Datenbanken (z. B. das früher von sync.py angelegte local.db
+    # oder Installationen vor is_admin) auf denselben Spaltenstand bringen
+    for table in tables:
+        add_missing_columns(conn, table)
+
+
+@migration(2, "Tabelle suggestions")
+def _m002_suggestions(conn):
+    meta = MetaData()
+    Table('users', meta, Column('id', Integer, primary_key=True))  # nur als FK-Ziel
+    suggestions = Table('suggestions', meta,
+          Column('id', Integer, primary_key=True),
+          Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+          Column('suggestion_type', String, nullable=False),
+          Column('text', String, nullable=False))
+    # Der eindeutige Index (user_id, suggestion_type, text) folgt in Migration 4,
+    # damit er auch bei bereits bestehenden Tabellen angelegt wird
+    meta.create_all(conn, tables=[suggestions], checkfirst=True)
+
+
+@migration(3, "Doppelte Fixkosten-Buchungen bereinigen")
+def _m003_dedupe_recurring(conn):
+    # Voraussetzung für den eindeutigen Index (user_id, recurring_id, date):
+    # je Serie und Datum bleibt eine bezahlte Buchung erhalten, sonst die
+    # älteste – ein vom Nutzer gesetztes "bezahlt" geht nicht verloren
+    result = conn.execute(text("""
+        DELETE FROM transactions
+         WHERE id IN (
+               SELECT id FROM (
+                   SELECT id, ROW_NUMBER() OVER (
+                              PARTITION BY user_id, recurring_id, date
+                              ORDER BY paid DESC, id) AS rank
+                     FROM transactions
+                    WHERE recurring_id IS NOT NULL
+               ) AS ranked
+                WHERE rank > 1
+           )
+    """))
+    if result.rowcount:
+        logging.info(f"Migration: {result.rowcount} doppelte Fixkosten-Buchung(en) entfernt.")
+    # Dasselbe für eine bereits vor Migration 2 vorhandene suggestions-Tabelle
+    conn.execute(text("""
+        DELETE FROM suggestions
+         WHERE id NOT IN (
+               SELECT keep_id FROM (
+                   SELECT MIN(id) AS keep_id
+                     FROM suggestions
+                    GROUP BY user_id, suggestion_type, text
+               ) AS keep
+           )
+    """))
+
+
+@migration(4, "Indizes für Dashboard, Fixkosten und ON CONFLICT", transactional=False)
+def _m004_indexes(conn):
+    create_index(conn, 'ix_transactions_user_date_id', 'transactions',
+                 ['user_id', 'date', 'id'], concurrently=True)
+    # Ziel von ON CONFLICT (user_id, recurring_id, date) in core/fixkosten.py;
+    # ersetzt den nicht eindeutigen Index mit denselben Spalten
+    create_index(conn, 'uq_transactions_user_recurring_date', 'transactions',
+                 ['user_id', 'recurring_id', 'date'], unique=True, concurrently=True)
+    drop_index(conn, 'ix_transactions_user_recurring_date', concurrently=True)
+    create_index(conn, 'ix_recurring_entries_user_start', 'recurring_entries',
+                 ['user_id', 'start_date'], concurrently=True)
+    # Ziel von ON CONFLICT (user_id, suggestion_type, text) in core/vorschlaege.py,
+    # falls suggestions schon vor Migration 2 (ohne Constraint) existierte
+    create_index(conn, 'uq_suggestions_user_type_text', 'suggestions',
+                 ['user_id', 'suggestion_type', 'text'], unique=True, concurrently=True)
+
+
+@migration(5, "SQLite: inkrementelles Auto-Vacuum", transactional=False)
+def _m005_sqlite_auto_vacuum(conn):
+    if conn.dialect.name != "sqlite":
+        return
+    # Jede Verbindung setzt auto_vacuum=INCREMENTAL (configure_sqlite_connection);
+    # bei bestehenden Dateien greift das erst nach einem VACUUM. Das schreibt die
+    # ganze Datei neu und läuft deshalb nicht beim Start, sondern einmalig per
+    # flask vacuum-sqlite – danach gibt core.db.sqlite_maintenance() freie
+    # Seiten schrittweise zurück
+    if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+        logging.info("Migration: auto_vacuum=INCREMENTAL greift erst nach flask vacuum-sqlite.")
+
+
+@migration(6, "Tabelle monthly_totals")
+def _m006_monthly_totals(conn):
+    meta = MetaData()
+    Table('users', meta, Column('id', Integer, primary_key=True))  # nur als FK-Ziel
+    monthly_totals = Table('monthly_totals', meta,
+          Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
+          Column('year', Integer, primary_key=True, autoincrement=False),
+          Column('month', Integer, primary_key=True, autoincrement=False),
+          Column('income', Integer, nullable=False, default=0),
+          Column('expenses', Integer, nullable=False, default=0),
+          Column('open_recurring', Integer, nullable=False, default=0),
+          Column('tx_count', Integer, nullable=False, default=0))
+    meta.create_all(conn, tables=[monthly_totals], checkfirst=True)
+    # Bestehende Buchungen einmalig aggregieren; danach pflegen die Schreibpfade
+    # die Tabelle inkrementell (core/totals.py)
+    if conn.dialect.name == "sqlite":
+        year_expr, month_expr = "CAST(strftime('%Y', date) AS INTEGER)", "CAST(strftime('%m', date) AS INTEGER)"
+    else:
+        year_expr, month_expr = "EXTRACT(YEAR FROM date)", "EXTRACT(MONTH FROM date)"
+    conn.execute(text("DELETE FROM monthly_totals"))
+    conn.execute(text(f"""
+        INSERT INTO monthly_totals (user_id, year, month, income, expenses, open_recurring, tx_count)
+        SELECT user_id, {year_expr}, {month_expr},
+               COALESCE(SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN amount < 0 THEN -amount ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN amount < 0 AND paid = FALSE AND recurring_id IS NOT NULL
+                                 THEN -amount ELSE 0 END), 0),
+               COUNT(*)
+          FROM transactions
+         GROUP BY user_id, {year_expr}, {month_expr}
+    """))
+
+
+@migration(7, "Suchindex: pg_trgm (Postgres) bzw. FTS5 (SQLite)", transactional=False)
+def _m007_search_index(conn):
+    # Ohne Erweiterung bzw. FTS5 bleibt die Suche funktionsfähig (LIKE,
+    # sequentiell) – core/search.py prüft, was vorhanden ist
+    if conn.dialect.name == "postgresql":
+        try:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        except Exception as e:
+            logging.warning(f"Migration: pg_trgm nicht verfügbar, Suche ohne Trigramm-Index ({e}).")
+            return
+        # Deckt LOWER(...) LIKE '%q%' aus core.queries ab
+        create_index(conn, 'ix_transactions_description_trgm', 'transactions',
+                     ['lower(description) gin_trgm_ops'], using='gin', concurrently=True)
+        create_index(conn, 'ix_transactions_usage_trgm', 'transactions',
+                     ['lower("usage") gin_trgm_ops'], using='gin', concurrently=True)
+        return
+
+    # SQLite: FTS5-Tabelle über transactions (external content), per Trigger
+    # synchron gehalten; rowid = transactions.id
+    try:
+        conn.exec_driver_sql("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+                description, "usage",
+                content='transactions', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+    except Exception as e:
+        logging.warning(f"Migration: FTS5 nicht verfügbar, Suche ohne Volltextindex ({e}).")
+        return
+    conn.exec_driver_sql("""
+        CREATE TRIGGER IF NOT EXISTS transactions_fts_ai AFTER INSERT ON transactions BEGIN
+            INSERT INTO transactions_fts (rowid, description, "usage")
+            VALUES (new.id, new.description, new."usage");
+        END
+    """)
+    conn.exec_driver_sql("""
+        CREATE TRIGGER IF NOT EXISTS transactions_fts_ad AFTER DELETE ON transactions BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, description, "usage")
+            VALUES ('delete', old.id, old.description, old."usage");
+        END
+    """)
+    conn.exec_driver_sql("""
+        CREATE TRIGGER IF NOT EXISTS transactions_fts_au AFTER UPDATE OF description, "usage" ON transactions BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, description, "usage")
+            VALUES ('delete', old.id, old.description, old."usage");
+            INSERT INTO transactions_fts (rowid, description, "usage")
+            VALUES (new.id, new.description, new."usage");
+        END
+    """)
+    conn.exec_driver_sql("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+
+
+@migration(8, "Spalte users.data_version")
+def _m008_user_data_version(conn):
+    if 'data_version' not in _existing_columns(conn, 'users'):
+        conn.execute(text("ALTER TABLE users ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0"))
+
+
+@migration(9, "Beträge in ganzen Cent")
+def _m009_amounts_in_cents(conn):
+    # Bisher Euro: auf Postgres INTEGER, auf SQLite meist REAL (float() aus den
+    # Formularen). Danach rechnen alle Summen exakt mit ganzen Zahlen.
+    # Gerundet wird wie to_cents(): kaufmännisch (halbe Cent von null weg) auf
+    # dem eingegebenen Dezimalwert – nicht auf der Binärzahl, sonst würde aus
+    # 1.005 (als float 1.00499…) 100 statt 101 Cent.
+    columns = [("transactions", "amount"), ("recurring_entries", "amount"),
+               ("monthly_totals", "income"), ("monthly_totals", "expenses"),
+               ("monthly_totals", "open_recurring")]
+    if conn.dialect.name == "postgresql":
+        # Über NUMERIC: ROUND() auf double precision rundet halbe Werte zur
+        # geraden Zahl. BIGINT, damit Monats- und Jahressummen nicht überlaufen.
+        for table, col in columns:
+            conn.execute(text(
+                f"ALTER TABLE {table} ALTER COLUMN {col} TYPE BIGINT "
+                f"USING CAST(ROUND(CAST({col} AS NUMERIC) * 100) AS BIGINT)"
+            ))
+    else:
+        # SQLite kennt kein ALTER COLUMN; die Spalten aus Migration 1 sind
+        # INTEGER. Ein älteres local.db mit REAL-Spalte hält die Cent als x.0 –
+        # weiterhin exakt, an den Rändern wird per int() gewandelt. Gerechnet
+        # wird in Python (repr() liefert die kürzeste Dezimaldarstellung).
+        for table, col in columns:
+            rows = conn.execute(text(f"SELECT rowid, {col} FROM {table} WHERE {col} IS NOT NULL")).all()
+            if rows:
+                conn.execute(text(f"UPDATE {table} SET {col} = :cents WHERE rowid = :id"),
+                             [{"id": r[0], "cents": to_cents(repr(r[1]))} for r in rows])
+    logging.info("Migration: Beträge auf Cent umgestellt.")
+
+
+@migration(10, "Spalte transactions.content_hash für den Kontoauszug-Import", transactional=False)
+def _m010_content_hash(conn):
+    if 'content_hash' not in _existing_columns(conn, 'transactions'):
+        conn.execute(text("ALTER TABLE transactions ADD COLUMN content_hash VARCHAR"))
+    # Manuell erfasste Buchungen bleiben NULL – NULL-Werte kollidieren nicht
+    create_index(conn, 'uq_transactions_user_content_hash', 'transactions',
+                 ['user_id', 'content_hash'], unique=True, concurrently=True)
+
+
+@migration(11, "Wiederholungsregeln für recurring_entries")
+def _m011_recurrence_rules(conn):
+    # Bestehende Serien: monatlich, Intervall 1, Ende nach `duration` Terminen
+    existing = _existing_columns(conn, 'recurring_entries')
+    columns = [("frequency", "VARCHAR NOT NULL DEFAULT 'monthly'"),
+               ("freq_interval", "INTEGER NOT NULL DEFAULT 1"),
+               ("until", "TIMESTAMP" if conn.dialect.name == "postgresql" else "DATETIME")]
+    for name, ddl in columns:
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE recurring_entries ADD COLUMN {_quote(conn, name)} {ddl}"))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Runner
+# ──────────────────────────────────────────────────────────────────────────────
+def current_version(bind) -> int:
+    """Zuletzt angewendete Schema-Version (0 = noch nichts migriert)."""
+    with bind.connect() as conn:
+        if not inspect(conn).has_table('schema_migrations'):
+            return 0
+        return conn.execute(select(func.max(schema_migrations.c.version))).scalar() or 0
+
+
+def _apply(engine, version: int, description: str, fn, transactional: bool) -> None:
+    if transactional:
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow()))
+    else:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            fn(conn)
+        with engine.begin() as conn:
+            conn.execute(schema_migrations.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow()))
+
+
+def run_migrations(engine) -> int:
+    """
+    Bringt das Schema auf den neuesten Stand und gibt die erreichte Version
+    zurück. Ist die Datenbank aktuell, kostet das genau eine Abfrage.
+    """
+    latest = max(m[0] for m in MIGRATIONS)
+    with engine.connect() as conn:
+        try:
+            version = conn.execute(select(func.max(schema_migrations.c.version))).scalar() or 0
+        except Exception:
+            conn.rollback()
+            version = 0
+    if version >= latest:
+        return version
+
+    lock_conn = None
+    try:
+        if engine.dialect.name == "postgresql":
+            # Autocommit, sonst würde die offene Transaktion CREATE INDEX CONCURRENTLY blockieren
+            lock_conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+            lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _PG_LOCK_KEY})
+        with engine.begin() as conn:
+            schema_migrations.create(conn, checkfirst=True)
+        # Nach dem Lock erneut lesen – ein anderer Worker kann schon migriert haben
+        version = current_version(engine)
+        for m_version, description, fn, transactional in sorted(MIGRATIONS, key=lambda m: m[0]):
+            if m_version <= version:
+                continue
+            logging.info(f"Migration {m_version}: {description} …")
+            _apply(engine, m_version, description, fn, transactional)
+            version = m_version
+        logging.info(f"Datenbankschema auf Version {version}.")
+        return version
+    finally:
+        if lock_conn is not None:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _PG_LOCK_KEY})
+            lock_conn.close()
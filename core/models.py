@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, Integer, String, DateTime, JSON, Boolean, ForeignKey
+    Column, Integer, BigInteger, String, DateTime, JSON, Boolean, ForeignKey, Index
 )
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -12,6 +12,7 @@ class User(Base):
     username      = Column(String, unique=True, nullable=False)
     password_hash = Column(String, nullable=False)
     is_admin      = Column(Boolean, default=False)
+    data_version  = Column(Integer, nullable=False, default=0)  # siehe core/dataversion.py
     created_at    = Column(DateTime, default=datetime.utcnow)
     updated_at    = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -27,9 +28,12 @@ class RecurringEntry(Base):
     user_id       = Column(Integer, ForeignKey('users.id'), nullable=False)
     description   = Column(String, nullable=False)
     usage         = Column(String, nullable=False)
-    amount        = Column(Integer, nullable=False)
-    duration      = Column(Integer, nullable=False)  # in Monaten
+    amount        = Column(BigInteger, nullable=False)  # Cent
+    duration      = Column(Integer, nullable=False)  # Anzahl Termine, 0 = ohne (siehe core/recurrence.py)
     start_date    = Column(DateTime, default=datetime.utcnow)
+    frequency     = Column(String, nullable=False, default='monthly')  # weekly | monthly | yearly
+    freq_interval = Column(Integer, nullable=False, default=1)
+    until         = Column(DateTime, nullable=True)  # letzter möglicher Termin
     created_at    = Column(DateTime, default=datetime.utcnow)
     updated_at    = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -40,12 +44,46 @@ class Transaction(Base):
     date         = Column(DateTime, nullable=False, default=datetime.utcnow)
     description  = Column(String, nullable=False)
     usage        = Column(String, nullable=False)
-    amount       = Column(Integer, nullable=False)
+    amount       = Column(BigInteger, nullable=False)  # Cent
     paid         = Column(Boolean, nullable=False, default=False)
     recurring_id = Column(Integer, ForeignKey('recurring_entries.id'), nullable=True)
+    content_hash = Column(String, nullable=True)  # nur importierte Buchungen, siehe core/bankimport.py
     created_at   = Column(DateTime, default=datetime.utcnow)
     updated_at   = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # Monats-/Jahresansicht im Dashboard: Range-Scan über (user_id, date),
+        # id für ORDER BY date, id; deckt auch die Jahr/Monat-Ermittlung ab
+        Index('ix_transactions_user_date_id', 'user_id', 'date', 'id'),
+        # Fixkosten-Serien eines Nutzers; Ziel von ON CONFLICT in core/fixkosten.py
+        Index('uq_transactions_user_recurring_date', 'user_id', 'recurring_id', 'date', unique=True),
+        # Kontoauszug-Import: schon importierte Umsätze; Ziel von ON CONFLICT
+        Index('uq_transactions_user_content_hash', 'user_id', 'content_hash', unique=True),
+    )
+
+class Suggestion(Base):
+    __tablename__ = 'suggestions'
+    id              = Column(Integer, primary_key=True)
+    user_id         = Column(Integer, ForeignKey('users.id'), nullable=False)
+    suggestion_type = Column(String, nullable=False)  # 'description' oder 'usage'
+    text            = Column(String, nullable=False)
+
+    __table_args__ = (
+        # Ziel von ON CONFLICT in core/vorschlaege.py
+        Index('uq_suggestions_user_type_text', 'user_id', 'suggestion_type', 'text', unique=True),
+    )
+
+class MonthlyTotal(Base):
+    """Vorberechnete Monatssummen je Nutzer (gepflegt von core/totals.py)."""
+    __tablename__ = 'monthly_totals'
+    user_id        = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    year           = Column(Integer, primary_key=True, autoincrement=False)
+    month          = Column(Integer, primary_key=True, autoincrement=False)
+    income         = Column(BigInteger, nullable=False, default=0)   # Summe der Einnahmen (Cent)
+    expenses       = Column(BigInteger, nullable=False, default=0)   # Summe der Ausgaben (Cent, positiv)
+    open_recurring = Column(BigInteger, nullable=False, default=0)   # offene Fixkosten (Cent, positiv)
+    tx_count       = Column(Integer, nullable=False, default=0)
+
 class LocalChange(Base):
     __tablename__ = 'changelog_local'
     id          = Column(Integer, primary_key=True)
@@ -0,0 +1,175 @@
+# core/projection.py – virtuelle Fixkosten-Termine (FIXKOSTEN_VIRTUAL=1)
+"""
+Standardmäßig schreibt eine Fixkosten-Serie jeden Monat als eigene Zeile in
+transactions (create_fix_transactions, Scheduler). Mit FIXKOSTEN_VIRTUAL=1
+bleibt es bei der Zeile in recurring_entries: das Dashboard rechnet die
+Termine beim Lesen hoch und mischt sie nach (date, id) in die echten
+Buchungen – samt laufendem Kontostand, Saldo, offenen Fixkosten und
+Jahr/Monat-Navigation. Die Termine liefert core/recurrence.py (offene
+Serien bis recurrence.horizon()).
+
+Eine echte Buchung entsteht erst, wenn der Nutzer einen Termin als bezahlt
+markiert (materialize()); ab dann zählt für diesen Termin nur noch sie.
+Virtuelle Termine tragen eine negative id aus Serie und Datum
+(virtual_id()), damit Keyset-Cursor und Bezahlt-Schalter wie bei echten
+Buchungen funktionieren.
+
+Berichte, Export und Sync sehen nur echte Buchungen.
+"""
+import bisect
+import os
+from datetime import date
+
+from core import queries as Q
+from core.recurrence import Rule, horizon
+from utils_web import as_date
+
+FIXKOSTEN_VIRTUAL = os.getenv("FIXKOSTEN_VIRTUAL", "0").lower() in ("1", "true", "yes")
+
+# date.toordinal() ist < _ID_SPAN
+_ID_SPAN = 10_000_000
+# Schlüssel (date, id), der vor allen Zeilen eines Tages liegt
+_BEFORE_DAY = -(2 ** 62)
+
+
+def virtual_id(recurring_id: int, day: date) -> int:
+    return -(recurring_id * _ID_SPAN + day.toordinal())
+
+
+def parse_virtual_id(value: int) -> tuple:
+    """Negative id → (recurring_id, Termin)."""
+    recurring_id, ordinal = divmod(-value, _ID_SPAN)
+    return recurring_id, date.fromordinal(max(ordinal, 1))
+
+
+class Projection:
+    """
+    Die noch nicht gebuchten Termine eines Nutzers bis `end`, sortiert nach
+    (date, id) als Zeilen wie Q.DASHBOARD_TRANSACTIONS (ohne Kontostand),
+    dazu Präfixsummen für Kontostand und Summen.
+    """
+
+    def __init__(self, series, materialized, end: date):
+        rows = []
+        for entry, rule in series:
+            for day in rule.occurrences(date.min, end):
+                if (entry.id, day) not in materialized:
+                    rows.append((virtual_id(entry.id, day), day, entry.description, entry.usage,
+                                 entry.amount, False, entry.id))
+        rows.sort(key=lambda r: (r[1], r[0]))
+        self.rows = rows
+        self.keys = [(r[1], r[0]) for r in rows]
+        self.prefix = [0]
+        for r in rows:
+            self.prefix.append(self.prefix[-1] + r[4])
+
+    def __bool__(self):
+        return bool(self.rows)
+
+    def _index(self, key) -> int:
+        # Anzahl der Termine mit (date, id) <= key
+        return bisect.bisect_right(self.keys, key)
+
+    def total_before(self, start: date, after=(date.min, 0)) -> int:
+        """Summe (Cent) der Termine vor `start` bzw. bis einschließlich Cursor `after`."""
+        return self.prefix[max(self._index((start, _BEFORE_DAY)), self._index(after))]
+
+    def page(self, start: date, end: date, after=(date.min, 0)) -> list:
+        """Termine in [start, end) hinter dem Cursor `after`."""
+        lo = max(self._index((start, _BEFORE_DAY)), self._index(after))
+        hi = self._index((end, _BEFORE_DAY))
+        return self.rows[lo:hi]
+
+    def totals(self, start: date, end: date, rows=None) -> dict:
+        """Summen wie totals.period_totals() über die Termine in [start, end) bzw. `rows`."""
+        amounts = [r[4] for r in (self.page(start, end) if rows is None else rows)]
+        income = sum(a for a in amounts if a > 0)
+        expenses = -sum(a for a in amounts if a < 0)
+        return {"income": income, "expenses": expenses, "saldo": income - expenses,
+                "offen": expenses, "count": len(amounts)}
+
+    def months(self) -> set:
+        return {(r[1].year, r[1].month) for r in self.rows}
+
+
+def load(conn, user_id: int, end: date = date.max) -> Projection:
+    """
+    Projektion der Fixkosten-Serien von `user_id` bis `end`, höchstens bis
+    recurrence.horizon() (zwei Abfragen). Eine echte Buchung der Serie
+    ersetzt den Termin, in dessen Zeitraum sie liegt.
+    """
+    end = min(end, horizon())
+    series = [(r, Rule.of(r)) for r in Q.execute(conn, Q.RECURRING_LIST, user_id=user_id)]
+    if not series:
+        return Projection([], set(), end)
+    rules = {entry.id: rule for entry, rule in series}
+    materialized = {
+        (rec_id, rules[rec_id].occurrence_at(d))
+        for rec_id, d in Q.execute(conn, Q.MATERIALIZED_OCCURRENCES, user_id=user_id, end=end)
+        if rec_id in rules
+    }
+    return Projection(series, materialized, end)
+
+
+def materialize(conn, user_id: int, value: int, paid: bool) -> list:
+    """
+    Bezahlt-Schalter für den virtuellen Termin `value` (negative id): legt
+    die echte Buchung des Termins mit Status `paid` an bzw. setzt ihn, falls
+    es sie (im Zeitraum bis zum Folgetermin) schon gibt. Ohne commit;
+    liefert die geänderten Zeilen (date) – leer, wenn der Termin nicht zu
+    einer Ausgaben-Serie des Nutzers gehört.
+    """
+    rec_id, day = parse_virtual_id(value)
+    entry = Q.execute(conn, Q.RECURRING_ENTRY, id=rec_id, user_id=user_id).fetchone()
+    if entry is None or entry.amount >= 0:
+        return []
+    rule = Rule.of(entry)
+    if not rule.is_occurrence(day):
+        return []
+    existing = Q.execute(conn, Q.OCCURRENCE_TRANSACTION, user_id=user_id, recurring_id=rec_id,
+                         start=day, end=rule.period_end(day)).scalar()
+    if existing is not None:
+        return Q.execute(conn, Q.SET_TRANSACTION_PAID, paid_value=paid, transaction_id=existing,
+                         owner_id=user_id).fetchall()
+    return Q.execute(conn, Q.MATERIALIZE_OCCURRENCE, user_id=user_id, recurring_id=rec_id,
+                     date=day, paid=paid).fetchall()
+
+
+def matches(row, q: str) -> bool:
+    """Suchfilter für virtuelle Termine (wie LIKE '%q%' auf Beschreibung/Verwendungszweck)."""
+    q = q.lower()
+    return q in (row[2] or "").lower() or q in (row[3] or "").lower()
+
+
+def merge(rows, virtual, real_base: int | None, virtual_base: int = 0):
+    """
+    Mischt die echten Zeilen `rows` (nach (date, id) sortiert, Kontostand in
+    Spalte 7) mit den virtuellen Terminen `virtual` und liefert Zeilen-Tupel.
+    real_base ist der Kontostand der echten Buchungen vor der ersten Zeile,
+    virtual_base die Summe der virtuellen Termine davor; real_base=None
+    bedeutet ohne Kontostand (Suche).
+    """
+    virtual = iter(virtual)
+    pending = next(virtual, None)
+    real = real_base   # Kontostand der echten Buchungen bis zur aktuellen Zeile
+    carry = virtual_base
+
+    def flush(key):
+        nonlocal pending, carry
+        while pending is not None and (key is None or (pending[1], pending[0]) < key):
+            carry += pending[4]
+            yield (*pending, None if real is None else real + carry)
+            pending = next(virtual, None)
+
+    try:
+        for r in rows:
+            yield from flush((as_date(r[1]), r[0]))
+            if real_base is None:
+                yield tuple(r)
+            else:
+                real = r[7]
+                yield (*r[:7], real + carry)
+        yield from flush(None)
+    finally:
+        if hasattr(rows, 'close'):
+            rows.close()
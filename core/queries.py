@@ -0,0 +1,578 @@
+# core/queries.py – zentrale SQL-Statements (SQLAlchemy Core) für beide Backends
+"""
+Jedes häufig genutzte Statement ist hier genau einmal als Modul-Konstante
+definiert und wird mit gebundenen Parametern über die Pool-Verbindung aus
+core.db ausgeführt:
+
+    from core import queries as Q
+    rows = Q.execute(conn, Q.RECURRING_LIST, user_id=user_id).fetchall()
+
+SQLAlchemy kompiliert jedes Statement einmal pro Dialekt (Postgres/SQLite)
+und legt das Ergebnis im Statement-Cache der Engine ab (DB_QUERY_CACHE_SIZE).
+Platzhalter (%s / ?) und Dialekt-Unterschiede wie EXTRACT vs. strftime
+erledigt der Compiler – Routen bauen keine SQL-Strings mehr zusammen.
+
+Datumswerte werden als `Date` gebunden (ISO-Format JJJJ-MM-TT), damit
+SQLite-Vergleiche und eindeutige Indizes zu den bestehenden Einträgen
+passen. Aufrufer übergeben daher `date`-Objekte.
+"""
+from sqlalchemy import (
+    select, insert, update, delete, union, bindparam, distinct, extract,
+    func, or_, and_, case, tuple_, false, true, null, literal_column, table, column, cast,
+    MetaData, Table, Column, Boolean, Date, DateTime, Integer, BigInteger, String
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from core.models import User, Transaction, RecurringEntry, Suggestion, MonthlyTotal
+
+users = User.__table__
+transactions = Transaction.__table__
+recurring_entries = RecurringEntry.__table__
+suggestions = Suggestion.__table__
+monthly_totals = MonthlyTotal.__table__
+# FTS5-Index über transactions (nur SQLite, angelegt von Migration 7)
+transactions_fts = table("transactions_fts", column("rowid", Integer))
+
+
+def _date(name: str):
+    return bindparam(name, type_=Date)
+
+
+def _insert_ignore(table, index_elements, values):
+    """INSERT … ON CONFLICT (…) DO NOTHING – je ein Statement pro Dialekt."""
+    return {
+        "postgresql": pg_insert(table).values(values).on_conflict_do_nothing(index_elements=index_elements),
+        "sqlite": sqlite_insert(table).values(values).on_conflict_do_nothing(index_elements=index_elements),
+    }
+
+
+def execute(conn, stmt, params=None, **kwargs):
+    """
+    Führt `stmt` auf der SQLAlchemy-Connection `conn` aus. Parameter als
+    Keywords oder – für executemany – als Liste von Dicts in `params`.
+    """
+    if isinstance(stmt, dict):
+        stmt = stmt[conn.dialect.name]
+    return conn.execute(stmt, params if params is not None else kwargs)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Transaktionen (Dashboard)
+# ──────────────────────────────────────────────────────────────────────────────
+_t = transactions.c
+
+# Eine Seite des Dashboards: halboffener Bereich date >= start AND date < end
+# plus Keyset-Cursor (date, id) > (after_date, after_id) → Range-Scan auf
+# (user_id, date, id), egal wie weit hinten die Seite liegt. yield_per liest
+# über einen serverseitigen Cursor (benannter Cursor auf Postgres) in Blöcken.
+DASHBOARD_PAGE_BATCH = 200
+
+_dashboard_page = (
+    select(_t.id, _t.date, _t.description, _t.usage, _t.amount, _t.paid, _t.recurring_id)
+    .where(_t.user_id == bindparam("user_id"),
+           _t.date >= _date("start"),
+           _t.date < _date("end"),
+           tuple_(_t.date, _t.id) > tuple_(_date("after_date"), bindparam("after_id", type_=Integer)))
+    .order_by(_t.date, _t.id)
+    .limit(bindparam("limit", type_=Integer))
+)
+
+# Laufender Kontostand je Zeile: Eröffnungssaldo des Zeitraums (:opening, aus
+# monthly_totals, siehe totals.opening_balance) + Buchungen des Zeitraums bis
+# zum Cursor + SUM() OVER über die Seite. Das Fenster läuft über die bereits
+# begrenzte Seite, frühere Monate werden nie gelesen.
+_page = _dashboard_page.subquery("page")
+# Buchungen des Zeitraums bis einschließlich Cursor (auch einzeln, core/projection.py)
+DASHBOARD_CARRY_IN = (
+    select(func.coalesce(func.sum(_t.amount), 0))
+    .where(_t.user_id == bindparam("user_id"),
+           _t.date >= _date("start"),
+           tuple_(_t.date, _t.id) <= tuple_(_date("after_date"), bindparam("after_id", type_=Integer)))
+)
+_carry_in = DASHBOARD_CARRY_IN.scalar_subquery()
+_balance = (
+    bindparam("opening", type_=_t.amount.type) + _carry_in
+    + func.sum(_page.c.amount).over(order_by=(_page.c.date, _page.c.id))
+)
+DASHBOARD_TRANSACTIONS = (
+    select(*_page.c, _balance.label("balance"))
+    .order_by(_page.c.date, _page.c.id)
+    .execution_options(yield_per=DASHBOARD_PAGE_BATCH)
+)
+
+# Suchfilter (core/search.py wählt die Variante):
+#   like – LOWER(…) LIKE :q mit q = '%suchbegriff%' (% und _ darin maskiert);
+#          auf Postgres über die pg_trgm-GIN-Indizes, sonst sequentiell
+#   fts  – SQLite: Treffer aus transactions_fts, match = '"miet"* "wohn"*'
+_search_like = or_(func.lower(_t.description).like(bindparam("q"), escape="\\"),
+                   func.lower(_t.usage).like(bindparam("q"), escape="\\"))
+_fts_match = literal_column("transactions_fts").op("MATCH")(bindparam("match"))
+_search_fts = _t.id.in_(select(transactions_fts.c.rowid).where(_fts_match))
+
+# Wie oben, zusätzlich Suchfilter; ein Kontostand über die Treffer wäre
+# keiner, die Spalte bleibt leer
+_search_page = _dashboard_page.add_columns(null().label("balance")).execution_options(
+    yield_per=DASHBOARD_PAGE_BATCH)
+DASHBOARD_TRANSACTIONS_SEARCH = {
+    "like": _search_page.where(_search_like),
+    "trgm": _search_page.where(_search_like),
+    "fts": _search_page.where(_search_fts),
+}
+
+# Beste Treffer zuerst (Suchfeld-Vorschläge): auf SQLite nach bm25 (Beschreibung
+# doppelt gewichtet), auf Postgres nach pg_trgm-Wortähnlichkeit mit :term
+_hit_columns = (_t.id, _t.date, _t.description, _t.usage, _t.amount)
+RANKED_SEARCH = {
+    "fts": (
+        select(*_hit_columns)
+        .select_from(transactions_fts.join(transactions, _t.id == transactions_fts.c.rowid))
+        .where(_fts_match, _t.user_id == bindparam("user_id"))
+        .order_by(func.bm25(literal_column("transactions_fts"), 2.0, 1.0), _t.date.desc(), _t.id.desc())
+        .limit(bindparam("limit", type_=Integer))
+    ),
+    "trgm": (
+        select(*_hit_columns)
+        .where(_t.user_id == bindparam("user_id"), _search_like)
+        .order_by(func.greatest(func.word_similarity(bindparam("term"), func.lower(_t.description)),
+                                func.word_similarity(bindparam("term"), func.lower(_t.usage))).desc(),
+                  _t.date.desc(), _t.id.desc())
+        .limit(bindparam("limit", type_=Integer))
+    ),
+    "like": (
+        select(*_hit_columns)
+        .where(_t.user_id == bindparam("user_id"), _search_like)
+        .order_by(_t.date.desc(), _t.id.desc())
+        .limit(bindparam("limit", type_=Integer))
+    ),
+}
+
+# Alle Buchungen eines Nutzers in [start, end) für core/ledger.py – eine Abfrage,
+# blockweise über den serverseitigen Cursor gelesen
+LEDGER_ROWS = (
+    select(_t.id, _t.date, _t.description, _t.usage, _t.amount, _t.paid, _t.recurring_id)
+    .where(_t.user_id == bindparam("user_id"),
+           _t.date >= _date("start"),
+           _t.date < _date("end"))
+    .order_by(_t.date, _t.id)
+    .execution_options(yield_per=5000)
+)
+
+# Export (core/export.py): dieselben Spalten, blockweise über den serverseitigen Cursor
+EXPORT_BATCH = 5000
+EXPORT_TRANSACTIONS = LEDGER_ROWS.execution_options(yield_per=EXPORT_BATCH)
+
+INSERT_TRANSACTION = insert(transactions).values(
+    user_id=bindparam("user_id"),
+    date=_date("date"),
+    description=bindparam("description"),
+    usage=bindparam("usage"),
+    amount=bindparam("amount"),
+    paid=bindparam("paid"),
+    recurring_id=bindparam("recurring_id"),
+)
+
+# Kontoauszug-Import (core/bankimport.py): bezahlte Buchung mit Inhalts-Hash;
+# schon importierte Umsätze (user_id, content_hash) werden übersprungen.
+# SQLite: executemany über dieses Statement
+IMPORT_TRANSACTION = _insert_ignore(
+    transactions,
+    ["user_id", "content_hash"],
+    dict(user_id=bindparam("user_id"),
+         date=_date("date"),
+         description=bindparam("description"),
+         usage=bindparam("usage"),
+         amount=bindparam("amount"),
+         paid=True,
+         recurring_id=None,
+         content_hash=bindparam("content_hash")),
+)
+
+# Postgres: COPY in eine temporäre Tabelle, dann ein INSERT … SELECT
+import_staging = Table(
+    "import_staging", MetaData(),
+    Column("date", Date),
+    Column("description", String),
+    Column("usage", String),
+    Column("amount", BigInteger),
+    Column("content_hash", String),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+_st = import_staging.c
+IMPORT_FROM_STAGING = (
+    pg_insert(transactions)
+    .from_select(
+        ["user_id", "date", "description", "usage", "amount", "paid", "content_hash"],
+        select(bindparam("user_id", type_=Integer), _st.date, _st.description, _st.usage,
+               _st.amount, true(), _st.content_hash),
+    )
+    .on_conflict_do_nothing(index_elements=["user_id", "content_hash"])
+)
+
+# RETURNING date: betroffene Monate für core.totals
+DELETE_TRANSACTIONS = delete(transactions).where(
+    _t.id.in_(bindparam("ids", expanding=True)),
+    _t.user_id == bindparam("user_id"),
+).returning(_t.date)
+
+# Nur Fixkosten-Ausgaben lassen sich als bezahlt markieren.
+# In UPDATE-Statements dürfen Parameter nicht wie Spalten der Tabelle heißen.
+SET_TRANSACTION_PAID = (
+    update(transactions)
+    .values(paid=bindparam("paid_value"))
+    .where(_t.id == bindparam("transaction_id"),
+           _t.user_id == bindparam("owner_id"),
+           _t.recurring_id.isnot(None),
+           _t.amount < 0)
+    .returning(_t.date)
+)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Fixkosten
+# ──────────────────────────────────────────────────────────────────────────────
+_r = recurring_entries.c
+
+# Regelspalten: core/recurrence.Rule.of()
+_rule_columns = (_r.duration, _r.start_date, _r.frequency, _r.freq_interval, _r.until)
+
+RECURRING_LIST = (
+    select(_r.id, _r.description, _r.usage, _r.amount, *_rule_columns)
+    .where(_r.user_id == bindparam("user_id"))
+    .order_by(_r.start_date.desc(), _r.id.desc())
+)
+
+RECURRING_TEXT = select(_r.description, _r.usage).where(
+    _r.id == bindparam("id"), _r.user_id == bindparam("user_id"))
+
+INSERT_RECURRING = (
+    insert(recurring_entries)
+    .values(user_id=bindparam("user_id"),
+            description=bindparam("description"),
+            usage=bindparam("usage"),
+            amount=bindparam("amount"),
+            duration=bindparam("duration"),
+            start_date=_date("start_date"),
+            frequency=bindparam("frequency"),
+            freq_interval=bindparam("freq_interval"),
+            until=_date("until"))
+    .returning(_r.id)
+)
+
+# Offene Buchungen gelöschter Serien fallen weg, bezahlte bleiben als Einzelbuchung
+DELETE_OPEN_RECURRING_TRANSACTIONS = delete(transactions).where(
+    _t.recurring_id.in_(bindparam("ids", expanding=True)),
+    _t.user_id == bindparam("user_id"),
+    _t.paid == false(),
+).returning(_t.date)
+
+DETACH_RECURRING_TRANSACTIONS = (
+    update(transactions)
+    .values(recurring_id=None)
+    .where(_t.recurring_id.in_(bindparam("ids", expanding=True)),
+           _t.user_id == bindparam("owner_id"))
+    .returning(_t.date)
+)
+
+DELETE_RECURRING = delete(recurring_entries).where(
+    _r.id.in_(bindparam("ids", expanding=True)),
+    _r.user_id == bindparam("user_id"),
+).returning(_r.start_date)
+
+# Offene Fixkosten-Buchung; Duplikate je (user_id, recurring_id, date) werden übersprungen
+INSERT_FIX_TRANSACTION = _insert_ignore(
+    transactions,
+    ["user_id", "recurring_id", "date"],
+    dict(user_id=bindparam("user_id"),
+         date=_date("date"),
+         description=bindparam("description"),
+         usage=bindparam("usage"),
+         amount=bindparam("amount"),
+         paid=False,
+         recurring_id=bindparam("recurring_id")),
+)
+
+# Neue Fixkosten-Serie (core/fixkosten.create_fix_transactions) in einem
+# Statement. Postgres: ein Termin je Zeile aus generate_series mit dem
+# Schritt der Regel (Monate bzw. Tage), Beschreibung/Verwendungszweck direkt
+# aus der Serie; SQLite: executemany über INSERT_FIX_TRANSACTION.
+_series_dates = func.generate_series(
+    cast(_date("start"), DateTime),
+    cast(_date("last"), DateTime),
+    func.make_interval(0, bindparam("months", type_=Integer), 0, bindparam("days", type_=Integer)),
+).table_valued("date").render_derived()
+INSERT_FIX_SERIES = (
+    pg_insert(transactions)
+    .from_select(
+        ["user_id", "date", "description", "usage", "amount", "paid", "recurring_id"],
+        select(_r.user_id, _series_dates.c.date, _r.description, _r.usage,
+               bindparam("amount", type_=BigInteger), false(), _r.id)
+        .select_from(recurring_entries.join(_series_dates, true()))
+        .where(_r.id == bindparam("id"), _r.user_id == bindparam("user_id")),
+    )
+    .on_conflict_do_nothing(index_elements=["user_id", "recurring_id", "date"])
+)
+
+# Fehlende Fixkosten-Buchungen (core/fixkosten.catch_up_users), zweigeteilt:
+#
+# * einfache Monatsserien (monatlich, Intervall 1, ohne Enddatum – der
+#   Standard und alle migrierten Serien): ein Statement über alle Serien und
+#   Monate [start, end) der Nutzer `user_ids`, CATCH_UP_FIX_TRANSACTIONS
+# * alle anderen Regeln: RECURRING_RULES und ihre Buchungen im Zeitraum
+#   (SERIES_TRANSACTIONS); die fälligen Termine rechnet core/recurrence.py,
+#   eingefügt wird per executemany über INSERT_FIX_TRANSACTION.
+_plain_monthly = and_(_r.frequency == "monthly", _r.freq_interval == 1, _r.until.is_(None))
+
+
+def _catch_up_fix(dialect_insert, months, month_expr, rec_start, rec_end, next_month):
+    # Kandidaten (Serie, Monat) im Zeitraum, die in der Laufzeit der Serie
+    # liegen (duration = Anzahl der Monate, 0 = offen) und für die es in dem
+    # Monat noch keine Buchung der Serie gibt (auch keine verschobene)
+    existing = (
+        select(literal_column("1"))
+        .where(_t.user_id == _r.user_id,
+               _t.recurring_id == _r.id,
+               _t.date >= month_expr,
+               _t.date < next_month)
+    )
+    missing = (
+        select(_r.user_id, month_expr, _r.description, _r.usage, _r.amount, false(), _r.id)
+        .select_from(recurring_entries.join(months, true()))
+        .where(_r.user_id.in_(bindparam("user_ids", expanding=True)),
+               _plain_monthly,
+               month_expr >= rec_start,
+               or_(func.coalesce(_r.duration, 0) == 0, month_expr < rec_end),
+               ~existing.exists())
+    )
+    return (
+        dialect_insert(transactions)
+        .from_select(["user_id", "date", "description", "usage", "amount", "paid", "recurring_id"], missing)
+        .on_conflict_do_nothing(index_elements=["user_id", "recurring_id", "date"])
+        .returning(_t.user_id, _t.date)
+    )
+
+
+# Monatsanfänge: Postgres generate_series(start, last), SQLite rekursive CTE
+_series_months = func.generate_series(
+    cast(_date("start"), DateTime),
+    cast(_date("last"), DateTime),
+    literal_column("interval '1 month'"),
+).table_valued("month").render_derived()
+_pg_month = _series_months.c.month
+_lite_months = select(cast(_date("start"), String).label("month")).cte("months", recursive=True)
+_lite_months = _lite_months.union_all(
+    select(func.date(_lite_months.c.month, "+1 month"))
+    .where(func.date(_lite_months.c.month, "+1 month") < _date("end"))
+)
+_lite_month = _lite_months.c.month
+CATCH_UP_FIX_TRANSACTIONS = {
+    "postgresql": _catch_up_fix(
+        pg_insert, _series_months, _pg_month,
+        func.date_trunc("month", _r.start_date),
+        func.date_trunc("month", _r.start_date) + func.make_interval(0, _r.duration),
+        _pg_month + literal_column("interval '1 month'"),
+    ),
+    "sqlite": _catch_up_fix(
+        sqlite_insert, _lite_months, _lite_month,
+        func.date(_r.start_date, "start of month"),
+        func.date(_r.start_date, "start of month", "+" + cast(_r.duration, String) + " months"),
+        func.date(_lite_month, "+1 month"),
+    ),
+}
+
+RECURRING_RULES = select(
+    _r.id, _r.user_id, _r.description, _r.usage, _r.amount, *_rule_columns
+).where(_r.user_id.in_(bindparam("user_ids", expanding=True)), ~_plain_monthly)
+
+SERIES_TRANSACTIONS = select(_t.recurring_id, _t.date).where(
+    _t.user_id.in_(bindparam("user_ids", expanding=True)),
+    _t.recurring_id.in_(bindparam("ids", expanding=True)),
+    _t.date >= _date("start"),
+    _t.date < _date("end"),
+)
+
+# Virtuelle Fixkosten-Termine (core/projection.py): Monate, für die es schon
+# eine echte Buchung der Serie gibt, und das Anlegen einer solchen Buchung
+MATERIALIZED_OCCURRENCES = select(_t.recurring_id, _t.date).where(
+    _t.user_id == bindparam("user_id"),
+    _t.recurring_id.isnot(None),
+    _t.date < _date("end"),
+)
+
+RECURRING_ENTRY = select(_r.id, _r.amount, *_rule_columns).where(
+    _r.id == bindparam("id"), _r.user_id == bindparam("user_id"))
+
+OCCURRENCE_TRANSACTION = (
+    select(_t.id)
+    .where(_t.user_id == bindparam("user_id"),
+           _t.recurring_id == bindparam("recurring_id"),
+           _t.date >= _date("start"),
+           _t.date < _date("end"))
+    .order_by(_t.date, _t.id)
+    .limit(1)
+)
+
+MATERIALIZE_OCCURRENCE = (
+    insert(transactions)
+    .from_select(
+        ["user_id", "date", "description", "usage", "amount", "paid", "recurring_id"],
+        select(_r.user_id, _date("date"), _r.description, _r.usage, _r.amount,
+               bindparam("paid", type_=Boolean), _r.id)
+        .where(_r.id == bindparam("recurring_id"), _r.user_id == bindparam("user_id")),
+    )
+    .returning(_t.id, _t.date)
+)
+
+# Nutzer mit Fixkosten-Serien, blockweise nach id (core/scheduler.py)
+RECURRING_USERS = (
+    select(distinct(_r.user_id))
+    .where(_r.user_id > bindparam("after"))
+    .order_by(_r.user_id)
+    .limit(bindparam("limit"))
+)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Vorschläge
+# ──────────────────────────────────────────────────────────────────────────────
+_s = suggestions.c
+
+# Eigene Vorschläge plus alle Beschreibungen/Verwendungszwecke aus den Transaktionen
+SUGGESTIONS_LIST = union(
+    select(_s.suggestion_type, _s.text)
+    .where(_s.user_id == bindparam("user_id")),
+    select(literal_column("'description'").label("suggestion_type"), _t.description.label("text"))
+    .where(_t.user_id == bindparam("user_id"), _t.description.isnot(None), _t.description != ""),
+    select(literal_column("'usage'").label("suggestion_type"), _t.usage.label("text"))
+    .where(_t.user_id == bindparam("user_id"), _t.usage.isnot(None), _t.usage != ""),
+).order_by("suggestion_type", "text")
+
+INSERT_SUGGESTION = _insert_ignore(
+    suggestions,
+    ["user_id", "suggestion_type", "text"],
+    dict(user_id=bindparam("user_id"),
+         suggestion_type=bindparam("suggestion_type"),
+         text=bindparam("text")),
+)
+
+DELETE_SUGGESTION = delete(suggestions).where(
+    _s.user_id == bindparam("user_id"),
+    _s.suggestion_type == bindparam("suggestion_type"),
+    _s.text == bindparam("text"),
+)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Monatssummen (core/totals.py)
+# ──────────────────────────────────────────────────────────────────────────────
+_m = monthly_totals.c
+
+# Kennzahlen eines Zeitraums aus Transaktionen; dieselben Formeln wie im Dashboard
+_income = func.coalesce(func.sum(case((_t.amount > 0, _t.amount), else_=0)), 0)
+_expenses = func.coalesce(func.sum(case((_t.amount < 0, -_t.amount), else_=0)), 0)
+_open_recurring = func.coalesce(func.sum(case(
+    (and_(_t.amount < 0, _t.paid == false(), _t.recurring_id.isnot(None)), -_t.amount), else_=0)), 0)
+_TOTAL_COLUMNS = ["user_id", "year", "month", "income", "expenses", "open_recurring", "tx_count"]
+
+
+def _upsert_month(dialect_insert):
+    # Ein Monat eines Nutzers neu aggregiert (Range-Scan auf (user_id, date, id));
+    # ohne GROUP BY liefert das SELECT auch für leere Monate genau eine Zeile
+    month_select = select(
+        bindparam("user_id", type_=Integer), bindparam("year", type_=Integer),
+        bindparam("month", type_=Integer),
+        _income, _expenses, _open_recurring, func.count(),
+    ).where(_t.user_id == bindparam("user_id"),
+            _t.date >= _date("start"),
+            _t.date < _date("end"))
+    stmt = dialect_insert(monthly_totals).from_select(_TOTAL_COLUMNS, month_select)
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "year", "month"],
+        set_={c: stmt.excluded[c] for c in _TOTAL_COLUMNS[3:]},
+    )
+
+
+REFRESH_MONTH_TOTALS = {
+    "postgresql": _upsert_month(pg_insert),
+    "sqlite": _upsert_month(sqlite_insert),
+}
+
+DELETE_EMPTY_MONTH_TOTALS = delete(monthly_totals).where(
+    _m.user_id == bindparam("user_id"),
+    _m.year == bindparam("year"),
+    _m.month == bindparam("month"),
+    _m.tx_count == 0,
+)
+
+DELETE_ALL_MONTH_TOTALS = delete(monthly_totals)
+DELETE_USER_MONTH_TOTALS = delete(monthly_totals).where(_m.user_id == bindparam("user_id"))
+
+_tx_year, _tx_month = extract("year", _t.date), extract("month", _t.date)
+_rebuild_select = (
+    select(_t.user_id, _tx_year, _tx_month, _income, _expenses, _open_recurring, func.count())
+    .group_by(_t.user_id, _tx_year, _tx_month)
+)
+REBUILD_MONTH_TOTALS = insert(monthly_totals).from_select(_TOTAL_COLUMNS, _rebuild_select)
+REBUILD_USER_MONTH_TOTALS = insert(monthly_totals).from_select(
+    _TOTAL_COLUMNS, _rebuild_select.where(_t.user_id == bindparam("user_id")))
+
+# Zusammenhängende Monate [start, end) eines Nutzers in zwei Statements neu
+# aufbauen (core/totals.refresh_range) – statt zwei Statements je Monat
+DELETE_MONTH_TOTALS_RANGE = delete(monthly_totals).where(
+    _m.user_id == bindparam("user_id"),
+    tuple_(_m.year, _m.month) >= tuple_(bindparam("start_year"), bindparam("start_month")),
+    tuple_(_m.year, _m.month) < tuple_(bindparam("end_year"), bindparam("end_month")))
+REBUILD_MONTH_TOTALS_RANGE = insert(monthly_totals).from_select(
+    _TOTAL_COLUMNS, _rebuild_select.where(_t.user_id == bindparam("user_id"),
+                                          _t.date >= _date("start"),
+                                          _t.date < _date("end")))
+
+# Kopfzeile des Dashboards mit Suchbegriff: Summen über alle Treffer des
+# Zeitraums, nicht nur über die angezeigte Seite
+_search_totals = select(_income, _expenses, _open_recurring, func.count()).where(
+    _t.user_id == bindparam("user_id"),
+    _t.date >= _date("start"),
+    _t.date < _date("end"),
+)
+SEARCH_TOTALS = {
+    "like": _search_totals.where(_search_like),
+    "trgm": _search_totals.where(_search_like),
+    "fts": _search_totals.where(_search_fts),
+}
+
+# Summen über [start, end) als (Jahr, Monat)-Bereich → Range-Scan auf dem Primärschlüssel
+PERIOD_TOTALS = select(
+    func.coalesce(func.sum(_m.income), 0),
+    func.coalesce(func.sum(_m.expenses), 0),
+    func.coalesce(func.sum(_m.open_recurring), 0),
+    func.coalesce(func.sum(_m.tx_count), 0),
+).where(_m.user_id == bindparam("user_id"),
+        tuple_(_m.year, _m.month) >= tuple_(bindparam("start_year"), bindparam("start_month")),
+        tuple_(_m.year, _m.month) < tuple_(bindparam("end_year"), bindparam("end_month")))
+
+TOTALS_YEARS = (
+    select(distinct(_m.year))
+    .where(_m.user_id == bindparam("user_id"))
+    .order_by(_m.year.desc())
+)
+
+TOTALS_MONTHS = (
+    select(_m.month)
+    .where(_m.user_id == bindparam("user_id"), _m.year == bindparam("year"))
+    .order_by(_m.month)
+)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Datenversion je Nutzer (core/dataversion.py)
+# ──────────────────────────────────────────────────────────────────────────────
+_u = users.c
+
+USER_DATA_VERSION = select(_u.data_version).where(_u.id == bindparam("user_id"))
+
+BUMP_DATA_VERSION = (
+    update(users)
+    .values(data_version=_u.data_version + 1)
+    .where(_u.id == bindparam("owner_id"))
+    .returning(_u.data_version)
+)
+
+# Nach Wartungsarbeiten über alle Nutzer (flask rebuild-totals)
+BUMP_ALL_DATA_VERSIONS = update(users).values(data_version=_u.data_version + 1)
@@ -0,0 +1,207 @@
+# core/recurrence.py – Wiederholungsregeln der Fixkosten und ihre Termine
+"""
+Eine Fixkosten-Serie wiederholt sich wöchentlich, monatlich oder jährlich
+alle `interval` Einheiten (vierteljährlich = monatlich mit Intervall 3) und
+endet nach `count` Terminen, am Datum `until` – oder gar nicht. In
+recurring_entries stehen dafür frequency, freq_interval, duration (Anzahl,
+0 = ohne) und until. Als Eingabe versteht parse_rrule() dieselben Regeln
+in RRULE-Schreibweise (RFC 5545: FREQ, INTERVAL, COUNT, UNTIL).
+
+Monatliche und jährliche Serien liegen wie bisher auf dem Monatsanfang,
+wöchentliche auf dem Wochentag des Startdatums. Der n-te Termin ist damit
+eine reine Rechnung (Startmonat + n·Schritt bzw. Start + n·7·Intervall
+Tage); Rule.occurrences() springt direkt zum ersten Termin im Zeitraum
+und kostet O(Termine im Zeitraum). Das Ergebnis liegt je (Regel, Zeitraum)
+in einem LRU-Cache (RECURRENCE_CACHE_SIZE Einträge).
+
+Offene Serien werden nur bis horizon() gebucht bzw. projiziert
+(FIXKOSTEN_HORIZON_MONTHS ab dem laufenden Monat); spätere Termine legt der
+Scheduler an, sobald sie fällig werden.
+"""
+import os
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import NamedTuple
+
+from dateutil.relativedelta import relativedelta
+
+from utils_web import as_date
+
+RECURRENCE_CACHE_SIZE = int(os.getenv("RECURRENCE_CACHE_SIZE", "4096"))
+FIXKOSTEN_HORIZON_MONTHS = int(os.getenv("FIXKOSTEN_HORIZON_MONTHS", "24"))
+
+# Gespeicherte Frequenzen; "quarterly" ist nur eine Eingabe (monatlich × 3)
+FREQUENCIES = ("weekly", "monthly", "yearly")
+_ALIASES = {"quarterly": ("monthly", 3)}
+_RRULE_FREQ = {"WEEKLY": "weekly", "MONTHLY": "monthly", "YEARLY": "yearly"}
+_STOP_NEVER = float("inf")
+
+
+def _month_index(d: date) -> int:
+    return d.year * 12 + d.month - 1
+
+
+def horizon(today: date | None = None) -> date:
+    """Bis hierhin (exklusiv) werden Termine offener Serien gebucht bzw. projiziert."""
+    return (today or date.today()).replace(day=1) + relativedelta(months=FIXKOSTEN_HORIZON_MONTHS)
+
+
+class Rule(NamedTuple):
+    """Wiederholungsregel einer Serie; unveränderlich und hashbar (Cache-Schlüssel)."""
+    start: date
+    frequency: str = "monthly"
+    interval: int = 1
+    count: int = 0               # 0 = ohne Anzahl
+    until: date | None = None    # letzter möglicher Termin (inklusive)
+
+    @classmethod
+    def create(cls, start: date, frequency: str = "monthly", interval: int = 1,
+               count: int = 0, until: date | None = None) -> "Rule":
+        """Prüft und normalisiert eine Eingabe; ValueError bei ungültiger Regel."""
+        frequency, factor = _ALIASES.get(frequency, (frequency, 1))
+        if frequency not in FREQUENCIES:
+            raise ValueError(f"Unbekannte Frequenz: {frequency}")
+        if interval < 1 or count < 0:
+            raise ValueError("Intervall muss mindestens 1, Anzahl darf nicht negativ sein.")
+        if frequency != "weekly":
+            start = start.replace(day=1)
+        if until is not None and until < start:
+            raise ValueError("Enddatum liegt vor dem Start.")
+        return cls(start, frequency, interval * factor, count, until)
+
+    @classmethod
+    def of(cls, row) -> "Rule":
+        """Regel aus einer Zeile von recurring_entries (Q.RECURRING_LIST u. a.)."""
+        return cls(as_date(row.start_date), row.frequency or "monthly", row.freq_interval or 1,
+                   row.duration or 0, as_date(row.until))
+
+    @property
+    def open_ended(self) -> bool:
+        return not self.count and self.until is None
+
+    @property
+    def step(self) -> tuple:
+        """Abstand zweier Termine als (Monate, Tage), z. B. für SQL-Intervalle."""
+        return (0, self._step()) if self.frequency == "weekly" else (self._step(), 0)
+
+    # Termin n: Monatsindex bzw. Tage ab Start
+    def _step(self) -> int:
+        if self.frequency == "weekly":
+            return 7 * self.interval
+        return self.interval * (12 if self.frequency == "yearly" else 1)
+
+    def _nth(self, n: int) -> date:
+        if self.frequency == "weekly":
+            return self.start + timedelta(days=n * self._step())
+        index = _month_index(self.start) + n * self._step()
+        return date(index // 12, index % 12 + 1, 1)
+
+    def _floor(self, d: date) -> int:
+        """Größtes n mit Termin n <= d (negativ vor dem Start)."""
+        if self.frequency == "weekly":
+            return (d - self.start).days // self._step()
+        return (_month_index(d) - _month_index(self.start)) // self._step()
+
+    def _ceil(self, d: date) -> int:
+        """Kleinstes n >= 0 mit Termin n >= d."""
+        if self.frequency == "weekly":
+            offset = (d - self.start).days
+        else:
+            offset = _month_index(d) + (d.day > 1) - _month_index(self.start)
+        return max(0, -(-offset // self._step()))
+
+    def _stop(self):
+        """Anzahl der Termine (exklusive Obergrenze für n)."""
+        stop = self.count or _STOP_NEVER
+        if self.until is not None:
+            stop = min(stop, max(0, self._floor(self.until) + 1))
+        return stop
+
+    def occurrences(self, start: date = date.min, end: date = date.max) -> tuple:
+        """Termine in [start, end), aufsteigend – aus dem Cache."""
+        return _expand(self, start, end)
+
+    def occurrence_at(self, d: date) -> date | None:
+        """Termin, in dessen Zeitraum [Termin, nächster Termin) `d` liegt."""
+        n = self._floor(as_date(d))
+        return self._nth(n) if 0 <= n < self._stop() else None
+
+    def is_occurrence(self, d: date) -> bool:
+        return self.occurrence_at(d) == d
+
+    def period_end(self, occurrence: date) -> date:
+        """Beginn des Folgetermins (auch über das Serienende hinaus)."""
+        try:
+            return self._nth(self._floor(occurrence) + 1)
+        except (OverflowError, ValueError):
+            return date.max
+
+    def rrule(self) -> str:
+        parts = [f"FREQ={self.frequency.upper()}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.count:
+            parts.append(f"COUNT={self.count}")
+        if self.until is not None:
+            parts.append(f"UNTIL={self.until:%Y%m%d}")
+        return ";".join(parts)
+
+    def describe(self) -> str:
+        """Kurzbeschreibung für die Fixkosten-Seite, z. B. 'vierteljährlich, 4 Termine'."""
+        n = self.interval
+        if self.frequency == "weekly":
+            text = "wöchentlich" if n == 1 else f"alle {n} Wochen"
+        elif self.frequency == "yearly":
+            text = "jährlich" if n == 1 else f"alle {n} Jahre"
+        else:
+            text = {1: "monatlich", 3: "vierteljährlich", 6: "halbjährlich", 12: "jährlich"}.get(n, f"alle {n} Monate")
+        if self.count:
+            text += f", {self.count} Termine"
+        if self.until is not None:
+            text += f", bis {self.until:%d.%m.%Y}"
+        return text if not self.open_ended else text + ", unbegrenzt"
+
+
+@lru_cache(maxsize=RECURRENCE_CACHE_SIZE)
+def _expand(rule: Rule, start: date, end: date) -> tuple:
+    stop = rule._stop()
+    lo = rule._ceil(start)
+    hi = min(rule._ceil(end) if end < date.max else stop, stop)
+    if hi == _STOP_NEVER:
+        raise ValueError("Offene Serie: Zeitraum braucht ein Ende.")
+    return tuple(rule._nth(n) for n in range(lo, hi))
+
+
+def cache_info() -> dict:
+    info = _expand.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max": info.maxsize}
+
+
+def parse_rrule(text: str, start: date) -> Rule:
+    """
+    Regel aus RRULE-Text ('FREQ=MONTHLY;INTERVAL=3;COUNT=4', optional mit
+    'RRULE:' davor). Unterstützt FREQ (WEEKLY, MONTHLY, YEARLY), INTERVAL,
+    COUNT und UNTIL; alles andere ist ein ValueError.
+    """
+    text = text.strip()
+    if text.upper().startswith("RRULE:"):
+        text = text[6:]
+    parts = {}
+    for part in filter(None, text.split(";")):
+        key, sep, value = part.partition("=")
+        if not sep:
+            raise ValueError(f"Ungültiger RRULE-Teil: {part}")
+        parts[key.strip().upper()] = value.strip()
+    unknown = set(parts) - {"FREQ", "INTERVAL", "COUNT", "UNTIL"}
+    if unknown:
+        raise ValueError(f"RRULE-Teil nicht unterstützt: {', '.join(sorted(unknown))}")
+    if parts.get("FREQ", "").upper() not in _RRULE_FREQ:
+        raise ValueError("RRULE braucht FREQ=WEEKLY, MONTHLY oder YEARLY.")
+    until = parts.get("UNTIL")
+    if until is not None:
+        # JJJJMMTT, optional mit Uhrzeit (JJJJMMTTTHHMMSSZ)
+        if len(until) < 8 or not until[:8].isdigit():
+            raise ValueError(f"Ungültiges UNTIL: {until}")
+        until = date(int(until[:4]), int(until[4:6]), int(until[6:8]))
+    return Rule.create(start, _RRULE_FREQ[parts["FREQ"].upper()],
+                       int(parts.get("INTERVAL", 1)), int(parts.get("COUNT", 0)), until)
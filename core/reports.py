@@ -0,0 +1,172 @@
+# core/reports.py – Ausgabenanalyse: Verwendungszweck × Monat, Jahresvergleich, gleitende Mittel
+"""
+/reports zeigt die Auswertung als Seite, /reports/api liefert dieselben
+Zahlen als JSON – für die letzten `years` Kalenderjahre bis einschließlich
+des laufenden Monats:
+
+* Monatsreihe: Einnahmen, Ausgaben, Saldo und gleitende 3-/12-Monats-Mittel
+  der Ausgaben (lückenlos, Monate ohne Buchungen zählen als 0)
+* Jahre: Summen je Jahr mit Veränderung der Ausgaben zum Vorjahr in Prozent,
+  dazu die Ausgaben je Jahr × Kalendermonat
+* Pivot: Ausgaben je Verwendungszweck × Monat, nach Gesamtsumme sortiert
+
+Gelesen wird der Zeitraum als core.ledger.Ledger (ein Range-Scan,
+spaltenweise in NumPy); dessen pivot() liefert die Cent-Matrix
+Verwendungszweck × Monat, aus der alle Summen und Mittel folgen. Das Ergebnis
+liegt im ledger_cache unter (user_id, 'report', years, monat) und gilt, bis
+eine Buchung des Nutzers geändert wird.
+"""
+import json
+import logging
+import os
+from datetime import date
+
+import numpy as np
+from flask import Blueprint, render_template, request, redirect, url_for, session, jsonify, g
+
+from core.db import get_db, statement_timeout
+from core import dataversion
+from core.dataversion import conditional_get
+from core.ledger import Ledger, month_label
+from core.ledgercache import ledger_cache
+from core.version import __version__
+
+# Standard- und Höchstzahl an Jahren im Bericht
+REPORT_YEARS = int(os.getenv("REPORT_YEARS", "5"))
+REPORT_MAX_YEARS = int(os.getenv("REPORT_MAX_YEARS", "20"))
+REPORTS_TIMEOUT_MS = int(os.getenv("DB_TIMEOUT_REPORTS_MS", "5000"))
+
+bp = Blueprint('reports', __name__, url_prefix='/reports')
+
+
+def _month_start(month_index: int) -> date:
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def _euro(cents) -> list:
+    return (np.asarray(cents, dtype=np.int64) / 100).round(2).tolist()
+
+
+def rolling_mean(series: np.ndarray, window: int) -> np.ndarray:
+    """Gleitender Mittelwert über `window` Werte; am Anfang über die vorhandenen."""
+    csum = np.concatenate(([0], np.cumsum(series, dtype=np.int64)))
+    idx = np.arange(1, len(series) + 1)
+    lo = np.maximum(idx - window, 0)
+    return (csum[idx] - csum[lo]) / (idx - lo)
+
+
+def build_report(ledger: Ledger, first_month: int, last_month: int) -> dict:
+    """
+    Bericht für die Monate first_month..last_month (jahr*12+monat-1,
+    inklusive) aus dem Ledger dieses Zeitraums; Beträge in Euro.
+    """
+    n = last_month - first_month + 1
+    labels = ledger.usage_labels.tolist()
+    # Verwendungszweck × Monat in Cent
+    cols = ledger.months() - first_month
+    inc_pivot = ledger.pivot(ledger.usage_codes, cols, len(labels), n,
+                             np.where(ledger.income_mask, ledger.cents, 0))
+    exp_pivot = ledger.pivot(ledger.usage_codes, cols, len(labels), n,
+                             np.where(ledger.expense_mask, -ledger.cents, 0))
+
+    # Monatsreihe (lückenlos)
+    month_income, month_expenses = inc_pivot.sum(axis=0), exp_pivot.sum(axis=0)
+
+    # Jahre: auf volle Kalenderjahre auffüllen und je Jahr × Kalendermonat falten
+    first_year = first_month // 12
+    n_years = last_month // 12 - first_year + 1
+    pad = (first_month % 12, 11 - last_month % 12)
+    year_month = np.pad(month_expenses, pad).reshape(n_years, 12)
+    year_income = np.pad(month_income, pad).reshape(n_years, 12).sum(axis=1)
+    year_expenses = year_month.sum(axis=1)
+    change = [None] + [
+        round((cur - prev) / prev * 100, 1) if prev else None
+        for prev, cur in zip(year_expenses[:-1].tolist(), year_expenses[1:].tolist())
+    ]
+
+    # Nur Zwecke mit Ausgaben, größte zuerst
+    totals = exp_pivot.sum(axis=1)
+    order = [i for i in np.argsort(-totals, kind="stable").tolist() if totals[i] > 0]
+
+    return {
+        "months": [month_label(m) for m in range(first_month, last_month + 1)],
+        "monthly": {
+            "income": _euro(month_income),
+            "expenses": _euro(month_expenses),
+            "saldo": _euro(month_income - month_expenses),
+            "avg3": _euro(np.rint(rolling_mean(month_expenses, 3))),
+            "avg12": _euro(np.rint(rolling_mean(month_expenses, 12))),
+        },
+        "years": [
+            {
+                "year": first_year + i,
+                "income": int(year_income[i]) / 100,
+                "expenses": int(year_expenses[i]) / 100,
+                "saldo": int(year_income[i] - year_expenses[i]) / 100,
+                "change": change[i],
+                "months": _euro(year_month[i]),
+            }
+            for i in range(n_years)
+        ],
+        "usage": [
+            {"usage": labels[i], "total": int(totals[i]) / 100, "months": _euro(exp_pivot[i])}
+            for i in order
+        ],
+    }
+
+
+def get_report(user_id: int, years: int) -> dict:
+    """Bericht der letzten `years` Jahre – aus dem Cache oder neu gerechnet."""
+    today = date.today()
+    last_month = today.year * 12 + today.month - 1
+    first_month = (today.year - years + 1) * 12
+    key = (user_id, 'report', years, last_month)
+
+    conn = get_db(readonly=True)
+    version = g.get('data_version')
+    if version is None:
+        version = dataversion.current(conn, user_id)
+    report = ledger_cache.get(key, version)
+    if report is not None:
+        return report
+
+    ledger = Ledger.load(conn, user_id, _month_start(first_month), _month_start(last_month + 1))
+    report = build_report(ledger, first_month, last_month)
+    logging.info(f"Bericht für Nutzer {user_id} ({years} Jahre, {len(ledger)} Buchungen) berechnet.")
+    if version is not None and not g.get('db_degraded'):
+        ledger_cache.put(key, version, report, size=len(json.dumps(report)))
+    return report
+
+
+def _years_arg() -> int:
+    years = request.args.get('years', type=int) or REPORT_YEARS
+    return max(1, min(years, REPORT_MAX_YEARS))
+
+
+@bp.route('/')
+@statement_timeout(REPORTS_TIMEOUT_MS)
+@conditional_get
+def index():
+    if not session.get('user_id'):
+        return redirect(url_for('login'))
+
+    years = _years_arg()
+    report = get_report(session['user_id'], years)
+    return render_template(
+        'reports.html',
+        report=report,
+        years=years,
+        recent=report["months"][-12:],
+        username=session.get('username'),
+        version=__version__
+    )
+
+
+@bp.route('/api')
+@statement_timeout(REPORTS_TIMEOUT_MS)
+@conditional_get
+def api():
+    if not session.get('user_id'):
+        return jsonify({'success': False, 'error': 'Nicht authentifiziert.'}), 401
+    years = _years_arg()
+    return jsonify({'success': True, 'years_back': years, **get_report(session['user_id'], years)})
@@ -0,0 +1,200 @@
+# core/scheduler.py – Hintergrund-Job: fällige Fixkosten-Buchungen für alle Nutzer anlegen
+"""
+Der Scheduler sorgt dafür, dass die Fixkosten-Buchungen des laufenden und
+der nächsten FIX_SCHEDULER_MONTHS_AHEAD Monate existieren – ohne dass ein
+Request dafür bezahlt. Er läuft
+
+* als eigener Prozess (Procfile: worker: python -m core.scheduler) oder
+* als Thread in der Desktop-App (desktop_app.py, scheduler.start()).
+
+Ein Lauf geht die Nutzer mit Fixkosten-Serien blockweise (FIX_SCHEDULER_CHUNK
+Nutzer) durch und holt die fehlenden Buchungen des Blocks nach
+(fixkosten.catch_up_users): einfache Monatsserien in einem einzigen
+INSERT … SELECT über alle Serien und Monate, Serien mit anderen Regeln in
+drei Statements (Regeln, vorhandene Buchungen, executemany der fehlenden
+Termine). Danach Monatssummen und Datenversion je betroffenem Nutzer,
+commit je Block. Schlägt ein Block fehl, wird er zurückgerollt, in
+failed_chunks gezählt und der Lauf mit dem nächsten fortgesetzt. Zwischen
+den Blöcken pausiert er FIX_SCHEDULER_PAUSE_MS, damit interaktive Requests
+nicht warten.
+
+Gelaufen wird alle FIX_SCHEDULER_INTERVAL Sekunden und zusätzlich direkt
+nach dem Monatswechsel. Kennzahlen des letzten Laufs liefert status() (auch
+unter /health/db).
+"""
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime
+
+from dateutil.relativedelta import relativedelta
+
+from core.db import init_db, get_db_connection
+from core import queries as Q
+from core import dataversion
+from core import fixkosten
+from core.ledgercache import ledger_cache
+
+FIX_SCHEDULER_INTERVAL = float(os.getenv("FIX_SCHEDULER_INTERVAL", "3600"))   # Sekunden
+FIX_SCHEDULER_CHUNK = int(os.getenv("FIX_SCHEDULER_CHUNK", "200"))             # Nutzer je Block
+FIX_SCHEDULER_PAUSE_MS = float(os.getenv("FIX_SCHEDULER_PAUSE_MS", "200"))     # Pause zwischen Blöcken
+FIX_SCHEDULER_MONTHS_AHEAD = int(os.getenv("FIX_SCHEDULER_MONTHS_AHEAD", "1"))
+FIX_SCHEDULER_MONTHS_BACK = int(os.getenv("FIX_SCHEDULER_MONTHS_BACK", "0"))
+
+
+def due_window(today: date | None = None) -> tuple:
+    """Monate [start, end), deren Fixkosten-Buchungen existieren sollen."""
+    month = (today or date.today()).replace(day=1)
+    return (month - relativedelta(months=FIX_SCHEDULER_MONTHS_BACK),
+            month + relativedelta(months=FIX_SCHEDULER_MONTHS_AHEAD + 1))
+
+
+def _next_month_start(now: datetime) -> datetime:
+    return datetime(now.year, now.month, 1) + relativedelta(months=1)
+
+
+class FixkostenScheduler:
+    """
+    Legt periodisch fällige Fixkosten-Buchungen für alle Nutzer an. run_once()
+    ist ein einzelner Lauf (auch für CLI und Tests), start() startet den
+    Hintergrund-Thread, stop() beendet ihn nach dem laufenden Block.
+    """
+
+    def __init__(self, interval: float = FIX_SCHEDULER_INTERVAL, chunk: int = FIX_SCHEDULER_CHUNK,
+                 pause_ms: float = FIX_SCHEDULER_PAUSE_MS):
+        self.interval = interval
+        self.chunk = max(1, chunk)
+        self.pause_ms = pause_ms
+        self.runs = 0
+        self.failures = 0
+        self.inserted_total = 0
+        self.last_run = None
+        self.last_error = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def run_once(self, today: date | None = None) -> dict:
+        """Ein Lauf über alle Nutzer; liefert die Kennzahlen des Laufs."""
+        start, end = due_window(today)
+        started = time.perf_counter()
+        metrics = {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "window": [start.isoformat(), end.isoformat()],
+            "users": 0,
+            "users_changed": 0,
+            "chunks": 0,
+            "failed_chunks": 0,
+            "inserted": 0,
+            "duration_ms": 0.0,
+        }
+        after = 0
+        conn = get_db_connection()
+        try:
+            while not self._stop.is_set():
+                user_ids = [r[0] for r in Q.execute(conn, Q.RECURRING_USERS, after=after, limit=self.chunk)]
+                if not user_ids:
+                    conn.rollback()
+                    break
+                try:
+                    created = fixkosten.catch_up_users(conn, user_ids, start, end)
+                    versions = {uid: dataversion.bump(conn, uid) for uid in created}
+                    conn.commit()
+                except Exception as e:
+                    # Ein fehlerhafter Block hält die übrigen nicht auf; der
+                    # nächste Lauf versucht ihn erneut
+                    conn.rollback()
+                    metrics["failed_chunks"] += 1
+                    with self._lock:
+                        self.last_error = type(e).__name__
+                    logging.warning(f"Fixkosten-Scheduler: Block ab Nutzer {user_ids[0]} fehlgeschlagen: {e}",
+                                    exc_info=True)
+                else:
+                    for uid, dates in created.items():
+                        ledger_cache.invalidate(uid, dates, versions[uid])
+                    metrics["users_changed"] += len(created)
+                    metrics["inserted"] += sum(map(len, created.values()))
+
+                metrics["users"] += len(user_ids)
+                metrics["chunks"] += 1
+                after = user_ids[-1]
+                if len(user_ids) < self.chunk:
+                    break
+                # Drosseln: anderen Verbindungen Luft lassen
+                self._stop.wait(self.pause_ms / 1000)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        metrics["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        with self._lock:
+            self.runs += 1
+            self.inserted_total += metrics["inserted"]
+            self.last_run = metrics
+        logging.info(
+            f"Fixkosten-Scheduler: {metrics['users']} Nutzer in {metrics['chunks']} Blöcken, "
+            f"{metrics['inserted']} Buchungen angelegt, {metrics['failed_chunks']} Blöcke fehlgeschlagen "
+            f"({metrics['duration_ms']} ms, "
+            f"Monate {metrics['window'][0]} bis {metrics['window'][1]})."
+        )
+        return metrics
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                    # Nur der Klassenname (öffentlich unter /health/db), der Text steht im Log
+                    self.last_error = type(e).__name__
+                logging.warning(f"Fixkosten-Scheduler: Lauf fehlgeschlagen: {e}", exc_info=True)
+            # Nächster Lauf nach dem Intervall – oder direkt nach dem Monatswechsel
+            now = datetime.now()
+            wait = min(self.interval, (_next_month_start(now) - now).total_seconds() + 1)
+            self._stop.wait(max(wait, 1))
+
+    def start(self) -> None:
+        """Startet den Hintergrund-Thread (idempotent)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="fixkosten-scheduler", daemon=True)
+        self._thread.start()
+        logging.info(f"Fixkosten-Scheduler gestartet (Intervall {self.interval:g} s, Blöcke zu {self.chunk} Nutzern).")
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "interval_s": self.interval,
+                "chunk": self.chunk,
+                "runs": self.runs,
+                "failures": self.failures,
+                "inserted_total": self.inserted_total,
+                "last_run": self.last_run,
+                "last_error": self.last_error,
+            }
+
+
+scheduler = FixkostenScheduler()
+
+
+if __name__ == "__main__":
+    # Eigener Worker-Prozess (Procfile): Migrationen wie beim Web-Prozess, dann Endlosschleife
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    init_db()
+    scheduler.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        scheduler.stop(timeout=10)
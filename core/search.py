@@ -0,0 +1,84 @@
+# core/search.py – Suche über Beschreibung/Verwendungszweck der Transaktionen
+"""
+Das Suchfeld im Dashboard läuft über einen Index statt über einen
+sequentiellen LIKE-Scan:
+
+* SQLite: FTS5-Tabelle transactions_fts (Migration 7, per Trigger synchron).
+  Jedes Wort des Suchbegriffs wird als Präfix gesucht ("miet" findet
+  "Miete", "Mietkaution"), alle Wörter müssen vorkommen.
+* Postgres: LOWER(…) LIKE '%q%' über die pg_trgm-GIN-Indizes; findet auch
+  Teilwörter.
+
+Fehlt FTS5 bzw. pg_trgm, wird auf den LIKE-Filter ohne Index zurückgegriffen.
+Welche Variante verfügbar ist, wird einmal je Datenbankverbindung ermittelt.
+Begriffe unter MIN_INDEX_LENGTH Zeichen (kein Trigramm, FTS-Präfix träfe fast
+alles) und – bei FTS5 – Begriffe mit Sonderzeichen oder _ (der Tokenizer verwirft
+sie, "C&A" würde zu "c"* "a"*) laufen ebenfalls über LIKE.
+"""
+import logging
+import re
+
+from sqlalchemy import text
+
+from core import queries as Q
+from utils_web import from_cents
+
+# Obergrenze für die Treffer von ranked()
+RANKED_LIMIT = 20
+# Kürzere Suchbegriffe ohne Index (LIKE)
+MIN_INDEX_LENGTH = 3
+
+
+def _mode(conn) -> str:
+    """'fts', 'trgm' oder 'like' – gecacht im info-Dict der DBAPI-Verbindung."""
+    info = conn.info
+    if "search_mode" not in info:
+        if conn.dialect.name == "sqlite":
+            found = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions_fts'"
+            )).first()
+            info["search_mode"] = "fts" if found else "like"
+        else:
+            found = conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first()
+            info["search_mode"] = "trgm" if found else "like"
+        if info["search_mode"] == "like":
+            logging.warning("Suche: kein Suchindex vorhanden, verwende LIKE.")
+    return info["search_mode"]
+
+
+def fts_query(q: str) -> str:
+    """'Miete Wohn' → '"miete"* "wohn"*' (Präfixsuche, alle Wörter)."""
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", q.lower()))
+
+
+def like_pattern(q: str) -> str:
+    """'100%' → '%100\\%%' – Platzhalter im Suchbegriff gelten wörtlich (ESCAPE '\\')."""
+    escaped = q.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def prepare(conn, q: str) -> tuple:
+    """
+    Liefert (variante, parameter) für die Statements in core.queries, die
+    nach Suchvariante aufgeteilt sind (DASHBOARD_TRANSACTIONS_SEARCH,
+    SEARCH_TOTALS, RANKED_SEARCH).
+    """
+    mode = _mode(conn)
+    params = {"q": like_pattern(q), "term": q.lower()}
+    if len(q.strip()) < MIN_INDEX_LENGTH:
+        return "like", params
+    if mode == "fts":
+        if re.search(r"[^\w\s]|_", q):
+            return "like", params
+        params["match"] = fts_query(q)
+    return mode, params
+
+
+def ranked(conn, user_id: int, q: str, limit: int = RANKED_LIMIT) -> list:
+    """Die besten Treffer für `q` zuerst, bei Gleichstand die neuesten."""
+    mode, params = prepare(conn, q)
+    rows = Q.execute(conn, Q.RANKED_SEARCH[mode], {**params, "user_id": user_id, "limit": limit})
+    return [
+        {"id": r.id, "date": r.date, "description": r.description, "usage": r.usage, "amount": float(from_cents(r.amount))}
+        for r in rows
+    ]
@@ -0,0 +1,104 @@
+# core/totals.py – Monatssummen (Saldo, Ausgaben, offene Fixkosten) je Nutzer
+"""
+Die Tabelle monthly_totals hält je Nutzer und Monat Einnahmen, Ausgaben,
+offene Fixkosten und die Anzahl der Buchungen. Dashboard-Kopf und
+Jahr/Monat-Navigation lesen daraus eine Handvoll Zeilen statt alle
+Transaktionen des Zeitraums.
+
+Alle Schreibpfade (add_entry, delete_entries, toggle_paid_api, Fixkosten,
+Sync) rufen nach ihrer Änderung refresh_months() für die betroffenen Monate
+auf (bzw. refresh_range() für einen Block von Monaten) – in derselben
+Transaktion. Ein Monat wird dabei aus seinen eigenen Buchungen neu aggregiert
+(Range-Scan über den Index), das bleibt auch bei Statuswechseln oder
+Sync-Konflikten exakt. rebuild() baut die Tabelle
+komplett neu auf (CLI: flask rebuild-totals).
+"""
+import logging
+from datetime import date
+
+from core import queries as Q
+from core import search
+from utils_web import period_range, as_date
+
+
+def refresh_months(conn, user_id: int, dates) -> None:
+    """Aggregiert die Monate der angegebenen Datumswerte für `user_id` neu."""
+    months = {(d.year, d.month) for d in map(as_date, dates) if d is not None}
+    for year, month in sorted(months):
+        start, end = period_range(year, month)
+        params = {"user_id": user_id, "year": year, "month": month, "start": start, "end": end}
+        Q.execute(conn, Q.REFRESH_MONTH_TOTALS, params)
+        Q.execute(conn, Q.DELETE_EMPTY_MONTH_TOTALS, user_id=user_id, year=year, month=month)
+
+
+def refresh_range(conn, user_id: int, start: date, end: date) -> None:
+    """
+    Wie refresh_months() für alle Monate in [start, end) (Monatsanfänge),
+    aber in zwei Statements unabhängig von der Zahl der Monate – für
+    Schreibpfade, die viele aufeinanderfolgende Monate ändern (Fixkosten).
+    """
+    params = {"user_id": user_id, "start_year": start.year, "start_month": start.month,
+              "end_year": end.year, "end_month": end.month}
+    Q.execute(conn, Q.DELETE_MONTH_TOTALS_RANGE, params)
+    Q.execute(conn, Q.REBUILD_MONTH_TOTALS_RANGE, user_id=user_id, start=start, end=end)
+
+
+def rebuild(conn, user_id: int | None = None) -> None:
+    """Baut monthly_totals (für einen oder alle Nutzer) aus den Transaktionen neu auf."""
+    if user_id is None:
+        Q.execute(conn, Q.DELETE_ALL_MONTH_TOTALS)
+        Q.execute(conn, Q.REBUILD_MONTH_TOTALS)
+    else:
+        Q.execute(conn, Q.DELETE_USER_MONTH_TOTALS, user_id=user_id)
+        Q.execute(conn, Q.REBUILD_USER_MONTH_TOTALS, user_id=user_id)
+    logging.info(f"Monatssummen neu aufgebaut ({'alle Nutzer' if user_id is None else f'Nutzer {user_id}'}).")
+
+
+def period_totals(conn, user_id: int, start: date, end: date) -> dict:
+    """
+    Summen über die Monate in [start, end) – start/end sind Monatsanfänge
+    wie von utils_web.period_range(). Liefert saldo, income, expenses,
+    offen (offene Fixkosten) in Cent und count.
+    """
+    income, expenses, open_recurring, count = Q.execute(
+        conn, Q.PERIOD_TOTALS, user_id=user_id,
+        start_year=start.year, start_month=start.month,
+        end_year=end.year, end_month=end.month,
+    ).one()
+    return {
+        "income": income,
+        "expenses": expenses,
+        "saldo": income - expenses,
+        "offen": open_recurring,
+        "count": count,
+    }
+
+
+def opening_balance(conn, user_id: int, start: date) -> int:
+    """Kontostand (Cent) vor dem Monatsanfang `start`: Saldo aller früheren Monate (Checkpoint)."""
+    if start <= date.min:
+        return 0
+    return period_totals(conn, user_id, date.min, start)["saldo"]
+
+
+def search_totals(conn, user_id: int, start: date, end: date, q: str) -> dict:
+    """Wie period_totals(), aber über die Buchungen in [start, end), die auf `q` passen."""
+    mode, params = search.prepare(conn, q)
+    income, expenses, open_recurring, count = Q.execute(
+        conn, Q.SEARCH_TOTALS[mode], {**params, "user_id": user_id, "start": start, "end": end},
+    ).one()
+    return {
+        "income": income,
+        "expenses": expenses,
+        "saldo": income - expenses,
+        "offen": open_recurring,
+        "count": count,
+    }
+
+
+def available_years(conn, user_id: int) -> list:
+    return [int(r[0]) for r in Q.execute(conn, Q.TOTALS_YEARS, user_id=user_id)]
+
+
+def available_months(conn, user_id: int, year: int) -> list:
+    return [int(r[0]) for r in Q.execute(conn, Q.TOTALS_MONTHS, user_id=user_id, year=year)]
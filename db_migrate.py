@@ -1,17 +1,26 @@
-# db_migrate.py  – einmal beim Start aufrufen
-from db import get_db_connection
+# db_migrate.py  – Schema-Migrationen manuell ausführen (z. B. vor einem Deploy)
+#
+#   python db_migrate.py           → alle ausstehenden Migrationen anwenden
+#   python db_migrate.py --status  → aktuelle und neueste Version anzeigen
+import os
+import sys
+# Projekt-Root am Anfang des Suchpfads
+sys.path.insert(0, os.path.dirname(__file__))
 
-def ensure_admin_column():
-    with get_db_connection() as conn:
-        cur = conn.cursor()
-        cur.execute("PRAGMA table_info(users)")
-        cols = [row[1].lower() for row in cur.fetchall()]
-        if "is_admin" not in cols:
-            cur.execute(
-                "ALTER TABLE users ADD COLUMN is_admin BOOLEAN NOT NULL DEFAULT 0"
-            )
-            cur.execute(
-                "CREATE UNIQUE INDEX IF NOT EXISTS one_admin_only "
-                "ON users (is_admin) WHERE is_admin = 1"
-            )
-            conn.commit()
+from core.db import build_engine
+from core.migrations import MIGRATIONS, current_version, run_migrations
+
+
+def main(argv) -> int:
+    engine = build_engine()
+    latest = max(m[0] for m in MIGRATIONS)
+    if "--status" in argv:
+        print(f"Schema-Version: {current_version(engine)} (neueste: {latest})")
+        return 0
+    version = run_migrations(engine)
+    print(f"Schema-Version: {version} (neueste: {latest})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
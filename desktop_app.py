@@ -20,7 +20,8 @@ sys.path.insert(0, os.path.dirname(__file__))
 load_dotenv()
 
 # ─── 4) Module importieren (DB zuerst, damit init_db verfügbar ist) ───
-from core.db import init_db
+from core.db import init_db, sqlite_maintenance
+from core.scheduler import scheduler
 from sync import sync
 from core.auth import login_user
 from app import create_app
@@ -55,6 +56,20 @@ def start_periodic_sync(user_id: int, interval: int = 60) -> None:
     t.start()
 
 
+def start_periodic_maintenance(interval: int = 600) -> None:
+    """Hintergrund-Thread: PRAGMA optimize / inkrementelles VACUUM der lokalen DB."""
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                sqlite_maintenance()
+            except Exception as e:
+                logger.warning(f"SQLite-Wartung fehlgeschlagen: {e}", exc_info=True)
+
+    t = threading.Thread(target=loop, daemon=True)
+    t.start()
+
+
 def run_flask():
     """Flask-Server im Hintergrund starten."""
     try:
@@ -92,6 +107,10 @@ if __name__ == '__main__':
         logger.critical("🛑 Abbruch: Flask‑Server konnte nicht gestartet werden.")
         exit(1)
 
+    start_periodic_maintenance()
+    # Fällige Fixkosten-Buchungen im Hintergrund anlegen (auch nach dem Monatswechsel)
+    scheduler.start()
+
     # 2) Auto‑Login & erste Synchronisation
     username = os.getenv('DESKTOP_USERNAME')
     password = os.getenv('DESKTOP_PASSWORD')
@@ -4,11 +4,11 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, scoped_session
-from core.models import Base, LocalChange  # Modelle aus core/models.py
+from core.migrations import run_migrations  # Schema über versionierte Migrationen
 
 # Lokale SQLite-DB
 engine = create_engine('sqlite:///local.db', echo=True)
-Base.metadata.create_all(engine)
+run_migrations(engine)
 
 # Session-Factory
 db_session = scoped_session(sessionmaker(bind=engine))
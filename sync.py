@@ -4,11 +4,15 @@ import os
 import time
 import logging
 import requests
-import sqlite3
 import json
 from datetime import datetime
 from core.db import Session           # Für Remote‑DB‑Session (SQLAlchemy)
-from core.models import User, SomeModel, RecurringEntry, LocalChange  # Passe ggf. an
+from core.db import connect_sqlite, create_sqlite_engine, sqlite_maintenance, init_db
+from core.models import User, SomeModel, RecurringEntry, Transaction, LocalChange  # Passe ggf. an
+from core import totals
+from core import dataversion
+from core.ledgercache import ledger_cache
+from core.migrations import run_migrations
 
 # ─── Konfiguration ─────────────────────────────────────────────
 API_PUSH    = os.getenv("SYNC_PUSH_URL", "http://127.0.0.1:5000/api/sync/push")
@@ -20,84 +24,21 @@ LOG_LEVEL   = os.getenv("SYNC_LOG_LEVEL", "INFO").upper()
 logging.basicConfig(level=LOG_LEVEL,
                     format="%(asctime)s [sync] %(levelname)s: %(message)s")
 
+_local_engine = None
+
 
 def get_local_conn():
-    """Öffnet (oder legt an) die lokale SQLite‑DB."""
-    return sqlite3.connect(LOCAL_DB)
+    """Öffnet (oder legt an) die lokale SQLite‑DB – mit demselben Profil wie core.db (WAL usw.)."""
+    return connect_sqlite(LOCAL_DB)
 
 
 def ensure_local_schema():
-    """Legt die lokalen Tabellen in local.db an, falls sie nicht existieren."""
-    conn = get_local_conn()
-    cur  = conn.cursor()
-
-    # users
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-      id            INTEGER PRIMARY KEY,
-      username      TEXT    UNIQUE NOT NULL,
-      password_hash TEXT    NOT NULL,
-      is_admin      INTEGER NOT NULL DEFAULT 0,
-      created_at    TEXT    NOT NULL,
-      updated_at    TEXT    NOT NULL
-    );
-    """)
-
-    # some_model
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS some_model (
-      id            INTEGER PRIMARY KEY,
-      name          TEXT    NOT NULL,
-      last_modified TEXT    NOT NULL
-    );
-    """)
-
-    # recurring_entries
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS recurring_entries (
-      id          INTEGER PRIMARY KEY,
-      user_id     INTEGER NOT NULL,
-      description TEXT    NOT NULL,
-      usage       TEXT    NOT NULL,
-      amount      REAL    NOT NULL,
-      duration    INTEGER NOT NULL,
-      start_date  TEXT    NOT NULL,
-      created_at  TEXT    NOT NULL,
-      updated_at  TEXT    NOT NULL
-    );
-    """)
-
-    # changelog_local
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS changelog_local (
-      id          INTEGER PRIMARY KEY AUTOINCREMENT,
-      table_name  TEXT    NOT NULL,
-      operation   TEXT    NOT NULL,
-      row_id      INTEGER NOT NULL,
-      data        TEXT,
-      timestamp   TEXT    NOT NULL
-    );
-    """)
-
-    # transactions
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS transactions (
-      id             INTEGER PRIMARY KEY,
-      user_id        INTEGER NOT NULL,
-      date           TEXT    NOT NULL,
-      description    TEXT    NOT NULL,
-      "usage"        TEXT    NOT NULL,
-      amount         REAL    NOT NULL,
-      paid           INTEGER NOT NULL,
-      recurring_id   INTEGER,
-      FOREIGN KEY(user_id) REFERENCES users(id),
-      FOREIGN KEY(recurring_id) REFERENCES recurring_entries(id)
-    );
-    """)
-
-    conn.commit()
-    conn.close()
-    logging.info("✅ Lokales SQLite‑Schema initialisiert.")
+    """Bringt das Schema von local.db über die versionierten Migrationen auf Stand."""
+    global _local_engine
+    if _local_engine is None:
+        _local_engine = create_sqlite_engine(LOCAL_DB)
+    version = run_migrations(_local_engine)
+    logging.info(f"✅ Lokales SQLite‑Schema auf Version {version}.")
 
 
 def load_last_pull_ts() -> str | None:
@@ -120,6 +61,8 @@ def get_model_for_table(table: str):
         return SomeModel
     if table == "recurring_entries":
         return RecurringEntry
+    if table == "transactions":
+        return Transaction
     # … weitere Models …
     return None
 
@@ -172,8 +115,12 @@ def push_changes(user_id: int | None = None) -> None:
     conn.close()
 
 
-def apply_remote_change(change: dict, session) -> None:
-    """Wendet eine Remote-Änderung auf die Remote‑DB (SQLAlchemy) an."""
+def apply_remote_change(change: dict, session, touched: set | None = None) -> None:
+    """
+    Wendet eine Remote-Änderung auf die Remote‑DB (SQLAlchemy) an.
+    Betroffene (user_id, Datum) von Transaktionen landen in `touched`,
+    damit pull_changes() die Monatssummen nachziehen kann.
+    """
     table = change["table"]
     op    = change["op"]
     row_id= change["id"]
@@ -184,16 +131,26 @@ def apply_remote_change(change: dict, session) -> None:
         logging.debug(f"Unbekannte Tabelle beim Pull: {table}")
         return
 
+    track = touched is not None and Model is Transaction
+
     if op == "insert":
-        session.merge(Model(**data))
+        obj = session.merge(Model(**data))
+        if track:
+            touched.add((obj.user_id, obj.date))
     elif op == "update":
         obj = session.get(Model, row_id)
         if obj:
+            if track:
+                touched.add((obj.user_id, obj.date))
             for k, v in data.items():
                 setattr(obj, k, v)
+            if track:
+                touched.add((obj.user_id, obj.date))
     elif op == "delete":
         obj = session.get(Model, row_id)
         if obj:
+            if track:
+                touched.add((obj.user_id, obj.date))
             session.delete(obj)
 
 
@@ -215,12 +172,25 @@ def pull_changes() -> None:
         return
 
     session = Session()
+    touched = set()
+    by_user, versions = {}, {}
     for c in remote_changes:
-        apply_remote_change(c, session)
+        apply_remote_change(c, session, touched)
+
+    # Monatssummen der geänderten Transaktionen in derselben Transaktion nachziehen
+    if touched:
+        session.flush()
+        for user_id, d in touched:
+            by_user.setdefault(user_id, []).append(d)
+        for user_id, dates in by_user.items():
+            totals.refresh_months(session.connection(), user_id, dates)
+            versions[user_id] = dataversion.bump(session.connection(), user_id)
 
     last_ts = remote_changes[-1]["ts"]
     save_last_pull_ts(last_ts)
     session.commit()
+    for user_id, version in versions.items():
+        ledger_cache.invalidate(user_id, by_user[user_id], version)
     logging.info(f"Pull erfolgreich, letzter Timestamp: {last_ts}")
 
 
@@ -234,9 +204,11 @@ def sync(user_id: int | None = None) -> None:
 
 
 def main_loop(interval: int = 60) -> None:
+    init_db()
     ensure_local_schema()
     while True:
         sync()
+        sqlite_maintenance(LOCAL_DB)  # gedrosselt, siehe SQLITE_MAINTENANCE_INTERVAL
         time.sleep(interval)
 
 
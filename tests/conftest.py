@@ -0,0 +1,85 @@
+# tests/conftest.py – gemeinsame Fixtures: frisch migrierte Datenbank je Test
+"""
+Standardmäßig laufen die Datenbank-Tests gegen eine SQLite-Datei im
+tmp_path. Mit TEST_DATABASE_URL (Postgres) laufen sie zusätzlich dort; das
+Schema `public` der Testdatenbank wird dabei jedes Mal neu angelegt.
+
+    TEST_DATABASE_URL=postgresql+psycopg2://postgres:@/fa?host=/tmp/pgdata python -m pytest -q
+"""
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine, insert, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import db  # noqa: E402
+from core.db import create_sqlite_engine  # noqa: E402
+from core.ledgercache import ledger_cache  # noqa: E402
+from core.migrations import run_migrations  # noqa: E402
+from core.models import User  # noqa: E402
+
+PG_URL = os.getenv("TEST_DATABASE_URL")
+BACKENDS = ["sqlite"] + (["postgresql"] if PG_URL else [])
+
+
+def make_engine(backend: str, tmp_path, migrate: bool = True):
+    if backend == "sqlite":
+        engine = create_sqlite_engine(str(tmp_path / "test.db"))
+    else:
+        engine = create_engine(PG_URL)
+        with engine.begin() as conn:
+            conn.execute(text("DROP SCHEMA public CASCADE; CREATE SCHEMA public"))
+    if migrate:
+        run_migrations(engine)
+    return engine
+
+
+@pytest.fixture(params=BACKENDS)
+def engine(request, tmp_path):
+    engine = make_engine(request.param, tmp_path)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def conn(engine):
+    with engine.connect() as conn:
+        yield conn
+
+
+def add_user(conn, username: str = "test") -> int:
+    return conn.execute(
+        insert(User.__table__).values(username=username, password_hash="x").returning(User.__table__.c.id)
+    ).scalar_one()
+
+
+@pytest.fixture
+def user_id(conn):
+    uid = add_user(conn)
+    conn.commit()
+    return uid
+
+
+@pytest.fixture
+def app(engine, monkeypatch):
+    """Flask-App auf der Test-Datenbank (statt der Engine aus init_db())."""
+    monkeypatch.setattr(db, "_engine", engine)
+    monkeypatch.setattr(db, "_read_engine", None)
+    ledger_cache.clear()
+    from app import create_app
+    app = create_app()
+    app.testing = True
+    yield app
+    ledger_cache.clear()
+
+
+@pytest.fixture
+def client(app, user_id):
+    """Test-Client, angemeldet als `user_id`."""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = user_id
+        session["username"] = "test"
+    return client
@@ -0,0 +1,181 @@
+# tests/test_bankimport.py – Kontoauszug-Import: Formate, Vorzeichen und Duplikate
+import csv
+import io
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from core import bankimport
+from core.bankimport import import_rows, parse_amount, parse_camt, parse_csv, parse_date, parse_mt940
+
+
+@pytest.mark.parametrize("value, cents", [
+    ("-1.234,56", -123456), ("1.234,56", 123456), ("1234.56", 123456), ("12,50 EUR", 1250),
+    ("12,5", 1250), ("-0,01", -1), ("1.000.000,00 €", 100000000), ("\xa0-7,00", -700),
+    ("", None), ("abc", None),
+])
+def test_parse_amount_german_formats(value, cents):
+    assert parse_amount(value) == cents
+
+
+@pytest.mark.parametrize("value, day", [
+    ("31.12.2024", date(2024, 12, 31)), ("31.12.24", date(2024, 12, 31)),
+    ("1.2.2024", date(2024, 2, 1)), ("31/12/2024", date(2024, 12, 31)),
+    ("2024-12-31", date(2024, 12, 31)), ("2024-12-31T10:00:00", date(2024, 12, 31)),
+    ("29.02.2024", date(2024, 2, 29)), ("29.02.2023", None), ("", None), ("gestern", None),
+])
+def test_parse_date_german_formats(value, day):
+    assert parse_date(value) == day
+
+
+GERMAN_CSV = (
+    "Kontoauszug;Girokonto\n"
+    "Zeitraum;01.01.2024 - 31.01.2024\n"
+    "\n"
+    "Buchungstag;Valutadatum;Beguenstigter/Zahlungspflichtiger;Verwendungszweck;Betrag\n"
+    "02.01.2024;02.01.2024;Stadtwerke;Abschlag  Januar;-1.234,56\n"
+    "15.01.24;15.01.24;Arbeitgeber GmbH;Gehalt;3.500,00\n"
+)
+
+
+def test_parse_csv_german_export():
+    rows = list(parse_csv(io.BytesIO(GERMAN_CSV.encode("cp1252"))))
+    assert rows == [
+        {"date": date(2024, 1, 2), "description": "Stadtwerke", "usage": "Abschlag Januar", "amount": -123456},
+        {"date": date(2024, 1, 15), "description": "Arbeitgeber GmbH", "usage": "Gehalt", "amount": 350000},
+    ]
+
+
+def test_parse_csv_fallback_keeps_csv_excel(monkeypatch):
+    def fail(*args, **kwargs):
+        raise csv.Error("Could not determine delimiter")
+    monkeypatch.setattr(csv.Sniffer, "sniff", fail)
+    rows = list(parse_csv(io.BytesIO(GERMAN_CSV.encode("utf-8"))))
+    assert [r["amount"] for r in rows] == [-123456, 350000]
+    assert csv.excel.delimiter == ","
+
+
+CAMT = """<?xml version="1.0" encoding="UTF-8"?>
+<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.02"><BkToCstmrStmt><Stmt>
+  <Ntry>
+    <Amt Ccy="EUR">300.00</Amt><CdtDbtInd>DBIT</CdtDbtInd>
+    <BookgDt><Dt>2024-03-05</Dt></BookgDt>
+    <AddtlNtryInf>SAMMLER</AddtlNtryInf>
+    <NtryDtls>
+      <TxDtls>
+        <AmtDtls><TxAmt><Amt Ccy="EUR">120.00</Amt></TxAmt></AmtDtls>
+        <RltdPties><Cdtr><Nm>Versicherung A</Nm></Cdtr></RltdPties>
+        <RmtInf><Ustrd>Beitrag</Ustrd><Ustrd>März</Ustrd></RmtInf>
+      </TxDtls>
+      <TxDtls>
+        <AmtDtls><TxAmt><Amt Ccy="EUR">200.00</Amt></TxAmt></AmtDtls>
+        <RltdPties><Cdtr><Nm>Versicherung B</Nm></Cdtr></RltdPties>
+      </TxDtls>
+      <TxDtls>
+        <AmtDtls><TxAmt><Amt Ccy="EUR">20.00</Amt></TxAmt></AmtDtls>
+        <CdtDbtInd>CRDT</CdtDbtInd>
+        <RltdPties><Dbtr><Nm>Versicherung A</Nm></Dbtr></RltdPties>
+      </TxDtls>
+    </NtryDtls>
+  </Ntry>
+  <Ntry>
+    <Amt Ccy="EUR">50.00</Amt><CdtDbtInd>CRDT</CdtDbtInd>
+    <BookgDt><Dt>2024-03-06</Dt></BookgDt>
+    <NtryDtls><TxDtls>
+      <RltdPties><Dbtr><Nm>Max Muster</Nm></Dbtr></RltdPties>
+      <RmtInf><Ustrd>Rückzahlung</Ustrd></RmtInf>
+    </TxDtls></NtryDtls>
+  </Ntry>
+</Stmt></BkToCstmrStmt></Document>
+"""
+
+
+def test_parse_camt_splits_batch_entries():
+    rows = list(parse_camt(io.BytesIO(CAMT.encode("utf-8"))))
+    assert rows == [
+        {"date": date(2024, 3, 5), "description": "Versicherung A", "usage": "Beitrag März", "amount": -12000},
+        {"date": date(2024, 3, 5), "description": "Versicherung B", "usage": "SAMMLER", "amount": -20000},
+        {"date": date(2024, 3, 5), "description": "Versicherung A", "usage": "SAMMLER", "amount": 2000},
+        {"date": date(2024, 3, 6), "description": "Max Muster", "usage": "Rückzahlung", "amount": 5000},
+    ]
+
+
+MT940 = """:20:STARTUMS
+:25:12345678/0123456789
+:28C:00001/001
+:60F:C240401EUR1000,00
+:61:2404020402D45,90NDDTNONREF
+:86:105?00Lastschrift?20Strom April?32Stadtwerke
+:61:2404030403C1500,00NTRFNONREF
+:86:166?00Gutschrift?20Gehalt?21April?32Arbeitgeber GmbH
+:61:2404040404RC12,50NTRFNONREF
+:86:Storno Gutschrift
+:61:2404050405RD9,99NDDTNONREF
+:86:Storno Lastschrift
+:62F:C240405EUR2442,59
+-
+"""
+
+
+def test_parse_mt940_signs():
+    rows = list(parse_mt940(io.BytesIO(MT940.encode("utf-8"))))
+    assert [(r["date"], r["amount"]) for r in rows] == [
+        (date(2024, 4, 2), -4590),
+        (date(2024, 4, 3), 150000),
+        (date(2024, 4, 4), -1250),   # RC: Storno einer Gutschrift
+        (date(2024, 4, 5), 999),     # RD: Storno einer Belastung
+    ]
+    assert rows[1]["description"] == "Arbeitgeber GmbH" and rows[1]["usage"] == "GehaltApril"
+
+
+def _statement(days):
+    # zweimal derselbe Umsatz am selben Tag zählt doppelt (laufende Nummer)
+    rows = []
+    for d in days:
+        rows.append({"date": d, "description": "Bäcker", "usage": "", "amount": -350})
+        rows.append({"date": d, "description": "Bäcker", "usage": "", "amount": -350})
+        rows.append({"date": d, "description": "Kiosk", "usage": "Zeitung", "amount": -280})
+    return rows
+
+
+def _import(conn, user_id, rows):
+    stats = import_rows(conn, user_id, rows)
+    conn.commit()
+    return stats
+
+
+def _count(conn, user_id):
+    return conn.execute(text("SELECT COUNT(*) FROM transactions WHERE user_id = :u"), {"u": user_id}).scalar()
+
+
+def test_reimport_inserts_nothing(conn, user_id, monkeypatch):
+    monkeypatch.setattr(bankimport, "IMPORT_BATCH", 4)
+    rows = _statement([date(2024, 5, d) for d in range(1, 11)])
+    first = _import(conn, user_id, rows)
+    assert (first["read"], first["inserted"], first["duplicates"]) == (30, 30, 0)
+    again = _import(conn, user_id, rows)
+    assert (again["inserted"], again["duplicates"]) == (0, 30)
+    assert _count(conn, user_id) == 30
+
+
+def test_overlapping_statement_inserts_only_new_rows(conn, user_id):
+    _import(conn, user_id, _statement([date(2024, 5, d) for d in range(1, 11)]))
+    stats = _import(conn, user_id, _statement([date(2024, 5, d) for d in range(6, 16)]))
+    assert (stats["inserted"], stats["duplicates"]) == (15, 15)
+    assert _count(conn, user_id) == 45
+    income, expenses = conn.execute(
+        text("SELECT income, expenses FROM monthly_totals WHERE user_id = :u"), {"u": user_id}).one()
+    assert (income, expenses) == (0, 15 * (350 + 350 + 280))
+
+
+def test_upload_over_limit_is_rejected_before_reading(app, client, conn, user_id):
+    assert app.config["MAX_CONTENT_LENGTH"] == int(bankimport.IMPORT_MAX_MB * 1024 * 1024)
+    app.config["MAX_CONTENT_LENGTH"] = 1024
+    body = "Buchungstag;Betrag;Verwendungszweck\n" + "01.05.2024;-3,50;Bäcker\n" * 200
+    response = client.post("/import/", data={"format": "csv", "file": (io.BytesIO(body.encode()), "auszug.csv")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 302 and response.headers["Location"].endswith("/import/")
+    with client.session_transaction() as session:
+        assert session["_flashes"] == [("error", f"Datei zu groß (höchstens {bankimport.IMPORT_MAX_MB:g} MB).")]
+    assert _count(conn, user_id) == 0
@@ -0,0 +1,87 @@
+# tests/test_cents.py – Cent-Beträge: to_cents/from_cents und Migration 9 (Euro → Cent)
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import text
+
+from conftest import BACKENDS, PG_URL, make_engine
+from core.migrations import MIGRATIONS, _apply, run_migrations, schema_migrations
+from utils_web import from_cents, parse_decimal, to_cents
+
+# Euro-Beträge, wie sie vor Migration 9 als REAL/double in der DB lagen
+LEGACY_AMOUNTS = [0.0, 0.01, -0.01, 0.005, -0.005, 0.015, -0.015, 1.005, -1.005, 2.675,
+                  0.1 + 0.2, 12.34, -850.5, 19.99, -1234567.89, 99999999.99, 7, -42]
+
+
+@pytest.mark.parametrize("value, cents", [
+    ("0.005", 1), ("-0.005", -1), ("0.004", 0), ("-0.004", 0),
+    ("0.015", 2), ("-0.015", -2), ("1.005", 101), ("2.675", 268), ("-2.675", -268),
+    ("12.34", 1234), ("-850.5", -85050), (Decimal("19.99"), 1999), (7, 700), ("0", 0),
+])
+def test_to_cents_rounds_half_away_from_zero(value, cents):
+    assert to_cents(value) == cents
+
+
+@pytest.mark.parametrize("text_value", ["12,34", "-0,01", "1234567.89", "0,5", "-850,50"])
+def test_form_input_round_trip(text_value):
+    value = parse_decimal(text_value)
+    assert from_cents(to_cents(value)) == value
+    assert isinstance(to_cents(value), int)
+
+
+def _expected_cents(amount) -> int:
+    # kürzeste Dezimaldarstellung – das, was der Nutzer eingegeben hat
+    return to_cents(repr(amount))
+
+
+def _migrated_amounts(backend, tmp_path) -> list:
+    """Legt eine Datenbank auf Version 8 (Euro) an, füllt sie und migriert bis heute."""
+    engine = make_engine(backend, tmp_path, migrate=False)
+    with engine.begin() as conn:
+        schema_migrations.create(conn, checkfirst=True)
+    for version, description, fn, transactional in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version <= 8:
+            _apply(engine, version, description, fn, transactional)
+    with engine.begin() as conn:
+        if backend == "postgresql":
+            # Ältere Installationen: Euro als Gleitkommazahl
+            for table in ("transactions", "recurring_entries"):
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN amount TYPE DOUBLE PRECISION"))
+        conn.execute(text("INSERT INTO users (id, username, password_hash) VALUES (1, 'alt', 'x')"))
+        conn.execute(text("INSERT INTO recurring_entries (id, user_id, description, usage, amount, duration, start_date) "
+                          "VALUES (1, 1, 'Miete', 'Wohnen', :amount, 12, '2024-01-01')"), {"amount": -850.55})
+        conn.execute(
+            text("INSERT INTO transactions (id, user_id, date, description, usage, amount, paid) "
+                 "VALUES (:id, 1, '2024-01-15', 'Alt', 'x', :amount, false)"),
+            [{"id": i + 1, "amount": a} for i, a in enumerate(LEGACY_AMOUNTS)],
+        )
+    run_migrations(engine)
+    with engine.connect() as conn:
+        amounts = [r[0] for r in conn.execute(text("SELECT amount FROM transactions ORDER BY id"))]
+        recurring = conn.execute(text("SELECT amount FROM recurring_entries")).scalar()
+    engine.dispose()
+    return amounts, recurring
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_migration_9_converts_euros_to_cents(backend, tmp_path):
+    amounts, recurring = _migrated_amounts(backend, tmp_path)
+    assert amounts == [_expected_cents(a) for a in LEGACY_AMOUNTS]
+    assert all(isinstance(a, int) for a in amounts)
+    assert recurring == -85055
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_migrated_amounts_round_trip(backend, tmp_path):
+    amounts, _ = _migrated_amounts(backend, tmp_path)
+    for legacy, cents in zip(LEGACY_AMOUNTS, amounts):
+        value = Decimal(repr(legacy))
+        if value == value.quantize(Decimal("0.01")):
+            # Beträge mit höchstens zwei Nachkommastellen bleiben exakt erhalten
+            assert from_cents(to_cents(value)) == value
+            assert from_cents(cents) == value
+
+
+@pytest.mark.skipif(not PG_URL, reason="braucht TEST_DATABASE_URL")
+def test_migration_9_same_on_sqlite_and_postgres(tmp_path):
+    assert _migrated_amounts("sqlite", tmp_path) == _migrated_amounts("postgresql", tmp_path)
@@ -0,0 +1,79 @@
+# tests/test_dashboard.py – Keyset-Pagination und laufender Kontostand im Dashboard
+import importlib
+import random
+import re
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from core import queries as Q, totals
+
+ROW = re.compile(r'value="(\d+)".*?€</td>\s*<td class="\w+">(-?\d+\.\d{2}) €</td>', re.S)
+NEXT = re.compile(r'after=(\d{4}-\d{2}-\d{2}_\d+)')
+
+
+def _seed(conn, user_id):
+    """Viele Buchungen auf wenigen Tagen, in zufälliger Reihenfolge angelegt (ids ≠ Datumsfolge)."""
+    days = [date(2023, 12, 31), date(2025, 1, 1)] + [date(2024, m, d) for m, d in
+                                                      ((1, 1), (3, 15), (3, 16), (7, 1), (12, 31))]
+    rows = [{"user_id": user_id, "date": day, "description": f"Buchung {i}", "usage": "",
+             "amount": (-1) ** i * (100 + 37 * i), "paid": True, "recurring_id": None}
+            for day in days for i in range(8)]
+    random.Random(11).shuffle(rows)
+    for row in rows:
+        Q.execute(conn, Q.INSERT_TRANSACTION, row)
+    totals.rebuild(conn, user_id)
+    conn.commit()
+
+
+def _expected(conn, user_id, start, end):
+    """(id, Kontostand in Cent) aller Buchungen im Zeitraum, Stand ab der ersten Buchung."""
+    conn.rollback()
+    rows = conn.execute(text("SELECT id, date, amount FROM transactions WHERE user_id = :u"),
+                        {"u": user_id}).all()
+    balance, expected = 0, []
+    for row_id, day, amount in sorted(rows, key=lambda r: (str(r[1])[:10], r[0])):
+        balance += amount
+        if start <= str(day)[:10] <= end:
+            expected.append((row_id, balance))
+    return expected
+
+
+def _pages(client, url):
+    """Folgt den "Weitere laden"-Links und liefert alle Seiten als [(id, Cent)]."""
+    pages, after = [], None
+    while True:
+        response = client.get(url + (f"&after={after}" if after else ""))
+        body = response.get_data(as_text=True)
+        response.close()
+        assert response.status_code == 200
+        pages.append([(int(i), round(float(b) * 100)) for i, b in ROW.findall(body)])
+        match = NEXT.search(body)
+        if not match:
+            return pages
+        after = match.group(1)
+        assert len(pages) < 100
+
+
+@pytest.mark.parametrize("size", [1, 7, 40])
+def test_keyset_pages_cover_year_once(app, client, conn, user_id, monkeypatch, size):
+    monkeypatch.setattr(importlib.import_module("app"), "DASHBOARD_PAGE_SIZE", size)
+    _seed(conn, user_id)
+
+    pages = _pages(client, "/dashboard?year=2024&month=0&partial=1")
+    expected = _expected(conn, user_id, "2024-01-01", "2024-12-31")
+    assert len(expected) == 40
+    # jede Seite voll bis auf die letzte, keine Zeile doppelt oder ausgelassen
+    assert all(len(p) == size for p in pages[:-1]) and 0 < len(pages[-1]) <= size
+    assert [row for page in pages for row in page] == expected
+
+
+def test_keyset_cursor_within_tied_dates(app, client, conn, user_id, monkeypatch):
+    monkeypatch.setattr(importlib.import_module("app"), "DASHBOARD_PAGE_SIZE", 3)
+    _seed(conn, user_id)
+
+    pages = _pages(client, "/dashboard?year=2024&month=3&partial=1")
+    # 16 Buchungen an zwei Tagen: Seitenwechsel mitten in einem Tag
+    assert [len(p) for p in pages] == [3, 3, 3, 3, 3, 1]
+    assert [row for page in pages for row in page] == _expected(conn, user_id, "2024-03-01", "2024-03-31")
@@ -0,0 +1,85 @@
+# tests/test_dataversion.py – Datenversion, ETag/304 und Wartungsbefehle
+from sqlalchemy import text
+
+from conftest import add_user
+from cli.commands import rebuild_totals_command
+
+
+def _version(conn, user_id):
+    conn.rollback()   # frischer Snapshot
+    return conn.execute(text("SELECT data_version FROM users WHERE id = :u"), {"u": user_id}).scalar()
+
+
+def _add_entry(client, day="2024-03-05"):
+    return client.post("/add_entry", data={"entry_date": day, "description": "Bäcker",
+                                           "usage": "Lebensmittel", "amount": "-3,50"})
+
+
+def _get(client, url, **kwargs):
+    # Dashboard streamt: Antwort vollständig lesen, bevor der Kontext endet
+    response = client.get(url, **kwargs)
+    response.get_data()
+    response.close()
+    return response
+
+
+def _clear_flashes(client):
+    with client.session_transaction() as session:
+        session.pop("_flashes", None)
+
+
+def test_write_bumps_data_version(client, conn, user_id):
+    before = _version(conn, user_id)
+    assert _add_entry(client).status_code == 302
+    assert _version(conn, user_id) == before + 1
+
+
+def test_matching_etag_returns_304(client, conn, user_id):
+    first = _get(client, "/dashboard?year=2024")
+    assert first.status_code == 200
+    tag = first.headers["ETag"]
+    assert tag.startswith(f'W/"{_version(conn, user_id)}-')
+
+    again = _get(client, "/dashboard?year=2024", headers={"If-None-Match": tag})
+    assert again.status_code == 304 and again.data == b""
+    assert again.headers["ETag"] == tag
+    # andere Query-Argumente → anderer ETag
+    assert _get(client, "/dashboard?year=2023", headers={"If-None-Match": tag}).status_code == 200
+
+    # nach einer Buchung passt der alte ETag nicht mehr
+    _add_entry(client)
+    _clear_flashes(client)
+    changed = _get(client, "/dashboard?year=2024", headers={"If-None-Match": tag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != tag
+
+
+def test_pending_flash_prevents_304(client):
+    tag = _get(client, "/dashboard?year=2024").headers["ETag"]
+    with client.session_transaction() as session:
+        session["_flashes"] = [("success", "Gespeichert.")]
+    response = _get(client, "/dashboard?year=2024", headers={"If-None-Match": tag})
+    assert response.status_code == 200 and response.data
+
+
+def test_post_passes_through(client, conn, user_id):
+    tag = _get(client, "/fixkosten").headers["ETag"]
+    before = _version(conn, user_id)
+    response = client.post("/fixkosten", headers={"If-None-Match": tag},
+                           data={"add_fix": "1", "description": "Miete", "usage": "Wohnen", "amount": "-800",
+                                 "duration": "3", "start_date": "2024-01-01"})
+    assert response.status_code != 304
+    assert "ETag" not in response.headers
+    assert _version(conn, user_id) == before + 1
+
+
+def test_rebuild_totals_bumps_data_version(app, conn, user_id):
+    other = add_user(conn, "andere")
+    conn.commit()
+    runner = app.test_cli_runner()
+    before = {u: _version(conn, u) for u in (user_id, other)}
+
+    assert runner.invoke(rebuild_totals_command, ["--user-id", str(user_id)]).exit_code == 0
+    assert {u: _version(conn, u) for u in (user_id, other)} == {user_id: before[user_id] + 1, other: before[other]}
+
+    assert runner.invoke(rebuild_totals_command).exit_code == 0
+    assert {u: _version(conn, u) for u in (user_id, other)} == {user_id: before[user_id] + 2, other: before[other] + 1}
@@ -0,0 +1,57 @@
+# tests/test_db_breaker.py – Zählweise des Circuit Breakers (core/db.py)
+import psycopg2
+import pytest
+from sqlalchemy import event, text
+
+from conftest import PG_URL
+from core import db
+from core.breaker import CircuitBreaker
+
+
+def _breaker():
+    return CircuitBreaker("test", 100, 60, lambda: None)
+
+
+def test_connect_disconnect_counts_once():
+    # "server closed the connection" beim Verbinden gilt dem Dialekt als
+    # Disconnect – handle_error und _checkout() dürfen ihn nicht beide zählen
+    circuit = _breaker()
+    engine = db._create_engine("postgresql+psycopg2://postgres:@/fa?host=/nonexistent", circuit)
+
+    @event.listens_for(engine, "do_connect")
+    def _refuse(*args):
+        raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+    for expected in (1, 2):
+        with pytest.raises(db.DatabaseUnavailable):
+            db._checkout(engine, circuit)
+        assert circuit.failures == expected
+    engine.dispose()
+
+
+@pytest.mark.skipif(not PG_URL, reason="braucht TEST_DATABASE_URL")
+def test_query_disconnect_counts():
+    circuit = _breaker()
+    engine = db._create_engine(PG_URL, circuit)
+    conn = db._checkout(engine, circuit)
+    pid = conn.execute(text("SELECT pg_backend_pid()")).scalar()
+    with engine.connect() as other:
+        other.execute(text("SELECT pg_terminate_backend(:pid)"), {"pid": pid})
+    with pytest.raises(Exception):
+        conn.execute(text("SELECT 1"))
+    assert circuit.failures == 1
+    conn.close()
+    engine.dispose()
+
+
+def test_status_hides_driver_message(caplog):
+    # /health/db ist ohne Anmeldung erreichbar: Host, IP und Port nur ins Log
+    circuit = CircuitBreaker("test", 1, 3600, lambda: None)
+    message = 'connection to server at "db.intern" (10.0.0.5), port 5432 failed'
+    with caplog.at_level("ERROR"):
+        circuit.record_failure(psycopg2.OperationalError(message))
+    status = circuit.status()
+    assert status["state"] == "open"
+    assert status["last_error"] == "OperationalError"
+    assert "10.0.0.5" not in str(status)
+    assert message in caplog.text
@@ -0,0 +1,99 @@
+# tests/test_export.py – Export als CSV, NDJSON und Parquet (mit/ohne gzip)
+import csv
+import gzip
+import io
+import json
+from datetime import date
+
+import pytest
+
+from conftest import add_user
+from core import export, queries as Q
+from utils_web import to_cents
+
+# (Datum, Beschreibung, Verwendungszweck, Cent, bezahlt)
+ROWS = [
+    (date(2023, 12, 31), "Vorjahr", "", 5, True),
+    (date(2024, 1, 1), "Gehalt", "Januar", 123456789, True),
+    (date(2024, 1, 15), "Bäcker, \"Zur Mühle\"", "Brötchen\nund Kuchen", -1, True),
+    (date(2024, 2, 29), "Rückzahlung", "", 10, False),
+    (date(2024, 2, 29), "Miete", "Wohnung", -95050, False),
+    (date(2024, 3, 1), "Ab März", "", -250, True),
+]
+
+
+@pytest.fixture
+def ledger(conn, user_id, monkeypatch):
+    # Kleine Blöcke: mehrere Partitionen, Row Groups und gzip-Flushes
+    monkeypatch.setattr(Q, "EXPORT_TRANSACTIONS", Q.LEDGER_ROWS.execution_options(yield_per=2))
+    rows = []
+    for day, description, usage, amount, paid in ROWS:
+        row_id = conn.execute(
+            Q.INSERT_TRANSACTION.returning(Q.transactions.c.id),
+            {"user_id": user_id, "date": day, "description": description, "usage": usage,
+             "amount": amount, "paid": paid, "recurring_id": None},
+        ).scalar_one()
+        rows.append((row_id, day.isoformat(), description, usage, amount, paid, None))
+    conn.commit()
+    return rows
+
+
+def _read(fmt: str, data: bytes) -> list:
+    """Export → [(id, Datum, Beschreibung, Verwendungszweck, Cent, bezahlt, recurring_id)]."""
+    if fmt == "csv":
+        reader = csv.reader(io.StringIO(data.decode("utf-8"), newline=""))
+        assert next(reader) == export.COLUMNS
+        return [(int(i), d, desc, usage, to_cents(amount), paid == "1", int(rec) if rec else None)
+                for i, d, desc, usage, amount, paid, rec in reader]
+    if fmt == "ndjson":
+        return [(r["id"], r["date"], r["description"], r["usage"], to_cents(str(r["amount"])),
+                 r["paid"], r["recurring_id"])
+                for r in map(json.loads, data.decode("utf-8").splitlines())]
+    import pyarrow.parquet as pq
+    table = pq.read_table(io.BytesIO(data))
+    assert table.column_names == export.COLUMNS
+    return [(r["id"], r["date"].isoformat(), r["description"], r["usage"], to_cents(r["amount"]),
+             r["paid"], r["recurring_id"])
+            for r in table.to_pylist()]
+
+
+@pytest.mark.parametrize("compress", [False, True], ids=["plain", "gzip"])
+@pytest.mark.parametrize("fmt", ["csv", "ndjson", "parquet"])
+def test_round_trip(conn, user_id, ledger, fmt, compress):
+    if not export.available(fmt):
+        pytest.skip(f"{fmt} nicht verfügbar")
+    data = b"".join(export.stream(conn, user_id, fmt=fmt, compress=compress))
+    if compress:
+        assert data[:2] == b"\x1f\x8b"
+        data = gzip.decompress(data)
+    assert _read(fmt, data) == ledger
+
+
+@pytest.mark.parametrize("fmt", ["csv", "ndjson", "parquet"])
+def test_period_filter(conn, user_id, ledger, fmt):
+    if not export.available(fmt):
+        pytest.skip(f"{fmt} nicht verfügbar")
+    # [start, end): 29.02. gehört dazu, 01.03. nicht mehr
+    data = b"".join(export.stream(conn, user_id, date(2024, 1, 1), date(2024, 3, 1), fmt))
+    assert _read(fmt, data) == ledger[1:5]
+    empty = b"".join(export.stream(conn, user_id, date(2025, 1, 1), date(2026, 1, 1), fmt))
+    assert _read(fmt, empty) == []
+
+
+def test_other_users_rows_are_not_exported(conn, user_id, ledger):
+    other = add_user(conn, "andere")
+    conn.execute(Q.INSERT_TRANSACTION, {"user_id": other, "date": date(2024, 1, 2), "description": "Fremd",
+                                        "usage": "", "amount": -1, "paid": True, "recurring_id": None})
+    conn.commit()
+    assert _read("csv", b"".join(export.stream(conn, user_id))) == ledger
+
+
+def test_route_gzip_and_filename(client, ledger):
+    response = client.get("/export/?format=csv&start=2024-01-01&end=2024-03-01",
+                          headers={"Accept-Encoding": "gzip"})
+    data = response.get_data()
+    response.close()
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert 'filename="transaktionen_2024-01-01_2024-03-01.csv"' in response.headers["Content-Disposition"]
+    assert _read("csv", gzip.decompress(data)) == ledger[1:5]
@@ -0,0 +1,69 @@
+# tests/test_fixkosten.py – neue Fixkosten-Serien: gleiche Buchungen auf SQLite und Postgres
+import warnings
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import SAWarning
+
+from conftest import BACKENDS, PG_URL, add_user, make_engine
+from core import queries as Q
+from core.fixkosten import create_fix_transactions
+from core.recurrence import Rule, horizon
+
+RULES = {
+    "Miete": Rule.create(date(2024, 1, 15), "monthly", count=12),
+    "Versicherung": Rule.create(date(2024, 2, 1), "quarterly", until=date(2025, 12, 31)),
+    "Putzhilfe": Rule.create(date(2024, 2, 29), "weekly", 2, count=10),
+    "Beitrag": Rule.create(date(2023, 6, 1), "yearly", count=3),
+    "Strom": Rule.create(date(2025, 1, 1), "monthly"),   # offen: bis horizon()
+}
+
+
+def _create_series(conn) -> list:
+    user_id = add_user(conn)
+    for i, (description, rule) in enumerate(RULES.items()):
+        amount = -1000 * (i + 1) - 1
+        rec_id = Q.execute(conn, Q.INSERT_RECURRING, user_id=user_id, description=description, usage="Fix",
+                           amount=amount, duration=rule.count, start_date=rule.start,
+                           frequency=rule.frequency, freq_interval=rule.interval, until=rule.until).scalar_one()
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", SAWarning)
+            dates = create_fix_transactions(conn, user_id, rec_id, rule, amount)
+        assert dates == list(rule.occurrences(rule.start, max(horizon(), rule.start)))
+    conn.commit()
+    rows = conn.execute(text(
+        "SELECT r.description, t.date, t.description, t.usage, t.amount, t.paid "
+        "FROM transactions t JOIN recurring_entries r ON r.id = t.recurring_id "
+        "ORDER BY r.description, t.date")).fetchall()
+    totals = conn.execute(text("SELECT year, month, expenses, open_recurring, tx_count FROM monthly_totals "
+                               "ORDER BY year, month")).fetchall()
+    return ([(rec, str(d)[:10], desc, usage, int(amount), bool(paid)) for rec, d, desc, usage, amount, paid in rows],
+            [tuple(int(v) for v in r) for r in totals])
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_create_fix_transactions(backend, tmp_path):
+    engine = make_engine(backend, tmp_path)
+    with engine.connect() as conn:
+        rows, totals = _create_series(conn)
+    engine.dispose()
+    expected = sorted(
+        (description, str(d), description, "Fix", -1000 * (i + 1) - 1, False)
+        for i, (description, rule) in enumerate(RULES.items())
+        for d in rule.occurrences(rule.start, max(horizon(), rule.start))
+    )
+    assert rows == expected
+    assert sum(r[2] for r in totals) == -sum(r[4] for r in rows)
+    assert sum(r[4] for r in totals) == len(rows)
+
+
+@pytest.mark.skipif(not PG_URL, reason="braucht TEST_DATABASE_URL")
+def test_create_fix_transactions_same_on_sqlite_and_postgres(tmp_path):
+    results = []
+    for backend in ("sqlite", "postgresql"):
+        engine = make_engine(backend, tmp_path)
+        with engine.connect() as conn:
+            results.append(_create_series(conn))
+        engine.dispose()
+    assert results[0] == results[1]
@@ -0,0 +1,96 @@
+# tests/test_ledger.py – Ledger-Gruppierungen gegen monthly_totals, Bericht aus dem Ledger
+import random
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from core import queries as Q
+from core import totals
+from core.ledger import Ledger
+from core.models import MonthlyTotal
+from core.reports import build_report
+
+START, END = date(2023, 1, 1), date(2026, 1, 1)
+
+
+@pytest.fixture
+def ledger_data(conn, user_id):
+    rng = random.Random(15)
+    rec_id = Q.execute(conn, Q.INSERT_RECURRING, user_id=user_id, description="Miete", usage="Wohnen",
+                       amount=-80000, duration=36, start_date=START, frequency="monthly",
+                       freq_interval=1, until=None).scalar_one()
+    rows = []
+    for i in range(600):
+        # eine Fixkosten-Buchung je Monat (Unique-Index user_id, recurring_id, date)
+        recurring = i < 36
+        day = (date(2023 + i // 12, i % 12 + 1, rng.randint(1, 28)) if recurring
+               else START + timedelta(days=rng.randrange((END - START).days)))
+        rows.append(dict(
+            user_id=user_id,
+            date=day,
+            description=f"E{i % 40}",
+            usage=rng.choice(["Lebensmittel", "Wohnen", "Gehalt", "Freizeit"]),
+            amount=-rng.randint(1, 90000) if recurring else rng.choice([-1, 1]) * rng.randint(1, 90000),
+            paid=rng.random() < 0.5,
+            recurring_id=rec_id if recurring else None,
+        ))
+    Q.execute(conn, Q.INSERT_TRANSACTION, rows)
+    totals.rebuild(conn, user_id)
+    conn.commit()
+    return rows
+
+
+def _monthly_totals(conn, user_id):
+    m = MonthlyTotal.__table__.c
+    return conn.execute(
+        select(m.year, m.month, m.income, m.expenses, m.open_recurring, m.tx_count)
+        .where(m.user_id == user_id).order_by(m.year, m.month)
+    ).fetchall()
+
+
+def test_by_month_matches_monthly_totals(conn, user_id, ledger_data):
+    ledger = Ledger.load(conn, user_id)
+    assert len(ledger) == len(ledger_data)
+    groups = ledger.by_month()
+    expected = _monthly_totals(conn, user_id)
+    assert [int(k) for k in groups["key"]] == [int(y) * 12 + int(mo) - 1 for y, mo, *_ in expected]
+    assert groups["income"].tolist() == [int(r.income) for r in expected]
+    assert groups["expenses"].tolist() == [int(r.expenses) for r in expected]
+    assert groups["offen"].tolist() == [int(r.open_recurring) for r in expected]
+    assert groups["count"].tolist() == [int(r.tx_count) for r in expected]
+
+
+def test_income_expense_matches_period_totals(conn, user_id, ledger_data):
+    for start, end in [(START, END), (date(2024, 1, 1), date(2025, 1, 1)), (date(2024, 3, 1), date(2024, 4, 1))]:
+        summary = Ledger.load(conn, user_id, start, end).income_expense()
+        expected = totals.period_totals(conn, user_id, start, end)
+        for key in ("income", "expenses", "saldo", "offen", "count"):
+            assert summary[key] == int(expected[key]), (start, key)
+        # between() auf dem vollen Ledger liefert denselben Ausschnitt
+        assert Ledger.load(conn, user_id).between(start, end).income_expense() == summary
+
+
+def test_report_built_from_ledger(conn, user_id, ledger_data):
+    first, last = 2023 * 12, 2025 * 12 + 11
+    report = build_report(Ledger.load(conn, user_id, START, END), first, last)
+    expected = _monthly_totals(conn, user_id)
+    by_index = {int(y) * 12 + int(mo) - 1: r for y, mo, *r in expected}
+    income = [int(by_index[m][0]) / 100 if m in by_index else 0.0 for m in range(first, last + 1)]
+    expenses = [int(by_index[m][1]) / 100 if m in by_index else 0.0 for m in range(first, last + 1)]
+    assert report["monthly"]["income"] == income
+    assert report["monthly"]["expenses"] == expenses
+    # Pivot: Summe je Verwendungszweck = Ausgaben dieses Zwecks
+    usage_totals = {}
+    for r in ledger_data:
+        if r["amount"] < 0:
+            usage_totals[r["usage"]] = usage_totals.get(r["usage"], 0) - r["amount"]
+    assert {u["usage"]: round(u["total"] * 100) for u in report["usage"]} == usage_totals
+    assert [y["year"] for y in report["years"]] == [2023, 2024, 2025]
+
+
+def test_empty_ledger(conn, user_id):
+    ledger = Ledger.load(conn, user_id)
+    assert ledger.income_expense() == {"income": 0, "expenses": 0, "saldo": 0, "offen": 0, "count": 0}
+    report = build_report(ledger, 2025 * 12, 2025 * 12 + 11)
+    assert report["usage"] == [] and sum(report["monthly"]["expenses"]) == 0
@@ -0,0 +1,83 @@
+# tests/test_ledgercache.py – Ledger-Cache: Invalidierung je Zeitraum, Datenversion, Speichergrenze
+from datetime import date
+
+from core.ledgercache import LedgerCache
+
+JAN, FEB, MAR = (1, date(2024, 1, 1), date(2024, 2, 1)), (1, date(2024, 2, 1), date(2024, 3, 1)), \
+    (1, date(2024, 3, 1), date(2024, 4, 1))
+YEAR = (1, date(2024, 1, 1), date(2025, 1, 1))
+NAV, REPORT = (1, "nav", 2024), (1, "report", 2024, "monthly")
+OTHER_USER = (2, date(2024, 1, 1), date(2024, 2, 1))
+
+
+def _filled(version=5):
+    cache = LedgerCache(10 ** 6)
+    for key in (JAN, FEB, MAR, YEAR, NAV, REPORT):
+        cache.put(key, version, {"rows": []})
+    cache.put(OTHER_USER, 9, {"rows": []})
+    return cache
+
+
+def test_write_drops_its_period_and_all_later_ones():
+    cache = _filled()
+    cache.invalidate(1, [date(2024, 2, 14)], 6)
+    assert cache.get(JAN, 6) is not None
+    for key in (FEB, MAR, YEAR, NAV, REPORT):
+        assert cache.get(key, 6) is None
+    assert cache.get(OTHER_USER, 9) is not None
+    assert cache.stats()["invalidations"] == 5
+
+
+def test_own_write_keeps_unaffected_entries_for_new_version():
+    cache = _filled()
+    # eigener Schreibzugriff: Version 5 → 6, geänderter Tag im März
+    cache.invalidate(1, [date(2024, 3, 31)], 6)
+    assert cache.get(JAN, 6) == {"rows": []}
+    assert cache.get(FEB, 6) == {"rows": []}
+    assert cache.get(MAR, 6) is None
+    # ohne geänderte Tage (z. B. nur Vorschläge) bleiben auch Navigation und Berichte
+    cache = _filled()
+    cache.invalidate(1, [], 6)
+    assert all(cache.get(key, 6) is not None for key in (JAN, FEB, MAR, YEAR, NAV, REPORT))
+
+
+def test_foreign_write_drops_everything_of_the_user():
+    cache = _filled()
+    # dazwischen hat ein anderer Prozess geschrieben: 5 → (6) → 7
+    cache.invalidate(1, [], 7)
+    assert all(cache.get(key, 7) is None for key in (JAN, FEB, MAR, YEAR, NAV, REPORT))
+    assert cache.get(OTHER_USER, 9) is not None
+    # unbekannte neue Version
+    cache = _filled()
+    cache.invalidate(1, [], None)
+    assert cache.get(JAN, None) is None
+    # ohne invalidate(): die Version passt beim Lesen nicht mehr
+    cache = _filled()
+    assert cache.get(JAN, 6) is None
+    assert cache.get(JAN, 5) is None
+
+
+def test_byte_bound_evicts_least_recently_used():
+    cache = LedgerCache(3000)
+    for month in range(1, 6):
+        cache.put((1, date(2024, month, 1), date(2024, month + 1, 1)), 1, {}, size=1000)
+        # Januar bleibt in Benutzung
+        cache.get(JAN, 1)
+    stats = cache.stats()
+    assert stats["bytes"] <= 3000 and stats["entries"] == 3 and stats["evictions"] == 2
+    assert cache.get(JAN, 1) is not None
+    assert cache.get(FEB, 1) is None and cache.get(MAR, 1) is None
+    # zu groß für den ganzen Cache: wird nicht aufgenommen, nichts wird verdrängt
+    cache.put(NAV, 1, {}, size=5000)
+    assert cache.get(NAV, 1) is None and cache.stats()["entries"] == 3
+    # Ersetzen desselben Schlüssels zählt die alte Größe nicht doppelt
+    cache.put(JAN, 2, {}, size=500)
+    assert cache.stats()["bytes"] == 2500
+
+
+def test_size_estimate_grows_with_rows():
+    cache = LedgerCache(10 ** 6)
+    cache.put(JAN, 1, {"rows": []})
+    small = cache.stats()["bytes"]
+    cache.put(FEB, 1, {"rows": [(1, date(2024, 2, 1), "x" * 1000, "y", -100, True, None, 0)] * 10})
+    assert cache.stats()["bytes"] - small > 10 * 1000
@@ -0,0 +1,122 @@
+# tests/test_migrations.py – Upgrade eines Schemas von vor den Migrationen
+import sqlite3
+
+from click.testing import CliRunner
+from sqlalchemy import event, text
+
+import pytest
+
+from conftest import BACKENDS, make_engine
+from cli.commands import vacuum_sqlite_command
+from core.db import create_sqlite_engine, sqlite_maintenance
+from core.migrations import MIGRATIONS, run_migrations
+
+# Stand vor der Versionierung: Tabellen aus create_all, ohne schema_migrations,
+# ohne spätere Spalten (is_admin, created_at …) und ohne eindeutige Indizes
+LEGACY_SCHEMA = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR NOT NULL, password_hash VARCHAR NOT NULL)",
+    "CREATE TABLE recurring_entries (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id), "
+    "description VARCHAR NOT NULL, usage VARCHAR NOT NULL, amount INTEGER NOT NULL, "
+    "duration INTEGER NOT NULL, start_date TIMESTAMP)",
+    "CREATE TABLE transactions (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id), "
+    "date TIMESTAMP NOT NULL, description VARCHAR NOT NULL, usage VARCHAR NOT NULL, amount INTEGER NOT NULL, "
+    "paid BOOLEAN NOT NULL, recurring_id INTEGER REFERENCES recurring_entries (id))",
+    "CREATE TABLE suggestions (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id), "
+    "suggestion_type VARCHAR NOT NULL, text VARCHAR NOT NULL)",
+]
+
+# (id, Datum, bezahlt, Serie)
+LEGACY_TRANSACTIONS = [
+    (1, "2024-01-01", False, 1), (2, "2024-01-01", True, 1), (3, "2024-01-01", False, 1),   # bezahlte bleibt
+    (4, "2024-02-01", False, 1), (5, "2024-02-01", False, 1),                              # älteste bleibt
+    (6, "2024-03-01", True, 1), (7, "2024-03-01", True, 1),
+    (8, "2024-01-01", False, 2),                                                           # andere Serie
+    (9, "2024-01-15", False, None), (10, "2024-01-15", False, None),                       # keine Fixkosten
+]
+
+
+@pytest.fixture
+def legacy_engine(request, tmp_path):
+    engine = make_engine(request.param, tmp_path, migrate=False)
+    with engine.begin() as conn:
+        for ddl in LEGACY_SCHEMA:
+            conn.execute(text(ddl))
+        conn.execute(text("INSERT INTO users (id, username, password_hash) VALUES (1, 'alt', 'x')"))
+        conn.execute(text("INSERT INTO recurring_entries (id, user_id, description, usage, amount, duration, "
+                          "start_date) VALUES (:id, 1, 'Miete', 'Wohnen', -500, 12, '2024-01-01')"),
+                     [{"id": 1}, {"id": 2}])
+        conn.execute(text("INSERT INTO transactions (id, user_id, date, description, usage, amount, paid, "
+                          "recurring_id) VALUES (:id, 1, :date, 'Miete', 'Wohnen', -500, :paid, :rec)"),
+                     [dict(id=i, date=d, paid=p, rec=r) for i, d, p, r in LEGACY_TRANSACTIONS])
+        conn.execute(text("INSERT INTO suggestions (id, user_id, suggestion_type, text) VALUES (:id, 1, 'usage', :t)"),
+                     [{"id": 1, "t": "Wohnen"}, {"id": 2, "t": "Wohnen"}, {"id": 3, "t": "Freizeit"}])
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize("legacy_engine", BACKENDS, indirect=True)
+def test_upgrade_legacy_schema_keeps_paid_duplicates(legacy_engine):
+    latest = max(m[0] for m in MIGRATIONS)
+    assert run_migrations(legacy_engine) == latest
+    with legacy_engine.connect() as conn:
+        rows = conn.execute(text("SELECT id, paid FROM transactions ORDER BY id")).fetchall()
+        assert [(i, bool(p)) for i, p in rows] == [(2, True), (4, False), (6, True), (8, False), (9, False), (10, False)]
+        assert [r[0] for r in conn.execute(text("SELECT id FROM suggestions ORDER BY id"))] == [1, 3]
+        assert conn.execute(text("SELECT COUNT(*) FROM schema_migrations")).scalar() == len(MIGRATIONS)
+        # Spalten späterer Modelle sind ergänzt
+        conn.execute(text("SELECT is_admin, created_at FROM users"))
+
+
+@pytest.mark.parametrize("legacy_engine", BACKENDS, indirect=True)
+def test_second_run_does_nothing(legacy_engine):
+    version = run_migrations(legacy_engine)
+    with legacy_engine.connect() as conn:
+        before = conn.execute(text("SELECT id, paid, amount FROM transactions ORDER BY id")).fetchall()
+    statements = []
+    event.listen(legacy_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    assert run_migrations(legacy_engine) == version
+    # aktuelle Datenbank: genau eine Abfrage (höchste Version)
+    assert len(statements) == 1 and "schema_migrations" in statements[0]
+    with legacy_engine.connect() as conn:
+        assert conn.execute(text("SELECT id, paid, amount FROM transactions ORDER BY id")).fetchall() == before
+        assert conn.execute(text("SELECT COUNT(*) FROM schema_migrations")).scalar() == len(MIGRATIONS)
+
+
+def _auto_vacuum(path) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_new_sqlite_file_uses_incremental_auto_vacuum(tmp_path):
+    make_engine("sqlite", tmp_path).dispose()
+    assert _auto_vacuum(tmp_path / "test.db") == 2
+
+
+def test_sqlite_vacuum_runs_only_on_request(tmp_path):
+    # Datei von vor Migration 5: auto_vacuum=NONE
+    path = str(tmp_path / "alt.db")
+    raw = sqlite3.connect(path)
+    for ddl in LEGACY_SCHEMA:
+        raw.execute(ddl)
+    raw.commit()
+    raw.close()
+
+    engine = create_sqlite_engine(path)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    run_migrations(engine)
+    engine.dispose()
+    assert not [s for s in statements if s.strip().upper().startswith("VACUUM")]
+    assert _auto_vacuum(path) == 0
+
+    # Regelmäßige Wartung läuft weiter, ändert aber nichts am Modus
+    assert sqlite_maintenance(path, force=True)
+    assert _auto_vacuum(path) == 0
+
+    result = CliRunner().invoke(vacuum_sqlite_command, ["--path", path])
+    assert result.exit_code == 0, result.output
+    assert _auto_vacuum(path) == 2
+    assert sqlite_maintenance(path, force=True)
@@ -0,0 +1,151 @@
+# tests/test_projection.py – virtuelle Fixkosten-Termine: ids, Kontostand beim Blättern, Bezahlt-Schalter
+import random
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from core import projection
+from core import queries as Q
+from core import totals
+from core.projection import merge, parse_virtual_id, virtual_id
+from conftest import add_user
+from utils_web import as_date
+
+MIETE, FITNESS = -80000, -1500
+
+
+@pytest.mark.parametrize("recurring_id", [1, 42, 2 ** 31 - 1])
+@pytest.mark.parametrize("day", [date(1, 1, 1), date(2024, 2, 29), date(2025, 12, 31), date.max])
+def test_virtual_id_round_trip(recurring_id, day):
+    value = virtual_id(recurring_id, day)
+    assert value < 0
+    assert parse_virtual_id(value) == (recurring_id, day)
+
+
+def test_virtual_ids_are_unique():
+    days = [date(2024, 1, 1) + timedelta(days=n) for n in range(800)]
+    ids = {virtual_id(r, d) for r in range(1, 30) for d in days}
+    assert len(ids) == 29 * len(days)
+
+
+def _series(conn, user_id, description, amount, start, frequency, count):
+    return Q.execute(conn, Q.INSERT_RECURRING, user_id=user_id, description=description, usage="Fix",
+                     amount=amount, duration=count, start_date=start, frequency=frequency,
+                     freq_interval=1, until=None).scalar_one()
+
+
+@pytest.fixture
+def virtual_data(conn, user_id):
+    """Zwei Serien ohne gebuchte Termine bis auf Miete März 2025 (am 15.), dazu Einzelbuchungen."""
+    rng = random.Random(24)
+    miete = _series(conn, user_id, "Miete", MIETE, date(2025, 1, 1), "monthly", 24)
+    fitness = _series(conn, user_id, "Fitness", FITNESS, date(2025, 1, 6), "weekly", 60)
+    rows = [dict(user_id=user_id, date=date(2025, 3, 15), description="Miete", usage="Fix",
+                 amount=MIETE, paid=True, recurring_id=miete)]
+    for _ in range(120):
+        rows.append(dict(user_id=user_id, date=date(2024, 11, 1) + timedelta(days=rng.randrange(800)),
+                         description="Einkauf", usage="Lebensmittel",
+                         amount=rng.choice([-1, 1]) * rng.randint(1, 300000), paid=True, recurring_id=None))
+    # gleiche Tage wie virtuelle Termine: virtuelle (negative id) stehen davor
+    rows += [dict(user_id=user_id, date=date(2025, m, 1), description="Gehalt", usage="Lohn",
+                  amount=250000, paid=True, recurring_id=None) for m in range(1, 13)]
+    Q.execute(conn, Q.INSERT_TRANSACTION, rows)
+    totals.rebuild(conn, user_id)
+    conn.commit()
+    return miete, fitness
+
+
+def _expected_balances(conn, user_id, proj):
+    real = [(as_date(d), i, a) for i, d, a in conn.execute(
+        text("SELECT id, date, amount FROM transactions WHERE user_id = :u"), {"u": user_id})]
+    rows = sorted(real + [(r[1], r[0], r[4]) for r in proj.rows])
+    balances, balance = {}, 0
+    for day, row_id, amount in rows:
+        balance += amount
+        balances[row_id] = (day, balance)
+    return balances
+
+
+def _dashboard(conn, user_id, start, end, page_size):
+    """Blättert wie dashboard() mit Keyset-Cursor durch den Zeitraum und mischt die Termine ein."""
+    proj = projection.load(conn, user_id)
+    shown, after = [], None
+    while True:
+        after_date, after_id = after or (date.min, 0)
+        params = {"user_id": user_id, "start": start, "end": end, "after_date": after_date,
+                  "after_id": after_id, "limit": page_size + 1,
+                  "opening": totals.opening_balance(conn, user_id, start)}
+        real_base = params["opening"]
+        if after is not None:
+            real_base += Q.execute(conn, Q.DASHBOARD_CARRY_IN, params).scalar()
+        page = list(merge(Q.execute(conn, Q.DASHBOARD_TRANSACTIONS, params),
+                          proj.page(start, end, (after_date, after_id)), real_base,
+                          proj.total_before(start, (after_date, after_id))))
+        shown += page[:page_size]
+        if len(page) <= page_size:
+            return proj, shown
+        after = (as_date(page[page_size - 1][1]), page[page_size - 1][0])
+
+
+@pytest.mark.parametrize("start, end", [
+    (date.min, date(9999, 1, 1)), (date(2025, 1, 1), date(2026, 1, 1)),
+    (date(2025, 3, 1), date(2025, 4, 1)), (date(2026, 1, 1), date(2027, 1, 1)),
+])
+@pytest.mark.parametrize("page_size", [1, 7, 50])
+def test_running_balance_across_keyset_pages(conn, user_id, virtual_data, start, end, page_size):
+    proj, shown = _dashboard(conn, user_id, start, end, page_size)
+    expected = _expected_balances(conn, user_id, proj)
+    in_range = sorted((d, i) for i, (d, _) in expected.items() if start <= d < end)
+    assert [(as_date(r[1]), r[0]) for r in shown] == in_range
+    assert {r[0]: r[7] for r in shown} == {i: expected[i][1] for _, i in in_range}
+
+
+def test_booked_occurrence_replaces_virtual_one(conn, user_id, virtual_data):
+    miete, _ = virtual_data
+    proj = projection.load(conn, user_id)
+    miete_days = [r[1] for r in proj.rows if r[6] == miete]
+    assert date(2025, 3, 1) not in miete_days
+    assert len(miete_days) == 23
+
+
+def _booked(conn, user_id, recurring_id):
+    return conn.execute(text("SELECT date, paid FROM transactions WHERE user_id = :u AND recurring_id = :r "
+                             "ORDER BY date"), {"u": user_id, "r": recurring_id}).fetchall()
+
+
+def test_materialize_creates_occurrence_once(conn, user_id, virtual_data):
+    miete, _ = virtual_data
+    value = virtual_id(miete, date(2025, 5, 1))
+    assert [as_date(r[1]) for r in projection.materialize(conn, user_id, value, True)] == [date(2025, 5, 1)]
+    # zweiter Klick (z. B. aus einem älteren Tab) setzt nur den Status
+    assert len(projection.materialize(conn, user_id, value, False)) == 1
+    conn.commit()
+    booked = [(as_date(d), bool(p)) for d, p in _booked(conn, user_id, miete)]
+    assert booked == [(date(2025, 3, 15), True), (date(2025, 5, 1), False)]
+
+
+def test_materialize_already_booked_occurrence(conn, user_id, virtual_data):
+    miete, _ = virtual_data
+    # Die Seite zeigte noch den virtuellen Termin 01.03., gebucht wurde inzwischen am 15.03.
+    Q.execute(conn, Q.SET_TRANSACTION_PAID, paid_value=False,
+              transaction_id=conn.execute(text("SELECT id FROM transactions WHERE recurring_id = :r"),
+                                          {"r": miete}).scalar(), owner_id=user_id)
+    updated = projection.materialize(conn, user_id, virtual_id(miete, date(2025, 3, 1)), True)
+    conn.commit()
+    assert [as_date(r[0]) for r in updated] == [date(2025, 3, 15)]
+    assert [(as_date(d), bool(p)) for d, p in _booked(conn, user_id, miete)] == [(date(2025, 3, 15), True)]
+
+
+def test_materialize_rejects_foreign_and_invalid_ids(conn, user_id, virtual_data):
+    miete, fitness = virtual_data
+    other = add_user(conn, "andere")
+    conn.commit()
+    assert projection.materialize(conn, other, virtual_id(miete, date(2025, 5, 1)), True) == []
+    # kein Termin der Serie (Miete liegt auf dem Monatsersten, Fitness auf Montagen)
+    assert projection.materialize(conn, user_id, virtual_id(miete, date(2025, 5, 2)), True) == []
+    assert projection.materialize(conn, user_id, virtual_id(fitness, date(2025, 1, 7)), True) == []
+    # nach dem Serienende
+    assert projection.materialize(conn, user_id, virtual_id(miete, date(2027, 1, 1)), True) == []
+    assert len(_booked(conn, user_id, miete)) == 1
+    assert _booked(conn, user_id, fitness) == []
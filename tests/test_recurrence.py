@@ -0,0 +1,192 @@
+# tests/test_recurrence.py – Wiederholungsregeln: Termine, Zeiträume, RRULE und Nachholen
+import random
+from datetime import date, timedelta
+
+import pytest
+from dateutil import rrule as du
+from sqlalchemy import text
+
+from core import fixkosten
+from core import queries as Q
+from core.recurrence import Rule, parse_rrule
+
+
+# ── Verankerung: Monatsende, Schaltjahr ─────────────────────────────────────
+@pytest.mark.parametrize("start", [date(2024, 1, 31), date(2024, 1, 1), date(2024, 1, 15)])
+def test_monthly_rule_is_anchored_on_first_of_month(start):
+    rule = Rule.create(start, "monthly", count=4)
+    assert rule.start == date(2024, 1, 1)
+    assert rule.occurrences() == (date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1), date(2024, 4, 1))
+
+
+def test_leap_day_rules():
+    yearly = Rule.create(date(2024, 2, 29), "yearly", count=3)
+    assert yearly.occurrences() == (date(2024, 2, 1), date(2025, 2, 1), date(2026, 2, 1))
+    # wöchentlich bleibt auf dem Wochentag des Starts, auch über den Schalttag
+    weekly = Rule.create(date(2024, 2, 22), "weekly", count=3)
+    assert weekly.occurrences() == (date(2024, 2, 22), date(2024, 2, 29), date(2024, 3, 7))
+    monthly = Rule.create(date(2024, 1, 1), "monthly")
+    assert monthly.occurrence_at(date(2024, 2, 29)) == date(2024, 2, 1)
+    assert monthly.period_end(date(2024, 2, 1)) == date(2024, 3, 1)
+    assert monthly.period_end(date(2024, 12, 1)) == date(2025, 1, 1)
+
+
+# ── Zeiträume, die zwischen zwei Terminen beginnen ──────────────────────────
+@pytest.mark.parametrize("rule, start, end, expected", [
+    (Rule.create(date(2024, 1, 1), "quarterly"), date(2024, 2, 15), date(2025, 1, 1),
+     (date(2024, 4, 1), date(2024, 7, 1), date(2024, 10, 1))),
+    # Beginn am Tag nach einem Termin, Ende exklusiv auf einem Termin
+    (Rule.create(date(2024, 1, 1), "quarterly"), date(2024, 4, 2), date(2025, 1, 1),
+     (date(2024, 7, 1), date(2024, 10, 1))),
+    (Rule.create(date(2020, 3, 10), "yearly"), date(2022, 4, 1), date(2025, 3, 2),
+     (date(2023, 3, 1), date(2024, 3, 1), date(2025, 3, 1))),
+    (Rule.create(date(2020, 3, 1), "yearly", 2), date(2021, 1, 1), date(2027, 1, 1),
+     (date(2022, 3, 1), date(2024, 3, 1), date(2026, 3, 1))),
+    # Zeitraum vor dem Start und zwischen zwei Terminen
+    (Rule.create(date(2024, 1, 1), "quarterly"), date(2023, 1, 1), date(2024, 1, 1), ()),
+    (Rule.create(date(2024, 1, 1), "quarterly"), date(2024, 5, 1), date(2024, 7, 1), ()),
+])
+def test_window_between_occurrences(rule, start, end, expected):
+    assert rule.occurrences(start, end) == expected
+
+
+def test_occurrences_match_dateutil():
+    rng = random.Random(25)
+    freqs = {"weekly": du.WEEKLY, "monthly": du.MONTHLY, "yearly": du.YEARLY}
+    for _ in range(500):
+        frequency = rng.choice(list(freqs))
+        rule = Rule.create(date(2020, 1, 1) + timedelta(days=rng.randrange(1500)), frequency,
+                           rng.randint(1, 4), rng.choice([0, rng.randint(1, 30)]))
+        start = rule.start + timedelta(days=rng.randrange(-100, 700))
+        end = start + timedelta(days=rng.randrange(1, 1500))
+        # dateutil: COUNT oder UNTIL, nicht beides
+        bound = {"count": rule.count} if rule.count else {"until": end - timedelta(days=1)}
+        expected = [d.date() for d in du.rrule(freqs[frequency], dtstart=rule.start, interval=rule.interval, **bound)
+                    if start <= d.date() < end]
+        assert list(rule.occurrences(start, end)) == expected, rule
+
+
+# ── COUNT, UNTIL, offen ─────────────────────────────────────────────────────
+def test_count_until_and_open_ended():
+    start = date(2024, 1, 1)
+    by_count = Rule.create(start, "quarterly", count=4)
+    assert by_count.occurrences()[-1] == date(2024, 10, 1) and len(by_count.occurrences()) == 4
+    # UNTIL ist inklusive
+    assert Rule.create(start, "quarterly", until=date(2024, 10, 1)).occurrences() == by_count.occurrences()
+    assert Rule.create(start, "quarterly", until=date(2024, 9, 30)).occurrences() == by_count.occurrences()[:3]
+    # beides: was zuerst endet
+    assert len(Rule.create(start, "monthly", count=6, until=date(2024, 3, 15)).occurrences()) == 3
+    assert len(Rule.create(start, "monthly", count=2, until=date(2024, 12, 1)).occurrences()) == 2
+
+    open_rule = Rule.create(start, "monthly")
+    assert open_rule.open_ended and not by_count.open_ended
+    assert len(open_rule.occurrences(start, date(2034, 1, 1))) == 120
+    with pytest.raises(ValueError):
+        open_rule.occurrences()
+    # nach dem Ende gibt es keinen Termin mehr
+    assert by_count.occurrence_at(date(2025, 2, 1)) is None
+    assert open_rule.occurrence_at(date(2099, 5, 20)) == date(2099, 5, 1)
+    assert open_rule.occurrence_at(date(2023, 12, 31)) is None
+
+
+def test_describe():
+    assert Rule.create(date(2024, 1, 1), "quarterly", count=4).describe() == "vierteljährlich, 4 Termine"
+    assert Rule.create(date(2024, 1, 1), "weekly", 2).describe() == "alle 2 Wochen, unbegrenzt"
+    assert Rule.create(date(2024, 1, 1), "yearly", until=date(2030, 1, 1)).describe() == "jährlich, bis 01.01.2030"
+
+
+# ── RRULE ───────────────────────────────────────────────────────────────────
+@pytest.mark.parametrize("text, rule", [
+    ("FREQ=MONTHLY", Rule(date(2024, 1, 1))),
+    ("RRULE:FREQ=MONTHLY;INTERVAL=3;COUNT=4", Rule(date(2024, 1, 1), "monthly", 3, 4)),
+    ("freq=weekly;interval=2", Rule(date(2024, 1, 17), "weekly", 2)),
+    ("FREQ=YEARLY;UNTIL=20301231T235959Z", Rule(date(2024, 1, 1), "yearly", until=date(2030, 12, 31))),
+])
+def test_parse_rrule(text, rule):
+    parsed = parse_rrule(text, date(2024, 1, 17))
+    assert parsed == rule
+    assert parse_rrule(parsed.rrule(), date(2024, 1, 17)) == parsed
+
+
+@pytest.mark.parametrize("text", [
+    "FREQ=MONTHLY;BYMONTHDAY=15",
+    "FREQ=WEEKLY;BYDAY=MO,TH",
+    "FREQ=MONTHLY;BYSETPOS=-1",
+    "FREQ=DAILY",
+    "FREQ=HOURLY;INTERVAL=1",
+    "INTERVAL=2",
+    "FREQ",
+    "FREQ=MONTHLY;INTERVAL=0",
+    "FREQ=MONTHLY;INTERVAL=x",
+    "FREQ=MONTHLY;COUNT=-1",
+    "FREQ=MONTHLY;UNTIL=2030",
+    "FREQ=MONTHLY;UNTIL=20231231",
+])
+def test_parse_rrule_rejects(text):
+    with pytest.raises(ValueError):
+        parse_rrule(text, date(2024, 1, 17))
+
+
+# ── Nachholen: gebucht, wenn eine Zeile in [Termin, Folgetermin) liegt ──────
+def test_occurrence_period():
+    rule = Rule.create(date(2024, 1, 1), "quarterly")
+    assert {rule.occurrence_at(date(2024, 1, 1) + timedelta(days=n)) for n in range(91)} == {date(2024, 1, 1)}
+    assert rule.occurrence_at(date(2024, 4, 1)) == date(2024, 4, 1)
+    weekly = Rule.create(date(2024, 1, 3), "weekly")
+    assert weekly.occurrence_at(date(2024, 1, 9)) == date(2024, 1, 3)
+    assert weekly.occurrence_at(date(2024, 1, 10)) == date(2024, 1, 10)
+
+
+def _series(conn, user_id, description, rule):
+    return Q.execute(conn, Q.INSERT_RECURRING, user_id=user_id, description=description, usage="Fix",
+                     amount=-1000, duration=rule.count, start_date=rule.start, frequency=rule.frequency,
+                     freq_interval=rule.interval, until=rule.until).scalar_one()
+
+
+def _book(conn, user_id, rec_id, day):
+    Q.execute(conn, Q.INSERT_FIX_TRANSACTION, user_id=user_id, date=day, description="x", usage="Fix",
+              amount=-1000, recurring_id=rec_id)
+
+
+def _booked(conn, rec_id):
+    return sorted(str(d)[:10] for d, in conn.execute(
+        text("SELECT date FROM transactions WHERE recurring_id = :r"), {"r": rec_id}))
+
+
+@pytest.mark.parametrize("rule", [
+    Rule.create(date(2024, 1, 1), "monthly"),                 # ein Statement (SQL)
+    Rule.create(date(2024, 1, 1), "monthly", count=12),       # ein Statement (SQL)
+    Rule.create(date(2024, 1, 1), "quarterly"),               # Regel (Python)
+    Rule.create(date(2024, 1, 1), "monthly", until=date(2024, 12, 31)),
+])
+def test_catch_up_keeps_moved_bookings(conn, user_id, rule):
+    rec_id = _series(conn, user_id, "Serie", rule)
+    first, second = rule.occurrences(date(2024, 1, 1), date(2024, 12, 1))[:2]
+    # erster Termin auf den letzten Tag seines Zeitraums verschoben, zweiter fehlt
+    _book(conn, user_id, rec_id, rule.period_end(first) - timedelta(days=1))
+    conn.commit()
+    created = fixkosten.catch_up_users(conn, [user_id], date(2024, 1, 1), rule.period_end(second))
+    conn.commit()
+    assert created == {user_id: [second]}
+    assert _booked(conn, rec_id) == [str(rule.period_end(first) - timedelta(days=1)), str(second)]
+    # zweiter Lauf legt nichts mehr an
+    assert fixkosten.catch_up_users(conn, [user_id], date(2024, 1, 1), rule.period_end(second)) == {}
+
+
+def test_catch_up_respects_series_end(conn, user_id):
+    rules = {
+        "monatlich offen": Rule.create(date(2024, 1, 1), "monthly"),
+        "monatlich 3": Rule.create(date(2024, 1, 1), "monthly", count=3),
+        "alle 2 Monate": Rule.create(date(2024, 1, 1), "monthly", 2),
+        "bis Mai": Rule.create(date(2024, 1, 1), "monthly", until=date(2024, 5, 1)),
+        "wöchentlich 5": Rule.create(date(2024, 1, 3), "weekly", count=5),
+        "jährlich": Rule.create(date(2023, 6, 1), "yearly"),
+    }
+    ids = {name: _series(conn, user_id, name, rule) for name, rule in rules.items()}
+    conn.commit()
+    created = fixkosten.catch_up_users(conn, [user_id], date(2024, 1, 1), date(2025, 1, 1))
+    conn.commit()
+    for name, rule in rules.items():
+        assert _booked(conn, ids[name]) == [str(d) for d in rule.occurrences(date(2024, 1, 1), date(2025, 1, 1))]
+    assert sorted(created[user_id]) == sorted(
+        d for rule in rules.values() for d in rule.occurrences(date(2024, 1, 1), date(2025, 1, 1)))
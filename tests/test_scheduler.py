@@ -0,0 +1,102 @@
+# tests/test_scheduler.py – Fixkosten-Scheduler: Blöcke, Datenversion, Fehler je Block
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from conftest import add_user
+from core import db, fixkosten
+from core import queries as Q
+from core.scheduler import FixkostenScheduler
+
+TODAY = date(2024, 5, 10)   # Fenster Mai/Juni 2024
+
+
+@pytest.fixture
+def users(engine, conn, monkeypatch):
+    """
+    Sieben Nutzer mit je einer Monatsserie ab Januar; bei jedem dritten
+    existieren die Buchungen für Mai und Juni schon. Dazu ein Nutzer ohne Serie.
+    """
+    monkeypatch.setattr(db, "_engine", engine)
+    ids = []
+    for i in range(7):
+        uid = add_user(conn, f"nutzer{i}")
+        rec_id = Q.execute(conn, Q.INSERT_RECURRING, user_id=uid, description="Miete", usage="",
+                           amount=-50000, duration=0, start_date=date(2024, 1, 15),
+                           frequency="monthly", freq_interval=1, until=None).scalar_one()
+        if i % 3 == 2:
+            for d in (date(2024, 5, 15), date(2024, 6, 15)):
+                Q.execute(conn, Q.INSERT_TRANSACTION, user_id=uid, date=d, description="Miete", usage="",
+                          amount=-50000, paid=False, recurring_id=rec_id)
+        ids.append(uid)
+    add_user(conn, "ohne_serie")
+    conn.commit()
+    return ids
+
+
+def _state(conn):
+    conn.rollback()   # frischer Snapshot
+    versions = dict(conn.execute(text("SELECT id, data_version FROM users")).all())
+    counts = dict(conn.execute(text("SELECT user_id, COUNT(*) FROM transactions GROUP BY user_id")).all())
+    return versions, counts
+
+
+def test_run_once_in_chunks(conn, users):
+    before, _ = _state(conn)
+    metrics = FixkostenScheduler(chunk=3, pause_ms=0).run_once(TODAY)
+    after, counts = _state(conn)
+
+    changed = [uid for i, uid in enumerate(users) if i % 3 != 2]
+    assert metrics["chunks"] == 3 and metrics["failed_chunks"] == 0
+    assert metrics["users"] == 7 and metrics["users_changed"] == len(changed)
+    assert metrics["inserted"] == 2 * len(changed)
+    assert all(counts[uid] == 2 for uid in users)
+    # Datenversion nur bei Nutzern mit neuen Buchungen
+    assert {uid for uid in after if after[uid] != before[uid]} == set(changed)
+    assert all(after[uid] == before[uid] + 1 for uid in changed)
+
+    # Zweiter Lauf: nichts mehr zu tun, keine Version ändert sich
+    again = FixkostenScheduler(chunk=3, pause_ms=0).run_once(TODAY)
+    assert again["inserted"] == 0 and again["users_changed"] == 0
+    assert _state(conn)[0] == after
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 100])
+def test_chunk_sizes_cover_all_users(conn, users, chunk):
+    metrics = FixkostenScheduler(chunk=chunk, pause_ms=0).run_once(TODAY)
+    assert metrics["users"] == 7
+    assert metrics["chunks"] == -(-7 // chunk)
+    assert all(n == 2 for n in _state(conn)[1].values())
+
+
+def test_failing_chunk_is_counted_and_skipped(conn, users, monkeypatch):
+    catch_up = fixkosten.catch_up_users
+
+    def flaky(c, user_ids, start, end):
+        if users[3] in user_ids:
+            # halb geschrieben, dann Fehler – muss zurückgerollt werden
+            catch_up(c, user_ids, start, end)
+            raise RuntimeError("kaputter Block")
+        return catch_up(c, user_ids, start, end)
+
+    monkeypatch.setattr(fixkosten, "catch_up_users", flaky)
+    before, _ = _state(conn)
+    scheduler = FixkostenScheduler(chunk=3, pause_ms=0)
+    metrics = scheduler.run_once(TODAY)
+    after, counts = _state(conn)
+
+    assert metrics["chunks"] == 3 and metrics["failed_chunks"] == 1
+    assert metrics["users"] == 7 and metrics["users_changed"] == 3
+    failed = users[3:6]
+    assert [counts.get(uid, 0) for uid in failed] == [0, 0, 2]
+    assert all(after[uid] == before[uid] for uid in failed)
+    status = scheduler.status()
+    assert status["runs"] == 1 and status["failures"] == 0
+    assert status["last_error"] == "RuntimeError" and status["last_run"] is metrics
+
+    # Nächster Lauf holt den Block nach
+    monkeypatch.setattr(fixkosten, "catch_up_users", catch_up)
+    metrics = scheduler.run_once(TODAY)
+    assert metrics["failed_chunks"] == 0 and metrics["users_changed"] == 2
+    assert all(n == 2 for n in _state(conn)[1].values())
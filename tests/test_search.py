@@ -0,0 +1,101 @@
+# tests/test_search.py – Suchindex (FTS5-Trigger) und Wahl der Suchvariante
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from core import queries as Q, search
+
+
+def _add(conn, user_id, description, usage=""):
+    return conn.execute(
+        Q.INSERT_TRANSACTION.returning(Q.transactions.c.id),
+        {"user_id": user_id, "date": date(2024, 3, 1), "description": description, "usage": usage,
+         "amount": -100, "paid": True, "recurring_id": None},
+    ).scalar_one()
+
+
+def _fts_ids(conn, match):
+    return {r[0] for r in conn.execute(
+        text("SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH :m"), {"m": match})}
+
+
+def _ranked(conn, user_id, q):
+    return sorted(hit["description"] for hit in search.ranked(conn, user_id, q))
+
+
+@pytest.fixture
+def fts(conn):
+    if conn.dialect.name != "sqlite":
+        pytest.skip("FTS5 nur auf SQLite")
+    if search._mode(conn) != "fts":
+        pytest.skip("SQLite ohne FTS5")
+    return conn
+
+
+def _integrity_check(conn):
+    # External content: wirft, wenn Index und transactions auseinanderlaufen
+    conn.exec_driver_sql("INSERT INTO transactions_fts (transactions_fts) VALUES ('integrity-check')")
+
+
+def test_fts_triggers_follow_insert_update_delete(fts, user_id):
+    conn = fts
+    miete = _add(conn, user_id, "Miete März", "Wohnung")
+    strom = _add(conn, user_id, "Stadtwerke", "Strom")
+    assert _fts_ids(conn, '"miete"*') == {miete}
+    assert _fts_ids(conn, '"strom"*') == {strom}
+    _integrity_check(conn)
+
+    conn.execute(text("UPDATE transactions SET description = 'Nebenkosten', \"usage\" = 'Wohnung' WHERE id = :id"),
+                 {"id": strom})
+    assert _fts_ids(conn, '"strom"*') == set()
+    assert _fts_ids(conn, '"nebenkosten"*') == {strom}
+    assert _fts_ids(conn, '"wohnung"*') == {miete, strom}
+    # Änderungen an anderen Spalten lösen den Trigger nicht aus
+    conn.execute(text("UPDATE transactions SET amount = -200 WHERE id = :id"), {"id": miete})
+    _integrity_check(conn)
+
+    conn.execute(text("DELETE FROM transactions WHERE id = :id"), {"id": miete})
+    assert _fts_ids(conn, '"miete"*') == set()
+    assert _fts_ids(conn, '"wohnung"*') == {strom}
+    _integrity_check(conn)
+
+
+def test_prepare_uses_index_for_plain_terms(conn):
+    mode, params = search.prepare(conn, "Miete Wohn")
+    assert mode == search._mode(conn)
+    assert params["q"] == "%miete wohn%" and params["term"] == "miete wohn"
+    if mode == "fts":
+        assert params["match"] == '"miete"* "wohn"*'
+    if conn.dialect.name == "postgresql":
+        # ohne pg_trgm bleibt Postgres bei LIKE
+        assert mode in ("trgm", "like")
+
+
+@pytest.mark.parametrize("q", ["a", "mi", " x "])
+def test_prepare_short_terms_use_like(conn, q):
+    mode, params = search.prepare(conn, q)
+    assert mode == "like" and "match" not in params
+
+
+@pytest.mark.parametrize("q", ["C&A", "3,50", "-", "Miet-Kaution", "konto_1"])
+def test_prepare_special_characters(conn, q):
+    mode, params = search.prepare(conn, q)
+    if search._mode(conn) == "fts":
+        assert mode == "like" and "match" not in params
+    else:
+        assert mode == search._mode(conn)
+
+
+def test_like_fallback_matches_literally(conn, user_id):
+    for description in ("C&A Filiale", "Rabatt 100%", "Bonus 1000", "Konto_1", "Konto 21", "Miete"):
+        _add(conn, user_id, description)
+    conn.commit()
+
+    assert _ranked(conn, user_id, "c&a") == ["C&A Filiale"]
+    # % und _ sind keine Platzhalter
+    assert _ranked(conn, user_id, "100%") == ["Rabatt 100%"]
+    assert _ranked(conn, user_id, "o_1") == ["Konto_1"]
+    # kurze Begriffe als Teilwort
+    assert _ranked(conn, user_id, "ie") == ["Miete"]
+    assert _ranked(conn, user_id, "miet") == ["Miete"]
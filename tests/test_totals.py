@@ -0,0 +1,97 @@
+# tests/test_totals.py – monthly_totals nach den Schreibpfaden gegen ein volles GROUP BY
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import text
+
+import sync
+from utils_web import as_date
+
+
+def _full_aggregate(conn, user_id) -> dict:
+    """Monatssummen direkt aus den Buchungen (ohne monthly_totals)."""
+    months = defaultdict(lambda: [0, 0, 0, 0])
+    for d, amount, paid, recurring_id in conn.execute(
+            text("SELECT date, amount, paid, recurring_id FROM transactions WHERE user_id = :u"), {"u": user_id}):
+        d, amount = as_date(d), int(amount)
+        month = months[(d.year, d.month)]
+        month[0 if amount > 0 else 1] += abs(amount)
+        if amount < 0 and not paid and recurring_id is not None:
+            month[2] -= amount
+        month[3] += 1
+    return {k: tuple(v) for k, v in months.items()}
+
+
+def _stored(conn, user_id) -> dict:
+    rows = conn.execute(text("SELECT year, month, income, expenses, open_recurring, tx_count FROM monthly_totals "
+                             "WHERE user_id = :u"), {"u": user_id})
+    return {(int(y), int(m)): tuple(int(v) for v in rest) for y, m, *rest in rows}
+
+
+def _check(conn, user_id):
+    conn.rollback()   # frischer Snapshot
+    assert _stored(conn, user_id) == _full_aggregate(conn, user_id)
+
+
+def _ids(conn, user_id, where=""):
+    conn.rollback()
+    return [r[0] for r in conn.execute(text(f"SELECT id FROM transactions WHERE user_id = :u {where} ORDER BY id"),
+                                       {"u": user_id})]
+
+
+class _Response:
+    def __init__(self, changes):
+        self.changes = changes
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.changes
+
+
+def test_incremental_refresh_matches_full_aggregate(client, conn, user_id, monkeypatch, tmp_path):
+    # Einfügen (Einnahmen und Ausgaben über mehrere Monate)
+    for i, (day, amount) in enumerate([("2024-01-05", "-12,50"), ("2024-01-31", "2.500"), ("2024-02-29", "-99,99"),
+                                       ("2024-03-01", "-0,01"), ("2024-12-31", "40"), ("2025-01-01", "-40")]):
+        assert client.post("/add_entry", data={"entry_date": day, "description": f"E{i}", "usage": "x",
+                                               "amount": amount}).status_code == 302
+    _check(conn, user_id)
+
+    # Fixkosten-Serie: Block von Monaten (refresh_range), dann bezahlt/offen umschalten
+    client.post("/fixkosten", data={"add_fix": "1", "description": "Miete", "usage": "Wohnen", "amount": "-800",
+                                    "duration": "6", "start_date": "2024-02-01"})
+    _check(conn, user_id)
+    recurring = _ids(conn, user_id, "AND recurring_id IS NOT NULL")
+    assert len(recurring) == 6
+    for transaction_id in recurring[:3]:
+        assert client.post(f"/api/transaction/{transaction_id}/toggle_paid", json={"paid": 1}).status_code == 200
+    assert client.post(f"/api/transaction/{recurring[0]}/toggle_paid", json={"paid": 0}).status_code == 200
+    _check(conn, user_id)
+
+    # Löschen, auch den einzigen Eintrag eines Monats (leerer Monat verschwindet)
+    single = _ids(conn, user_id, "AND date >= '2024-03-01' AND date < '2024-03-02'")
+    client.post("/delete_entries", data={"delete_ids": [str(i) for i in single + recurring[-1:]]})
+    _check(conn, user_id)
+    assert (2024, 7) not in _stored(conn, user_id)
+
+    # Sync-Pull: Einfügen, Datum in einen anderen Monat verschieben (mit neuem Betrag), Löschen
+    first, second = _ids(conn, user_id, "AND recurring_id IS NULL")[:2]
+    changes = [
+        {"table": "transactions", "op": "insert", "id": 9001, "ts": "1",
+         "data": {"id": 9001, "user_id": user_id, "date": datetime(2023, 11, 11), "description": "Remote",
+                  "usage": "x", "amount": 1234, "paid": True, "recurring_id": None}},
+        {"table": "transactions", "op": "update", "id": first, "ts": "2",
+         "data": {"date": datetime(2025, 6, 15), "amount": -777}},
+        {"table": "transactions", "op": "delete", "id": second, "ts": "3", "data": {}},
+    ]
+    monkeypatch.setattr(sync, "STATE_FILE", str(tmp_path / "last_pull_ts.txt"))
+    monkeypatch.setattr(sync.requests, "get", lambda *args, **kwargs: _Response(changes))
+    try:
+        sync.pull_changes()
+    finally:
+        sync.Session.remove()
+    _check(conn, user_id)
+    stored = _stored(conn, user_id)
+    assert (2023, 11) in stored and (2025, 6) in stored
+    assert (2024, 1) not in stored   # beide Januar-Buchungen verschoben bzw. gelöscht
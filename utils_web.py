@@ -1,8 +1,8 @@
 # utils.py
 from typing import Tuple
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
 import re
-from datetime import date
+from datetime import date, datetime
 
 def check_password(password: str) -> Tuple[bool, str]:
     if len(password) < 8:
@@ -29,13 +29,49 @@ def format_euro(value) -> str:
 
 def parse_decimal(text: str) -> Decimal | None:
     try:
-        return Decimal(text.replace(",", ".").strip())
+        value = Decimal(text.replace(",", ".").strip())
     except Exception:
         return None
+    return value if value.is_finite() else None
+
+# Beträge liegen in der DB als ganze Cent (INTEGER); Decimal gibt es nur an
+# den Rändern – Formulareingabe (parse_decimal → to_cents) und Anzeige
+# (from_cents → format_euro bzw. Template)
+_CENT = Decimal("0.01")
+
+def to_cents(value) -> int:
+    """Euro-Betrag (Decimal, int oder str) → ganze Cent, kaufmännisch gerundet."""
+    return int(Decimal(value).quantize(_CENT, rounding=ROUND_HALF_UP).scaleb(2))
+
+def from_cents(cents) -> Decimal:
+    """Cent aus der DB → Euro-Betrag mit zwei Nachkommastellen."""
+    return Decimal(int(cents)).scaleb(-2)
 
 def extract_year_month(d: date) -> Tuple[int, int]:
     return d.year, d.month
 
+def period_range(year: int, month: int = 0) -> Tuple[date, date]:
+    """
+    Halboffener Datumsbereich [start, end) für einen Monat bzw. – bei
+    month außerhalb 1–12 – für das ganze Jahr. Als `date >= start AND
+    date < end` abgefragt, kann die DB einen Index auf date nutzen.
+    """
+    if 1 <= month <= 12:
+        start = date(year, month, 1)
+        end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    else:
+        start = date(year, 1, 1)
+        end = date(year + 1, 1, 1)
+    return start, end
+
+def as_date(value) -> date | None:
+    """Datumswert aus der DB (datetime, date oder ISO-String) als date."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
 def saldo_color(value: Decimal) -> str:
     return "#32CD32" if value >= 0 else "#FF0000"
 